@@ -0,0 +1,354 @@
+#!/usr/bin/python3
+# analytics.py - Map/reduce phrase analytics over stored results and transcripts
+
+import sys
+import json
+import argparse
+import logging
+import boto3
+from collections import Counter
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from scanner import PhraseScanner
+from compact_transcript import CompactTranscript, COMPACT_TRANSCRIPT_NAME
+from storage import put_json, get_json, get_bytes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKET_SECONDS = 300  # 5 minute time buckets
+DEFAULT_VIDEOS_PER_TASK = 25
+ANALYTICS_PREFIX = "analytics"
+
+# S3 client owned by each pool process (boto3 clients cannot be pickled)
+_process_s3 = None
+
+def _init_process(region):
+    """Create one S3 client per pool process"""
+    global _process_s3
+    _process_s3 = boto3.client('s3', region_name=region)
+
+def _map_task(task):
+    """Process pool entry point: map a batch of videos to partial aggregates"""
+    s3_bucket, video_ids, phrases, bucket_seconds = task
+    partial = empty_partial()
+    for video_id in video_ids:
+        try:
+            merge_partials(partial, map_video(_process_s3, s3_bucket, video_id, phrases, bucket_seconds))
+        except Exception as e:
+            logger.error(f"Error aggregating video {video_id}: {str(e)}")
+            partial["errors"][video_id] = str(e)
+    return partial
+
+def empty_partial():
+    """Create an empty partial aggregate"""
+    return {
+        "by_video": [],
+        "by_bucket": Counter(),
+        "by_date": Counter(),
+        "videos_by_date": Counter(),
+        "errors": {}
+    }
+
+def merge_partials(total, partial):
+    """Reduce step: fold one partial aggregate into another"""
+    total["by_video"].extend(partial["by_video"])
+    total["by_bucket"].update(partial["by_bucket"])
+    total["by_date"].update(partial["by_date"])
+    total["videos_by_date"].update(partial["videos_by_date"])
+    total["errors"].update(partial["errors"])
+    return total
+
+def load_latest_results(s3, s3_bucket, video_id):
+    """
+    Load the most recent results for each phrase of a video
+
+    Worker results hold a single phrase, re-scan results hold several.
+    Result keys start with a timestamp, so later files win.
+
+    Returns:
+        Dict of stats keyed by phrase
+    """
+    keys = []
+    kwargs = {"Bucket": s3_bucket, "Prefix": f"results/{video_id}/"}
+    while True:
+        response = s3.list_objects_v2(**kwargs)
+        keys.extend(item['Key'] for item in response.get('Contents', []) if item['Key'].endswith('.json'))
+        if not response.get('IsTruncated'):
+            break
+        kwargs["ContinuationToken"] = response['NextContinuationToken']
+
+    latest = {}
+    for key in sorted(keys):
+        results = get_json(s3, s3_bucket, key)
+        if "phrases" in results:
+            latest.update(results["phrases"])
+        elif "phrase" in results:
+            latest[results["phrase"]] = results
+    return latest
+
+def load_transcript(s3, s3_bucket, video_id):
+    """Load a video's transcript (compact form first, without word detail), or None"""
+    try:
+        compact = get_bytes(s3, s3_bucket, f"transcripts/{video_id}/{COMPACT_TRANSCRIPT_NAME}")
+        return CompactTranscript(compact).to_dict(include_words=False)
+    except s3.exceptions.NoSuchKey:
+        pass
+
+    try:
+        return get_json(s3, s3_bucket, f"transcripts/{video_id}/full_transcript.json")
+    except s3.exceptions.NoSuchKey:
+        return None
+
+def map_video(s3, s3_bucket, video_id, phrases, bucket_seconds):
+    """
+    Map step: compute phrase counts for one video
+
+    Stored results are used where they exist; phrases without results are
+    scanned from the transcript.
+
+    Args:
+        s3: S3 client
+        s3_bucket: S3 bucket name
+        video_id: YouTube video ID
+        phrases: Phrases to aggregate, or None for every phrase with results
+        bucket_seconds: Width of the time buckets in seconds
+
+    Returns:
+        Partial aggregate for the video
+    """
+    partial = empty_partial()
+    stats_by_phrase = load_latest_results(s3, s3_bucket, video_id)
+
+    missing = [phrase for phrase in (phrases or []) if phrase not in stats_by_phrase]
+    if missing:
+        transcript = load_transcript(s3, s3_bucket, video_id)
+        if transcript:
+            for phrase in missing:
+                stats = PhraseScanner.from_spec(phrase).scan_segments(transcript.get("segments", []))
+                stats["processed_at"] = transcript.get("transcribed_at")
+                stats_by_phrase[phrase] = stats
+
+    dates_seen = set()
+    for phrase in (phrases or sorted(stats_by_phrase)):
+        stats = stats_by_phrase.get(phrase)
+        if not stats:
+            continue
+
+        occurrences = stats.get("total_occurrences", 0)
+        partial["by_video"].append((
+            video_id,
+            phrase,
+            occurrences,
+            stats.get("total_words", 0),
+            round(stats.get("video_duration_sec") or 0)
+        ))
+
+        for segment in stats.get("segments_with_phrase", []):
+            # Older results only carry the segment index, which assumed 60-second segments
+            start = segment.get("start")
+            if start is None:
+                start = (segment.get("minute", 1) - 1) * 60
+            partial["by_bucket"][(phrase, int(start // bucket_seconds))] += segment.get("occurrences", 0)
+
+        processed_date = (stats.get("processed_at") or "")[:10] or "unknown"
+        partial["by_date"][(processed_date, phrase)] += occurrences
+        dates_seen.add(processed_date)
+
+    for processed_date in dates_seen:
+        partial["videos_by_date"][processed_date] += 1
+
+    return partial
+
+def to_columnar(columns, rows, dictionary_columns=()):
+    """
+    Convert row tuples into a compact column-oriented document
+
+    Columns named in dictionary_columns are stored as integer codes into a
+    per-column dictionary, which keeps repeated phrases and dates small.
+    """
+    table = {"columns": list(columns), "row_count": len(rows), "data": {}, "dictionaries": {}}
+    for index, name in enumerate(columns):
+        values = [row[index] for row in rows]
+        if name in dictionary_columns:
+            dictionary = sorted(set(values))
+            codes = {value: code for code, value in enumerate(dictionary)}
+            table["dictionaries"][name] = dictionary
+            values = [codes[value] for value in values]
+        table["data"][name] = values
+    return table
+
+
+class CorpusAnalytics:
+    """Pre-aggregates phrase counts across the corpus with a process pool"""
+
+    def __init__(self, s3_bucket, region="us-east-1", processes=None,
+                 bucket_seconds=DEFAULT_BUCKET_SECONDS, videos_per_task=DEFAULT_VIDEOS_PER_TASK):
+        """
+        Initialize the analytics engine
+
+        Args:
+            s3_bucket: S3 bucket holding results and transcripts
+            region: AWS region
+            processes: Size of the process pool (Default: CPU count)
+            bucket_seconds: Width of the time buckets in seconds
+            videos_per_task: Number of videos mapped by one pool task
+        """
+        self.s3_bucket = s3_bucket
+        self.region = region
+        self.s3 = boto3.client('s3', region_name=region)
+        self.processes = processes
+        self.bucket_seconds = bucket_seconds
+        self.videos_per_task = videos_per_task
+
+    def list_videos(self):
+        """List video IDs that have results or transcripts"""
+        video_ids = set()
+        for prefix in ("results/", "transcripts/"):
+            kwargs = {"Bucket": self.s3_bucket, "Prefix": prefix, "Delimiter": "/"}
+            while True:
+                response = self.s3.list_objects_v2(**kwargs)
+                for common_prefix in response.get('CommonPrefixes', []):
+                    video_id = common_prefix['Prefix'][len(prefix):].strip('/')
+                    if video_id:
+                        video_ids.add(video_id)
+                if not response.get('IsTruncated'):
+                    break
+                kwargs["ContinuationToken"] = response['NextContinuationToken']
+        return sorted(video_ids)
+
+    def run(self, phrases=None, video_ids=None):
+        """
+        Map every video across the pool, reduce, and write the aggregates
+
+        Args:
+            phrases: Phrases to aggregate (Default: every phrase with results)
+            video_ids: Videos to include (Default: the whole corpus)
+
+        Returns:
+            Manifest describing the written aggregate objects
+        """
+        video_ids = video_ids or self.list_videos()
+        tasks = [
+            (self.s3_bucket, video_ids[i:i + self.videos_per_task], phrases, self.bucket_seconds)
+            for i in range(0, len(video_ids), self.videos_per_task)
+        ]
+        logger.info(f"Aggregating {len(video_ids)} videos in {len(tasks)} tasks")
+
+        total = empty_partial()
+        with ProcessPoolExecutor(max_workers=self.processes, initializer=_init_process,
+                                 initargs=(self.region,)) as executor:
+            for partial in executor.map(_map_task, tasks):
+                merge_partials(total, partial)
+
+        return self.write_aggregates(total, len(video_ids))
+
+    def write_aggregates(self, total, video_count):
+        """Write the reduced aggregates as columnar objects plus a manifest"""
+        by_bucket_rows = sorted(
+            (phrase, bucket * self.bucket_seconds, count)
+            for (phrase, bucket), count in total["by_bucket"].items()
+        )
+        by_date_rows = sorted(
+            (processed_date, phrase, count, total["videos_by_date"][processed_date])
+            for (processed_date, phrase), count in total["by_date"].items()
+        )
+
+        tables = {
+            "by_video": to_columnar(
+                ["video_id", "phrase", "occurrences", "total_words", "duration_sec"],
+                sorted(total["by_video"]), dictionary_columns=("phrase",)),
+            "by_time_bucket": to_columnar(
+                ["phrase", "bucket_start_sec", "occurrences"],
+                by_bucket_rows, dictionary_columns=("phrase",)),
+            "by_date": to_columnar(
+                ["processed_date", "phrase", "occurrences", "videos_processed"],
+                by_date_rows, dictionary_columns=("processed_date", "phrase")),
+        }
+
+        manifest = {
+            "generated_at": datetime.now().isoformat(),
+            "videos": video_count,
+            "bucket_seconds": self.bucket_seconds,
+            "errors": total["errors"],
+            "tables": {}
+        }
+
+        for name, table in tables.items():
+            key = f"{ANALYTICS_PREFIX}/{name}.json"
+            put_json(self.s3, self.s3_bucket, key, table)
+            manifest["tables"][name] = {"key": key, "rows": table["row_count"]}
+
+        self.s3.put_object(
+            Body=json.dumps(manifest, indent=2),
+            Bucket=self.s3_bucket,
+            Key=f"{ANALYTICS_PREFIX}/manifest.json",
+            ContentType="application/json"
+        )
+        logger.info(f"Wrote analytics for {video_count} videos to s3://{self.s3_bucket}/{ANALYTICS_PREFIX}/")
+        return manifest
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Aggregate phrase counts across all results and transcripts into columnar analytics files."
+    )
+    parser.add_argument(
+        "--s3_bucket", "-b",
+        type=str,
+        default="youtube-transcripts",
+        help="S3 bucket holding results and transcripts. (Default: 'youtube-transcripts')"
+    )
+    parser.add_argument(
+        "--region", "-r",
+        type=str,
+        default="us-east-1",
+        help="AWS region for S3. (Default: 'us-east-1')"
+    )
+    parser.add_argument(
+        "--phrases", "-p",
+        type=str,
+        nargs="*",
+        help="Phrases to aggregate (Default: every phrase that has results)"
+    )
+    parser.add_argument(
+        "--processes", "-j",
+        type=int,
+        default=None,
+        help="Number of worker processes (Default: CPU count)"
+    )
+    parser.add_argument(
+        "--bucket_seconds",
+        type=int,
+        default=DEFAULT_BUCKET_SECONDS,
+        help=f"Width of the time buckets in seconds. (Default: {DEFAULT_BUCKET_SECONDS})"
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    args = parse_arguments()
+
+    analytics = CorpusAnalytics(
+        args.s3_bucket,
+        args.region,
+        processes=args.processes,
+        bucket_seconds=args.bucket_seconds
+    )
+    try:
+        manifest = analytics.run(phrases=args.phrases)
+    except Exception as e:
+        print(f"Error running analytics: {str(e)}")
+        sys.exit(1)
+
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
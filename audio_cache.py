@@ -0,0 +1,198 @@
+#!/usr/bin/python3
+# audio_cache.py - Size-bounded local cache of converted audio, shared between workers
+
+import os
+import re
+import time
+import fcntl
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_GB = 20
+AUDIO_NAME = "audio.wav"
+LOCK_NAME = ".lock"
+VIDEO_ID_PATTERN = re.compile(r"^[0-9A-Za-z_-]+$")
+
+class AudioCache:
+    """
+    Converted audio keyed by video_id, evicted least recently used first
+
+    Entries are {root}/{video_id}/audio.wav. A hit refreshes the entry's
+    mtime, which is the LRU order. Writes go to a temporary name and are
+    renamed into place, and an fcntl lock file serializes inserts and
+    eviction, so several worker processes can share one cache directory.
+    Callers get a hard link (or copy) of the cached file, so an entry
+    evicted while a job still uses its audio does not affect that job.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_CACHE_GB * 1024 ** 3):
+        """
+        Initialize the cache
+
+        Args:
+            root: Cache directory
+            max_bytes: Byte budget; least recently used entries are evicted beyond it
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._thread_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock shared with every process using this cache"""
+        with self._thread_lock:
+            with open(os.path.join(self.root, LOCK_NAME), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _entry_path(self, video_id):
+        """Cached audio path for a video"""
+        if not VIDEO_ID_PATTERN.match(video_id):
+            raise ValueError(f"Invalid video ID for cache: {video_id}")
+        return os.path.join(self.root, video_id, AUDIO_NAME)
+
+    @staticmethod
+    def _link_or_copy(source, destination):
+        """Hard link source to destination, copying if linking is not possible"""
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copy2(source, destination)
+
+    def get(self, video_id, destination):
+        """
+        Place the cached audio for a video at destination
+
+        Args:
+            video_id: YouTube video ID
+            destination: Path to link or copy the audio to
+
+        Returns:
+            destination on a hit, None on a miss
+        """
+        path = self._entry_path(video_id)
+        with self._locked():
+            if not os.path.exists(path):
+                self.misses += 1
+                return None
+            if os.path.exists(destination):
+                os.remove(destination)
+            self._link_or_copy(path, destination)
+            now = time.time()
+            os.utime(path, (now, now))
+
+        self.hits += 1
+        logger.info(f"Audio cache hit for {video_id}")
+        return destination
+
+    def put(self, video_id, audio_file):
+        """
+        Add converted audio to the cache and evict down to the byte budget
+
+        Returns:
+            True if the audio was cached
+        """
+        size = os.path.getsize(audio_file)
+        if size > self.max_bytes:
+            logger.info(f"Audio for {video_id} ({size} bytes) exceeds the cache budget, not caching")
+            return False
+
+        path = self._entry_path(video_id)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._link_or_copy(audio_file, temp_path)
+            with self._locked():
+                os.replace(temp_path, path)
+                now = time.time()
+                os.utime(path, (now, now))
+                self._evict(keep=video_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error caching audio for {video_id}: {str(e)}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+
+    def entries(self):
+        """
+        List cache entries, least recently used first
+
+        Returns:
+            List of (mtime, size, video_id) tuples
+        """
+        entries = []
+        for video_id in os.listdir(self.root):
+            path = os.path.join(self.root, video_id, AUDIO_NAME)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, video_id))
+        return sorted(entries)
+
+    def size(self):
+        """Total bytes of cached audio"""
+        return sum(size for _, size, _ in self.entries())
+
+    def _evict(self, keep=None):
+        """Remove least recently used entries until the cache fits its budget (caller holds the lock)"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, video_id in entries:
+            if total <= self.max_bytes:
+                break
+            if video_id == keep:
+                continue
+            shutil.rmtree(os.path.join(self.root, video_id), ignore_errors=True)
+            total -= size
+            logger.info(f"Evicted {video_id} from the audio cache")
+
+    def stats(self):
+        """Hit/miss counters for this process and the current cache size"""
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes
+        }
+
+
+# Example usage
+if __name__ == "__main__":
+    # Fill a small cache past its budget and watch LRU eviction
+    import tempfile
+
+    logging.basicConfig(level=logging.INFO)
+
+    with tempfile.TemporaryDirectory() as root:
+        cache = AudioCache(os.path.join(root, "cache"), max_bytes=3 * 1024)
+        for video_id in ("aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"):
+            audio = os.path.join(root, f"{video_id}.wav")
+            with open(audio, "wb") as f:
+                f.write(b"\0" * 1024)
+            cache.put(video_id, audio)
+            time.sleep(0.01)
+
+        # A hit makes the first entry the most recently used, so the next insert evicts the second
+        cache.get("aaaaaaaaaaa", os.path.join(root, "hit.wav"))
+        with open(os.path.join(root, "d.wav"), "wb") as f:
+            f.write(b"\0" * 1024)
+        cache.put("ddddddddddd", os.path.join(root, "d.wav"))
+
+        print([video_id for _, _, video_id in cache.entries()])
+        print(cache.stats())
@@ -0,0 +1,312 @@
+#!/usr/bin/python3
+# captions.py - Parse YouTube caption tracks into transcripts and decide when they can replace ASR
+
+import os
+import re
+import html
+import logging
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANGUAGES = ("en",)
+DEFAULT_MIN_COVERAGE = 0.5          # share of the video that captions must span
+DEFAULT_MIN_WORDS_PER_MINUTE = 30   # normal speech is 120-160
+CAPTION_FORMATS = ("srv3", "vtt")
+
+VTT_TIMING = re.compile(r"^(\S+)\s+-->\s+(\S+)")
+VTT_INLINE_TIME = re.compile(r"<(\d{1,2}:\d{2}(?::\d{2})?[.,]\d{3})>")
+TAG = re.compile(r"<[^>]+>")
+NON_SPEECH = re.compile(r"\[[^\]]*\]|\([^)]*(?:music|applause|laughter)[^)]*\)|♪", re.IGNORECASE)
+
+def _parse_timestamp(value):
+    """Seconds from a VTT timestamp (HH:MM:SS.mmm or MM:SS.mmm)"""
+    parts = value.replace(",", ".").split(":")
+    seconds = float(parts[-1])
+    if len(parts) > 1:
+        seconds += int(parts[-2]) * 60
+    if len(parts) > 2:
+        seconds += int(parts[-3]) * 3600
+    return seconds
+
+def _clean(text):
+    """Plain caption text: tags, entities and non-speech markers removed"""
+    text = html.unescape(TAG.sub("", text))
+    return " ".join(NON_SPEECH.sub(" ", text).split())
+
+def _segment(start, end, timed_words):
+    """
+    Build a transcript segment from (word, start) pairs
+
+    Words without a start time (None) get none; the others end where the
+    next word starts, the last one at the segment end.
+    """
+    words = []
+    for index, (word, word_start) in enumerate(timed_words):
+        entry = {"word": word}
+        if word_start is not None:
+            next_start = timed_words[index + 1][1] if index + 1 < len(timed_words) else None
+            entry["start"] = round(word_start, 3)
+            entry["end"] = round(max(next_start if next_start is not None else end, word_start), 3)
+        words.append(entry)
+    return {
+        "start": round(start, 3),
+        "end": round(end, 3),
+        "text": " ".join(word for word, _ in timed_words),
+        "words": words
+    }
+
+def _split_words(text, start):
+    """(word, start) pairs for every word of a caption text chunk"""
+    return [(word, start) for word in _clean(text).split()]
+
+def _finish(segments):
+    """Sort segments and end each one no later than the next begins (rolling captions overlap)"""
+    segments.sort(key=lambda segment: segment["start"])
+    for current, following in zip(segments, segments[1:]):
+        if current["end"] > following["start"]:
+            current["end"] = following["start"]
+            for word in current["words"]:
+                if "end" in word:
+                    word["end"] = min(word["end"], following["start"])
+    return segments
+
+def parse_vtt(text):
+    """
+    Parse WebVTT captions into transcript segments
+
+    YouTube's automatic captions are "rolling": each cue repeats the line
+    shown before it and adds a new line whose words carry inline
+    <hh:mm:ss.mmm> timestamps. Repeated lines are dropped and the inline
+    timestamps become word times. Manually authored captions have no
+    inline timestamps, so their words are not timed.
+
+    Args:
+        text: Contents of a .vtt file
+
+    Returns:
+        List of segments with start, end, text and words
+    """
+    cues = []
+    lines = text.replace("\r\n", "\n").split("\n")
+    index = 0
+    while index < len(lines):
+        match = VTT_TIMING.match(lines[index].strip())
+        index += 1
+        if not match:
+            continue
+        start, end = _parse_timestamp(match.group(1)), _parse_timestamp(match.group(2))
+        cue_lines = []
+        # Only an empty line ends a cue; YouTube's spacer lines hold a single space
+        while index < len(lines) and lines[index]:
+            cue_lines.append(lines[index])
+            index += 1
+        cues.append((start, end, cue_lines))
+
+    rolling = any(VTT_INLINE_TIME.search(line) for _, _, cue_lines in cues for line in cue_lines)
+    segments = []
+    previous = set()
+    for start, end, cue_lines in cues:
+        plain_lines = [_clean(line) for line in cue_lines]
+        timed_words = []
+        for line, plain in zip(cue_lines, plain_lines):
+            # Rolling captions repeat the previous cue's lines; only new lines count
+            if not plain or (rolling and plain in previous):
+                continue
+            parts = VTT_INLINE_TIME.split(line)
+            timed_words.extend(_split_words(parts[0], start if rolling else None))
+            for position in range(1, len(parts) - 1, 2):
+                timed_words.extend(_split_words(parts[position + 1], _parse_timestamp(parts[position])))
+        previous = set(plain_lines)
+        if timed_words:
+            segments.append(_segment(start, end, timed_words))
+    return _finish(segments)
+
+def parse_srv3(text):
+    """
+    Parse YouTube's SRV3 (timedtext format 3) captions into transcript segments
+
+    Each <p t="ms" d="ms"> is a segment. Automatic captions split it into
+    <s> word spans whose t attribute is the word offset in milliseconds.
+
+    Args:
+        text: Contents of a .srv3 file
+
+    Returns:
+        List of segments with start, end, text and words
+    """
+    root = ET.fromstring(text)
+    segments = []
+    for paragraph in root.iter("p"):
+        start = int(paragraph.get("t", 0)) / 1000
+        end = start + int(paragraph.get("d", 0)) / 1000
+        spans = paragraph.findall("s")
+
+        if spans:
+            timed_words = []
+            for span in spans:
+                offset = span.get("t")
+                word_start = start + int(offset) / 1000 if offset is not None else (
+                    timed_words[-1][1] if timed_words else start)
+                timed_words.extend(_split_words(span.text or "", word_start))
+        else:
+            timed_words = _split_words("".join(paragraph.itertext()), None)
+
+        if timed_words:
+            segments.append(_segment(start, end, timed_words))
+    return _finish(segments)
+
+def parse_captions(path):
+    """
+    Parse a caption file by its extension
+
+    Raises:
+        ValueError: If the format is not supported
+    """
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if extension == "vtt":
+        return parse_vtt(text)
+    if extension == "srv3":
+        return parse_srv3(text)
+    raise ValueError(f"Unsupported caption format: {extension}")
+
+def captions_to_transcript(segments, video_id, track):
+    """
+    Wrap caption segments in the full_transcript.json schema
+
+    Args:
+        segments: Parsed caption segments
+        video_id: YouTube video ID
+        track: Caption track dict (language, automatic, format)
+
+    Returns:
+        Transcript dict, marked with its caption source
+    """
+    return {
+        "segments": segments,
+        "language": track["language"].split("-")[0],
+        "video_id": video_id,
+        "transcribed_at": datetime.now().isoformat(),
+        "source": "captions",
+        "caption_track": {
+            "language": track["language"],
+            "automatic": track["automatic"],
+            "format": track["format"]
+        }
+    }
+
+
+class CaptionPolicy:
+    """
+    Decides whether a video's captions can stand in for ASR
+
+    Creator captions are preferred over automatic ones, and a language's
+    original track over its variants. A track is rejected if it is in
+    the wrong language, if it is automatic while automatic captions are
+    not allowed, or if it is too sparse: spanning less than min_coverage
+    of the video, or averaging fewer than min_words_per_minute. Automatic
+    captions of a video whose spoken language differs from the wanted
+    one are machine translations and are rejected as well.
+    """
+
+    def __init__(self, languages=DEFAULT_LANGUAGES, allow_automatic=True,
+                 min_coverage=DEFAULT_MIN_COVERAGE, min_words_per_minute=DEFAULT_MIN_WORDS_PER_MINUTE):
+        """
+        Initialize the policy
+
+        Args:
+            languages: Acceptable caption languages (base codes such as 'en')
+            allow_automatic: Accept YouTube's automatic captions
+            min_coverage: Minimum share of the video duration spanned by captions
+            min_words_per_minute: Minimum caption words per minute of video
+        """
+        self.languages = tuple(languages)
+        self.allow_automatic = allow_automatic
+        self.min_coverage = min_coverage
+        self.min_words_per_minute = min_words_per_minute
+
+    def _language_matches(self, language):
+        return bool(language) and language.split("-")[0].lower() in self.languages
+
+    def _rank(self, track):
+        """Sort key: creator captions first, then the base or -orig track of a language"""
+        language = track["language"]
+        exact = language in self.languages or language.endswith("-orig")
+        return (track["automatic"], not exact, language)
+
+    def evaluate(self, track, segments, duration=None, video_language=None):
+        """
+        Check one parsed track
+
+        Returns:
+            None if the track is usable, otherwise the reason it is not
+        """
+        if not self._language_matches(track["language"]):
+            return f"caption language {track['language']} is not one of {', '.join(self.languages)}"
+        if track["automatic"] and not self.allow_automatic:
+            return "only automatic captions are available"
+        if track["automatic"] and video_language and not self._language_matches(video_language):
+            return f"automatic captions are translated from {video_language}"
+        if not segments:
+            return "captions are empty"
+
+        if duration:
+            spanned = sum(segment["end"] - segment["start"] for segment in segments)
+            coverage = spanned / duration
+            if coverage < self.min_coverage:
+                return f"captions cover {coverage:.0%} of the video"
+            words = sum(len(segment["text"].split()) for segment in segments)
+            words_per_minute = words / (duration / 60)
+            if words_per_minute < self.min_words_per_minute:
+                return f"captions average {words_per_minute:.0f} words per minute"
+        return None
+
+    def choose(self, captions):
+        """
+        Pick the best usable track
+
+        Args:
+            captions: Result of YouTubeDownloader.fetch_captions, or None
+
+        Returns:
+            Dict with "accepted", "reason", and for an accepted track its
+            "track" and parsed "segments"
+        """
+        if not captions or not captions.get("tracks"):
+            return {"accepted": False, "reason": "no captions"}
+
+        reasons = []
+        for track in sorted(captions["tracks"], key=self._rank):
+            try:
+                segments = parse_captions(track["path"])
+            except Exception as e:
+                reasons.append(f"{track['language']}: unreadable ({str(e)})")
+                continue
+            reason = self.evaluate(track, segments, captions.get("duration"), captions.get("language"))
+            if reason is None:
+                return {"accepted": True, "reason": "usable", "track": track, "segments": segments}
+            reasons.append(f"{track['language']}: {reason}")
+        return {"accepted": False, "reason": "; ".join(reasons)}
+
+
+# Example usage
+if __name__ == "__main__":
+    # Parse the recorded caption snippets in tests/fixtures (no network needed) and apply the policy
+    import json
+
+    logging.basicConfig(level=logging.INFO)
+    fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "fixtures")
+
+    for name in ("auto.en.vtt", "manual.en.vtt", "auto.en.srv3"):
+        segments = parse_captions(os.path.join(fixtures, name))
+        print(f"{name}: {[segment['text'] for segment in segments]}")
+        print(f"  first words: {json.dumps(segments[0]['words'][:3])}")
+
+    track = {"path": os.path.join(fixtures, "auto.en.srv3"), "language": "en", "automatic": True, "format": "srv3"}
+    policy = CaptionPolicy()
+    print(policy.choose({"tracks": [track], "duration": 5}))
+    print(policy.choose({"tracks": [track], "duration": 600}))
+    print(CaptionPolicy(allow_automatic=False).choose({"tracks": [track], "duration": 5}))
@@ -0,0 +1,311 @@
+#!/usr/bin/python3
+# compact_transcript.py - Compact binary transcript format (.ytct)
+
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import logging
+from array import array
+from itertools import accumulate
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"YTCT"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIIII")
+HEADER_SIZE = 32  # HEADER.size padded so every section starts 4-byte aligned
+COMPACT_TRANSCRIPT_NAME = "transcript.ytct"
+
+NO_TIME = 0xFFFFFFFF   # duration sentinel for words without timestamps
+NO_TEXT = 0xFFFFFFFF   # segment text sentinel: text is the words joined by spaces
+NO_SCORE = 255         # score sentinel; real scores are quantized to 0..254
+
+class CompactTranscriptError(Exception):
+    """Exception raised for malformed compact transcripts"""
+    pass
+
+def _pad(length):
+    """Bytes needed to pad length up to a multiple of 4"""
+    return -length % 4
+
+def _le_bytes(values):
+    """Serialize an array as little-endian bytes"""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _to_ms(seconds):
+    """Convert seconds to integer milliseconds"""
+    return int(round(seconds * 1000))
+
+def encode_transcript(transcript):
+    """
+    Encode a full_transcript.json dict into the compact binary format
+
+    Layout (little-endian, sections 4-byte aligned):
+        header, metadata JSON, string offsets (u32), string data,
+        word string ids (u32), word start deltas in ms (i32),
+        word durations in ms (u32), segment word offsets (u32),
+        segment start/end in ms (i32), segment text ids (u32),
+        word scores quantized to a byte (u8)
+
+    Args:
+        transcript: Transcript dict with "segments" and their "words"
+
+    Returns:
+        Encoded bytes
+    """
+    strings = {}
+    def intern(value):
+        if value not in strings:
+            strings[value] = len(strings)
+        return strings[value]
+
+    word_ids = array("I")
+    start_deltas = array("i")
+    durations = array("I")
+    scores = array("B")
+    segment_offsets = array("I", [0])
+    segment_starts = array("i")
+    segment_ends = array("i")
+    segment_text_ids = array("I")
+
+    previous_start = 0
+    for segment in transcript.get("segments", []):
+        words = segment.get("words", [])
+        for word in words:
+            word_ids.append(intern(word.get("word", "")))
+            if "start" in word and "end" in word:
+                start_ms = _to_ms(word["start"])
+                start_deltas.append(start_ms - previous_start)
+                durations.append(max(_to_ms(word["end"]) - start_ms, 0))
+                previous_start = start_ms
+            else:
+                start_deltas.append(0)
+                durations.append(NO_TIME)
+            score = word.get("score")
+            scores.append(NO_SCORE if score is None else min(max(int(round(score * 254)), 0), 254))
+
+        segment_offsets.append(len(word_ids))
+        segment_starts.append(_to_ms(segment.get("start", 0)))
+        segment_ends.append(_to_ms(segment.get("end", 0)))
+
+        # Only store text that cannot be rebuilt from the words
+        text = segment.get("text", "")
+        joined = " ".join(word.get("word", "") for word in words)
+        segment_text_ids.append(NO_TEXT if text.strip() == joined else intern(text))
+
+    metadata = {key: value for key, value in transcript.items() if key != "segments"}
+    meta_bytes = json.dumps(metadata).encode("utf-8")
+
+    # Strings are NUL separated so readers can split them in one call
+    string_data = "\x00".join(strings).encode("utf-8")
+    string_offsets = array("I", [0])
+    for value in strings:
+        string_offsets.append(string_offsets[-1] + len(value.encode("utf-8")) + 1)
+
+    header = HEADER.pack(MAGIC, VERSION, 0, len(meta_bytes), len(strings),
+                         len(string_data), len(word_ids), len(segment_starts))
+    parts = [
+        header, b"\x00" * (HEADER_SIZE - HEADER.size),
+        meta_bytes, b"\x00" * _pad(len(meta_bytes)),
+        _le_bytes(string_offsets),
+        string_data, b"\x00" * _pad(len(string_data)),
+        _le_bytes(word_ids),
+        _le_bytes(start_deltas),
+        _le_bytes(durations),
+        _le_bytes(segment_offsets),
+        _le_bytes(segment_starts),
+        _le_bytes(segment_ends),
+        _le_bytes(segment_text_ids),
+        scores.tobytes(),
+    ]
+    return b"".join(parts)
+
+
+class CompactTranscript:
+    """Read-only view over an encoded transcript, backed by bytes or a memory map"""
+
+    def __init__(self, buffer):
+        """
+        Parse the header and section offsets without copying the arrays
+
+        Args:
+            buffer: bytes, bytearray, mmap or memoryview holding an encoded transcript
+        """
+        self._mmap = buffer if isinstance(buffer, mmap.mmap) else None
+        self._view = memoryview(buffer)
+        if len(self._view) < HEADER_SIZE:
+            raise CompactTranscriptError("Buffer too small for a compact transcript")
+
+        (magic, version, _, meta_len, self.num_strings, string_bytes,
+         self.num_words, self.num_segments) = HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC:
+            raise CompactTranscriptError("Not a compact transcript (bad magic)")
+        if version != VERSION:
+            raise CompactTranscriptError(f"Unsupported compact transcript version {version}")
+
+        offset = HEADER_SIZE
+        self.metadata = json.loads(bytes(self._view[offset:offset + meta_len]).decode("utf-8"))
+        offset += meta_len + _pad(meta_len)
+
+        self._string_offsets, offset = self._section(offset, "I", self.num_strings + 1)
+        self._string_data = self._view[offset:offset + string_bytes]
+        offset += string_bytes + _pad(string_bytes)
+
+        self.word_ids, offset = self._section(offset, "I", self.num_words)
+        self.start_deltas, offset = self._section(offset, "i", self.num_words)
+        self.durations, offset = self._section(offset, "I", self.num_words)
+        self.segment_offsets, offset = self._section(offset, "I", self.num_segments + 1)
+        self.segment_starts, offset = self._section(offset, "i", self.num_segments)
+        self.segment_ends, offset = self._section(offset, "i", self.num_segments)
+        self.segment_text_ids, offset = self._section(offset, "I", self.num_segments)
+        self.scores = self._view[offset:offset + self.num_words]
+
+        self._strings = None
+        self._word_starts = None
+
+    def _section(self, offset, typecode, count):
+        """Typed view over one section; zero-copy on little-endian hosts"""
+        size = count * 4
+        raw = self._view[offset:offset + size]
+        if len(raw) != size:
+            raise CompactTranscriptError("Compact transcript is truncated")
+        if sys.byteorder == "little":
+            return raw.cast(typecode), offset + size
+        values = array(typecode, bytes(raw))
+        values.byteswap()
+        return values, offset + size
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a compact transcript file"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped)
+
+    def close(self):
+        """Release the memory map, if any"""
+        for name in ("word_ids", "start_deltas", "durations", "segment_offsets",
+                     "segment_starts", "segment_ends", "segment_text_ids", "scores",
+                     "_string_offsets", "_string_data"):
+            value = getattr(self, name, None)
+            if isinstance(value, memoryview):
+                value.release()
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def strings(self):
+        """Decoded string table (decoded once, on first use)"""
+        if self._strings is None:
+            data = bytes(self._string_data).decode("utf-8")
+            self._strings = data.split("\x00") if self.num_strings else []
+        return self._strings
+
+    def word_starts(self):
+        """Absolute word start times in milliseconds"""
+        if self._word_starts is None:
+            self._word_starts = list(accumulate(self.start_deltas))
+        return self._word_starts
+
+    def segment_text(self, index):
+        """Text of one segment"""
+        text_id = self.segment_text_ids[index]
+        strings = self.strings()
+        if text_id != NO_TEXT:
+            return strings[text_id]
+        first, last = self.segment_offsets[index], self.segment_offsets[index + 1]
+        return " " + " ".join(map(strings.__getitem__, self.word_ids[first:last]))
+
+    def segments(self, include_words=True):
+        """
+        Rebuild segment dicts in the full_transcript.json schema
+
+        Args:
+            include_words: Also rebuild per-word dicts (slower; not needed for scanning)
+        """
+        segments = []
+        strings = self.strings() if include_words else None
+        starts = self.word_starts() if include_words else None
+
+        for index in range(self.num_segments):
+            segment = {
+                "start": self.segment_starts[index] / 1000,
+                "end": self.segment_ends[index] / 1000,
+                "text": self.segment_text(index)
+            }
+            if include_words:
+                words = []
+                for position in range(self.segment_offsets[index], self.segment_offsets[index + 1]):
+                    word = {"word": strings[self.word_ids[position]]}
+                    if self.durations[position] != NO_TIME:
+                        word["start"] = starts[position] / 1000
+                        word["end"] = (starts[position] + self.durations[position]) / 1000
+                    if self.scores[position] != NO_SCORE:
+                        word["score"] = round(self.scores[position] / 254, 3)
+                    words.append(word)
+                segment["words"] = words
+            segments.append(segment)
+        return segments
+
+    def to_dict(self, include_words=True):
+        """Rebuild the full transcript dict"""
+        transcript = dict(self.metadata)
+        transcript["segments"] = self.segments(include_words)
+        return transcript
+
+
+def save_compact_transcript(transcript, path):
+    """Encode a transcript and write it atomically to path"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(encode_transcript(transcript))
+    os.replace(temp_path, path)
+    return path
+
+def benchmark(json_path, iterations=5):
+    """
+    Compare size and parse time of a full_transcript.json against its compact form
+
+    Returns:
+        Dict with sizes and best-of-N parse times in milliseconds
+    """
+    with open(json_path, "rb") as f:
+        json_bytes = f.read()
+    compact_bytes = encode_transcript(json.loads(json_bytes))
+
+    def best_time(func):
+        best = None
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return round(best * 1000, 3)
+
+    return {
+        "json_bytes": len(json_bytes),
+        "compact_bytes": len(compact_bytes),
+        "size_ratio": round(len(json_bytes) / max(len(compact_bytes), 1), 2),
+        "json_parse_ms": best_time(lambda: json.loads(json_bytes)),
+        "compact_open_ms": best_time(lambda: CompactTranscript(compact_bytes)),
+        "compact_texts_ms": best_time(lambda: CompactTranscript(compact_bytes).segments(include_words=False)),
+        "compact_full_ms": best_time(lambda: CompactTranscript(compact_bytes).to_dict()),
+    }
+
+
+# Example usage
+if __name__ == "__main__":
+    # Benchmark a local transcript: python compact_transcript.py full_transcript.json
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) < 2:
+        print("Usage: python compact_transcript.py <full_transcript.json>")
+        sys.exit(1)
+
+    print(json.dumps(benchmark(sys.argv[1]), indent=2))
@@ -2,13 +2,30 @@
 #downloader.py - YouTube Downloader with Fallbacks
 
 import os
+import glob
+import json
 import subprocess
 import logging
 import re
 import time
+import random
+import threading
 
 logger = logging.getLogger(__name__)
 
+WAV_SAMPLE_RATE = 16000  # WhisperX input rate
+WAV_CHANNELS = 1
+CAPTION_TIMEOUT = 120  # seconds allowed for a caption-only yt-dlp call
+METADATA_TIMEOUT = 60  # seconds allowed for a metadata-only yt-dlp call
+PLAYLIST_TIMEOUT = 600  # seconds allowed for listing a playlist or channel
+VIDEO_ID_PATTERN = re.compile(r"^[0-9A-Za-z_-]{11}$")
+CHANNEL_URL_PATTERN = re.compile(r"youtube\.com/(@[^/?#]+|channel/[^/?#]+|c/[^/?#]+|user/[^/?#]+)/?$")
+DEFAULT_CONCURRENT_FRAGMENTS = 4
+CONCURRENCY_LEVELS = (1, 2, 4, 8, 16)  # choices of the auto-tuner
+TUNER_SMOOTHING = 0.3     # weight of the newest sample in a level's throughput average
+TUNER_EXPLORE_EVERY = 5   # downloads between tries of a neighbouring level
+TUNER_MIN_BYTES = 10 * 1024 * 1024  # smaller downloads mostly time yt-dlp's extraction
+
 class DownloadError(Exception):
     """Exception raised for errors during download"""
     pass
@@ -21,12 +38,133 @@ class NetworkError(DownloadError):
     """Exception raised for network-related errors"""
     pass
 
+class UnavailableError(DownloadError):
+    """Exception raised when a video cannot be downloaded by anyone (private, removed, ...)"""
+    pass
+
+# Phrases in yt-dlp and PyTubeFix errors, most specific class first
+UNAVAILABLE_PHRASES = ("video unavailable", "private video", "has been removed", "members-only",
+                       "this live event", "copyright", "videounavailable", "videoprivate", "membersonly")
+TOKEN_PHRASES = ("forbidden", "token", "botguard", "not a bot", "http error 429", "too many requests")
+NETWORK_PHRASES = ("network", "connection", "timed out")
+
+def classify_error(message):
+    """
+    Error class for a download failure message
+    
+    Returns:
+        UnavailableError, TokenError, NetworkError or DownloadError
+    """
+    message = message.lower()
+    for phrases, error_class in ((UNAVAILABLE_PHRASES, UnavailableError), (TOKEN_PHRASES, TokenError),
+                                 (NETWORK_PHRASES, NetworkError)):
+        if any(phrase in message for phrase in phrases):
+            return error_class
+    return DownloadError
+
+def video_metadata(info):
+    """
+    The parts of a yt-dlp info dict kept with jobs and results
+    
+    Args:
+        info: Info dict printed by yt-dlp --dump-json
+        
+    Returns:
+        Dict with title, duration (seconds), channel, channel_id,
+        upload_date (YYYYMMDD), language and chapters
+    """
+    return {
+        "title": info.get("title"),
+        "duration": info.get("duration"),
+        "channel": info.get("channel") or info.get("uploader"),
+        "channel_id": info.get("channel_id"),
+        "upload_date": info.get("upload_date"),
+        "language": info.get("language"),
+        "chapters": [
+            {"title": chapter.get("title"), "start": chapter.get("start_time"), "end": chapter.get("end_time")}
+            for chapter in info.get("chapters") or []
+        ]
+    }
+
+def _parse_info(stdout):
+    """Info dict from yt-dlp --dump-json output (the last line of stdout)"""
+    lines = stdout.strip().splitlines()
+    return json.loads(lines[-1]) if lines else {}
+
+
+class ConcurrencyTuner:
+    """
+    Picks the download concurrency from observed throughput
+    
+    Keeps a moving average of throughput per concurrency level. Most
+    downloads use the best level seen so far. Every few downloads one
+    tries a neighbouring level, so the choice follows changes in
+    bandwidth or throttling.
+    """
+    
+    def __init__(self, levels=CONCURRENCY_LEVELS, initial=DEFAULT_CONCURRENT_FRAGMENTS):
+        """Initialize the tuner"""
+        self.levels = list(levels)
+        self.current = min(self.levels, key=lambda level: abs(level - initial))
+        self.throughput = {}
+        self.downloads = 0
+        self._lock = threading.Lock()
+    
+    def choose(self):
+        """Concurrency level for the next download"""
+        with self._lock:
+            self.downloads += 1
+            if self.downloads % TUNER_EXPLORE_EVERY:
+                return self.current
+            index = self.levels.index(self.current)
+            neighbours = [self.levels[i] for i in (index - 1, index + 1) if 0 <= i < len(self.levels)]
+            return random.choice(neighbours) if neighbours else self.current
+    
+    def record(self, level, bytes_per_second):
+        """Record the throughput of a download and move to the best level"""
+        with self._lock:
+            previous = self.throughput.get(level)
+            self.throughput[level] = (bytes_per_second if previous is None else
+                                      TUNER_SMOOTHING * bytes_per_second + (1 - TUNER_SMOOTHING) * previous)
+            best = max(self.throughput, key=self.throughput.get)
+            if best != self.current:
+                logger.info(f"Download concurrency {self.current} -> {best} "
+                            f"({self.throughput[best] * 8 / 1e6:.1f} Mbit/s)")
+                self.current = best
+
+
 class YouTubeDownloader:
     """Downloads audio from YouTube videos with fallback mechanisms"""
     
-    def __init__(self, temp_dir="./temp"):
-        """Initialize the downloader"""
+    def __init__(self, temp_dir="./temp", concurrent_fragments=DEFAULT_CONCURRENT_FRAGMENTS,
+                 external_downloader=None, http_chunk_size=None):
+        """
+        Initialize the downloader
+        
+        Args:
+            temp_dir: Directory for temporary files
+            concurrent_fragments: Parallel connections per yt-dlp download, or "auto"
+                to tune it from observed throughput
+            external_downloader: Downloader yt-dlp hands the transfer to (e.g. "aria2c")
+            http_chunk_size: Size of the ranged requests a plain HTTP stream is
+                fetched in (e.g. "10M"), None for one request
+        """
         self.temp_dir = temp_dir
+        self.external_downloader = external_downloader
+        self.http_chunk_size = http_chunk_size
+        self.tuner = None
+        if concurrent_fragments == "auto":
+            self.tuner = ConcurrencyTuner()
+            self.concurrent_fragments = self.tuner.current
+        else:
+            self.concurrent_fragments = max(int(concurrent_fragments), 1)
+        
+        # Throughput of finished downloads, for reporting
+        self.downloads = 0
+        self.bytes_downloaded = 0
+        self.download_seconds = 0.0
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
         os.makedirs(temp_dir, exist_ok=True)
     
     def download(self, youtube_url, output_dir):
@@ -43,6 +181,24 @@ class YouTubeDownloader:
         Raises:
             DownloadError: If all download methods fail
         """
+        return self.download_with_metadata(youtube_url, output_dir)[0]
+    
+    def download_with_metadata(self, youtube_url, output_dir):
+        """
+        Download audio and capture the video's metadata in the same request
+        
+        Args:
+            youtube_url: YouTube video URL
+            output_dir: Directory to save the downloaded audio
+            
+        Returns:
+            Tuple of (path to downloaded MP4 audio file, metadata dict from video_metadata)
+            
+        Raises:
+            DownloadError: If all download methods fail. The subclass of the
+                most telling failure (UnavailableError, TokenError, NetworkError)
+                is kept, so callers can choose how to retry.
+        """
         os.makedirs(output_dir, exist_ok=True)
         output_file = os.path.join(output_dir, "audio.mp4")
         
@@ -52,48 +208,127 @@ class YouTubeDownloader:
             self._download_with_pytube,
         ]
         
-        last_error = None
+        errors = []
         for attempt, method in enumerate(methods, 1):
             try:
                 logger.info(f"Download attempt {attempt}/{len(methods)} using {method.__name__}")
-                return method(youtube_url, output_file)
+                started = time.time()
+                self._local.concurrency = 1
+                output_file, metadata = method(youtube_url, output_file)
+                self._record_download(method.__name__, output_file, time.time() - started)
+                return output_file, metadata
             except Exception as e:
-                last_error = e
+                errors.append(e)
                 logger.warning(f"Download method {method.__name__} failed: {str(e)}")
+                # No other method can fetch a video that is gone
+                if isinstance(e, UnavailableError):
+                    break
                 # Small delay between attempts
                 time.sleep(2)
         
-        # All methods failed
-        error_msg = f"All download methods failed for {youtube_url}: {str(last_error)}"
+        # All methods failed; longer backoff is up to the caller's retry policy
+        error_class = next((cls for cls in (UnavailableError, TokenError, NetworkError)
+                            if any(isinstance(e, cls) for e in errors)), DownloadError)
+        error_msg = f"All download methods failed for {youtube_url}: {str(errors[-1])}"
         logger.error(error_msg)
-        raise DownloadError(error_msg)
+        raise error_class(error_msg)
+    
+    def _record_download(self, method, output_file, seconds):
+        """
+        Log a finished download's throughput and feed it to the tuner
+        
+        The time covers the whole yt-dlp run, extraction included. Below
+        TUNER_MIN_BYTES that fixed cost outweighs the transfer, so such
+        downloads say little about the concurrency and the tuner skips them.
+        """
+        size = os.path.getsize(output_file)
+        bytes_per_second = size / max(seconds, 1e-3)
+        stats = {
+            "method": method,
+            "bytes": size,
+            "seconds": round(seconds, 2),
+            "mbps": round(bytes_per_second * 8 / 1e6, 2),
+            "concurrency": self._local.concurrency
+        }
+        self._local.last_download = stats
+        with self._stats_lock:
+            self.downloads += 1
+            self.bytes_downloaded += size
+            self.download_seconds += seconds
+        if self.tuner and method == "_download_with_ytdlp" and size >= TUNER_MIN_BYTES:
+            self.tuner.record(stats["concurrency"], bytes_per_second)
+        logger.info(f"Downloaded {size / 1e6:.1f} MB in {seconds:.1f}s ({stats['mbps']} Mbit/s, "
+                    f"concurrency {stats['concurrency']})")
+    
+    def last_download(self):
+        """Throughput stats of the latest download made by the calling thread, or None"""
+        return getattr(self._local, "last_download", None)
+    
+    def stats(self):
+        """Download throughput of this downloader so far"""
+        with self._stats_lock:
+            return {
+                "downloads": self.downloads,
+                "bytes": self.bytes_downloaded,
+                "mbps": round(self.bytes_downloaded * 8 / 1e6 / self.download_seconds, 2)
+                        if self.download_seconds else None,
+                "concurrency": self.tuner.current if self.tuner else self.concurrent_fragments,
+                "auto_tune": self.tuner is not None
+            }
+    
+    def _transfer_options(self, concurrency):
+        """
+        yt-dlp options controlling how the media is transferred
+        
+        Concurrent fragments parallelize fragmented (DASH/HLS) formats. A
+        plain HTTP audio stream is one file, which an external downloader
+        such as aria2c fetches over that many connections instead.
+        """
+        options = ["--concurrent-fragments", str(concurrency)]
+        if self.http_chunk_size:
+            options += ["--http-chunk-size", str(self.http_chunk_size)]
+        if self.external_downloader:
+            options += ["--downloader", self.external_downloader]
+            if os.path.basename(self.external_downloader) == "aria2c":
+                options += ["--downloader-args",
+                            f"aria2c:-x {concurrency} -s {concurrency} -k 1M --console-log-level=warn"]
+        return options
     
     def _download_with_ytdlp(self, youtube_url, output_file):
-        """Download using yt-dlp (most reliable)"""
+        """
+        Download using yt-dlp (most reliable)
+        
+        --dump-json with --no-simulate prints the info JSON of the same
+        extraction that downloads the audio, so metadata costs no extra
+        process or YouTube request.
+        """
+        concurrency = self.tuner.choose() if self.tuner else self.concurrent_fragments
+        self._local.concurrency = concurrency
         try:
             result = subprocess.run([
                 "yt-dlp", 
                 "-f", "bestaudio[ext=m4a]", 
+                "--no-simulate", "--dump-json",
+                *self._transfer_options(concurrency),
                 "-o", output_file,
                 youtube_url
             ], capture_output=True, text=True, check=False)
             
             # Check for errors in the output
             if result.returncode != 0:
-                error_output = result.stderr.lower()
-                
                 # Categorize errors for smarter retries
-                if "forbidden" in error_output or "token" in error_output:
-                    raise TokenError(f"YouTube token error: {result.stderr}")
-                elif "network" in error_output or "connection" in error_output:
-                    raise NetworkError(f"Network error: {result.stderr}")
-                else:
-                    raise DownloadError(f"yt-dlp error (code {result.returncode}): {result.stderr}")
+                raise classify_error(result.stderr)(f"yt-dlp error (code {result.returncode}): {result.stderr}")
             
             if not os.path.exists(output_file):
                 raise DownloadError("yt-dlp did not produce output file")
+            
+            try:
+                metadata = video_metadata(_parse_info(result.stdout))
+            except ValueError as e:
+                logger.warning(f"Could not parse yt-dlp info JSON: {str(e)}")
+                metadata = {}
                 
-            return output_file
+            return output_file, metadata
             
         except subprocess.SubprocessError as e:
             raise DownloadError(f"yt-dlp subprocess error: {str(e)}")
@@ -117,27 +352,35 @@ class YouTubeDownloader:
             
             if not os.path.exists(output_file):
                 raise DownloadError("PyTubeFix did not produce output file")
-                
-            return output_file
             
-        except Exception as e:
-            error_msg = str(e).lower()
+            metadata = {
+                "title": yt.title,
+                "duration": yt.length,
+                "channel": yt.author,
+                "channel_id": yt.channel_id,
+                "upload_date": yt.publish_date.strftime("%Y%m%d") if yt.publish_date else None,
+                "language": None,
+                "chapters": []
+            }
+            return output_file, metadata
             
+        except Exception as e:
             # Categorize errors for smarter retries
-            if "token" in error_msg or "botguard" in error_msg:
-                raise TokenError(f"YouTube token error: {str(e)}")
-            elif "network" in error_msg or "connection" in error_msg:
-                raise NetworkError(f"Network error: {str(e)}")
-            else:
-                raise DownloadError(f"PyTubeFix error: {str(e)}")
+            raise classify_error(f"{type(e).__name__}: {str(e)}")(f"PyTubeFix error: {str(e)}")
     
-    def convert_to_wav(self, input_file, output_dir=None):
+    def convert_to_wav(self, input_file, output_dir=None, sample_rate=WAV_SAMPLE_RATE, channels=WAV_CHANNELS):
         """
         Convert MP4 audio to WAV format
         
+        The default is 16-bit mono PCM at 16 kHz, the rate WhisperX resamples
+        to anyway: about 2 MB per minute instead of 10 MB for CD-quality
+        stereo, which keeps the audio cache and S3-staged audio small.
+        
         Args:
             input_file: Path to MP4 audio file
             output_dir: Directory to save WAV file (defaults to same as input)
+            sample_rate: Output sample rate in Hz
+            channels: Output channel count
             
         Returns:
             Path to WAV audio file
@@ -150,7 +393,9 @@ class YouTubeDownloader:
         try:
             # Run ffmpeg with reduced output
             result = subprocess.run([
-                "ffmpeg", "-y", "-i", input_file, output_file
+                "ffmpeg", "-y", "-i", input_file,
+                "-ac", str(channels), "-ar", str(sample_rate), "-c:a", "pcm_s16le",
+                output_file
             ], capture_output=True, text=True, check=False)
             
             if result.returncode != 0:
@@ -165,6 +410,121 @@ class YouTubeDownloader:
             logger.error(f"Error converting to WAV: {str(e)}")
             raise
     
+    def fetch_captions(self, youtube_url, output_dir, languages=("en",)):
+        """
+        Download a video's caption tracks without downloading any media
+        
+        Creator captions and YouTube's automatic captions are both requested
+        (SRV3, which has word timings, or VTT) in one yt-dlp call. The info
+        JSON printed by the same call tells the two apart and gives the
+        duration and spoken language the caption policy needs.
+        
+        Args:
+            youtube_url: YouTube video URL
+            output_dir: Directory to save caption files
+            languages: Base language codes to fetch (variants such as en-US are included)
+            
+        Returns:
+            Dict with "tracks" (path, language, format, automatic), "duration",
+            "language" and the video "metadata", or None if captions could not be fetched
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        try:
+            result = subprocess.run([
+                "yt-dlp",
+                "--skip-download", "--no-simulate", "--dump-json",
+                "--write-subs", "--write-auto-subs",
+                "--sub-langs", ",".join(f"{language}.*" for language in languages),
+                "--sub-format", "srv3/vtt/best",
+                "-o", os.path.join(output_dir, "captions.%(ext)s"),
+                youtube_url
+            ], capture_output=True, text=True, check=False, timeout=CAPTION_TIMEOUT)
+            
+            if result.returncode != 0:
+                logger.warning(f"yt-dlp could not fetch captions (code {result.returncode}): {result.stderr[-500:]}")
+                return None
+            info = _parse_info(result.stdout)
+        except Exception as e:
+            logger.warning(f"Error fetching captions for {youtube_url}: {str(e)}")
+            return None
+        
+        manual = info.get("subtitles") or {}
+        tracks = []
+        for path in sorted(glob.glob(os.path.join(output_dir, "captions.*.*"))):
+            _, language, extension = os.path.basename(path).rsplit(".", 2)
+            tracks.append({
+                "path": path,
+                "language": language,
+                "format": extension,
+                "automatic": language not in manual
+            })
+        
+        logger.info(f"Fetched {len(tracks)} caption tracks for {youtube_url}")
+        return {
+            "tracks": tracks,
+            "duration": info.get("duration"),
+            "language": info.get("language"),
+            "metadata": video_metadata(info)
+        }
+    
+    def fetch_metadata(self, youtube_url):
+        """
+        Fetch a video's metadata without downloading it
+        
+        Only needed when the audio did not come from YouTube (cache or
+        staged audio) and no earlier attempt recorded the metadata.
+        
+        Returns:
+            Metadata dict from video_metadata, or None on error
+        """
+        try:
+            result = subprocess.run([
+                "yt-dlp", "--skip-download", "--dump-json", youtube_url
+            ], capture_output=True, text=True, check=False, timeout=METADATA_TIMEOUT)
+            if result.returncode != 0:
+                logger.warning(f"yt-dlp could not fetch metadata (code {result.returncode}): {result.stderr[-500:]}")
+                return None
+            return video_metadata(_parse_info(result.stdout))
+        except Exception as e:
+            logger.warning(f"Error fetching metadata for {youtube_url}: {str(e)}")
+            return None
+    
+    def list_videos(self, collection_url):
+        """
+        List the videos of a playlist or channel without visiting each video
+        
+        Uses yt-dlp's flat extraction, which reads only the listing pages,
+        so a channel of thousands of videos takes one process and a few
+        requests. A bare channel URL lists its uploads (the videos tab).
+        
+        Args:
+            collection_url: Playlist or channel URL
+            
+        Returns:
+            List of video IDs, in listing order
+            
+        Raises:
+            DownloadError: If yt-dlp could not list the collection
+        """
+        if CHANNEL_URL_PATTERN.search(collection_url):
+            collection_url = collection_url.rstrip("/") + "/videos"
+        
+        try:
+            result = subprocess.run([
+                "yt-dlp", "--flat-playlist", "--print", "id", collection_url
+            ], capture_output=True, text=True, check=False, timeout=PLAYLIST_TIMEOUT)
+        except subprocess.SubprocessError as e:
+            raise DownloadError(f"yt-dlp subprocess error: {str(e)}")
+        
+        if result.returncode != 0:
+            raise classify_error(result.stderr)(f"yt-dlp could not list {collection_url} "
+                                                f"(code {result.returncode}): {result.stderr.strip()[-500:]}")
+        
+        # Nested playlists (e.g. channel tabs) print their own IDs; keep only videos
+        video_ids = [line.strip() for line in result.stdout.splitlines() if VIDEO_ID_PATTERN.match(line.strip())]
+        logger.info(f"Listed {len(video_ids)} videos in {collection_url}")
+        return video_ids
+    
     def extract_video_id(self, youtube_url):
         """Extract video ID from YouTube URL"""
         match = re.search(r'(?:v=|\/)([0-9A-Za-z_-]{11}).*', youtube_url)
@@ -191,8 +551,10 @@ if __name__ == "__main__":
         print(f"Video ID: {video_id}")
         
         # Download audio
-        mp4_file = downloader.download(video_url, temp_dir)
+        mp4_file, metadata = downloader.download_with_metadata(video_url, temp_dir)
         print(f"Downloaded MP4: {mp4_file}")
+        print(f"Title: {metadata.get('title')} ({metadata.get('duration')}s, {metadata.get('channel')})")
+        print(f"Throughput: {downloader.last_download()}")
         
         # Convert to WAV
         wav_file = downloader.convert_to_wav(mp4_file)
@@ -0,0 +1,314 @@
+#!/usr/bin/python3
+# inference_server.py - Shared WhisperX inference server for worker processes on one host
+
+import os
+import sys
+import time
+import argparse
+import logging
+import subprocess
+import threading
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from multiprocessing.connection import Listener, Client
+
+from transcriber import Transcriber, TranscriptionError, AudioProcessingError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/tmp/youtube-inference.sock"
+SAMPLE_RATE = 16000  # WhisperX input rate
+SAMPLE_DTYPE = np.float32
+
+def attach_shared_memory(name):
+    """
+    Attach to a shared memory block created by another process
+
+    The creator owns the block and unlinks it; the attaching process must
+    not register it with its resource tracker, or the block would be
+    unlinked (with a warning) when this process exits.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track argument
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+def decode_audio(audio_file, sample_rate=SAMPLE_RATE):
+    """
+    Decode any audio file to mono float32 PCM at sample_rate with ffmpeg
+
+    Returns:
+        Raw little-endian float32 bytes
+    """
+    result = subprocess.run([
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", audio_file,
+        "-f", "f32le", "-ac", "1", "-acodec", "pcm_f32le", "-ar", str(sample_rate), "-"
+    ], capture_output=True, check=False)
+
+    if result.returncode != 0:
+        raise AudioProcessingError(f"ffmpeg error (code {result.returncode}): "
+                                   f"{result.stderr.decode('utf-8', 'replace')[-500:]}")
+    return result.stdout
+
+
+class InferenceServer:
+    """
+    Owns the WhisperX models and serves transcribe/align requests over a local socket
+
+    Clients put 16 kHz mono float32 audio in a shared memory block and send
+    its name with the sample range of a chunk. The server reads the samples
+    in place (no copy through the socket) and replies with aligned segments.
+    Requests from all clients share one model and run one at a time.
+    """
+
+    def __init__(self, transcriber, address=DEFAULT_SOCKET):
+        """
+        Initialize the server
+
+        Args:
+            transcriber: Transcriber whose models serve every request
+            address: Unix socket path to listen on
+        """
+        self.transcriber = transcriber
+        self.address = address
+        self._model_lock = threading.Lock()
+        self._listener = None
+        self.requests = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.time()
+
+    def serve_forever(self):
+        """Load the models and accept clients until interrupted"""
+        self.transcriber.load_model()
+
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        self._listener = Listener(self.address, family="AF_UNIX")
+        # Requests are pickled: only processes of the same user may connect
+        os.chmod(self.address, 0o600)
+        logger.info(f"Inference server listening on {self.address}")
+
+        try:
+            while True:
+                conn = self._listener.accept()
+                threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop listening and remove the socket"""
+        if self._listener:
+            self._listener.close()
+            self._listener = None
+        if os.path.exists(self.address):
+            os.remove(self.address)
+
+    def _serve_client(self, conn):
+        """Answer one client's requests until it disconnects"""
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    break
+                conn.send(self.handle(request))
+        finally:
+            conn.close()
+
+    def handle(self, request):
+        """
+        Handle one request
+
+        Requests:
+            {"op": "ping"}
+            {"op": "transcribe", "shm": name, "offset": first sample, "length": samples,
+             "language": code}
+
+        Returns:
+            {"ok": True, ...} or {"ok": False, "error": message}
+        """
+        op = request.get("op")
+        try:
+            if op == "ping":
+                return {"ok": True, "model": self.transcriber.model_name, "device": self.transcriber.device,
+                        "requests": self.requests,
+                        "utilization": round(self.busy_seconds / max(time.time() - self.started_at, 1e-9), 3)}
+
+            if op == "transcribe":
+                shm = attach_shared_memory(request["shm"])
+                try:
+                    audio = np.ndarray((request["length"],), dtype=SAMPLE_DTYPE, buffer=shm.buf,
+                                       offset=request["offset"] * np.dtype(SAMPLE_DTYPE).itemsize)
+                    with self._model_lock:
+                        started = time.time()
+                        try:
+                            segments = self.transcriber.transcribe_chunk(audio, request.get("language", "en"))
+                        finally:
+                            self.busy_seconds += time.time() - started
+                            self.requests += 1
+                    del audio  # release the view before closing the block
+                    return {"ok": True, "segments": segments}
+                finally:
+                    shm.close()
+
+            return {"ok": False, "error": f"Unknown op: {op}"}
+        except Exception as e:
+            logger.error(f"Error handling {op} request: {str(e)}")
+            return {"ok": False, "error": str(e)}
+
+
+class RemoteTranscriber(Transcriber):
+    """
+    Transcriber that sends audio to an InferenceServer instead of loading models
+
+    Chunking, resume, progress tracking and S3 persistence are inherited
+    from Transcriber; only transcribe_chunk runs remotely. Each file is
+    decoded once into a shared memory block and chunks are sent as sample
+    ranges of it. The model name is the server's, asked with a ping the
+    first time it is needed.
+    """
+
+    def __init__(self, address=DEFAULT_SOCKET, **kwargs):
+        """
+        Initialize the client
+
+        Args:
+            address: Unix socket of the inference server
+            kwargs: Transcriber options (s3_bucket, region, chunk_size, compression, ...)
+        """
+        kwargs.setdefault("device", "cpu")
+        super().__init__(**kwargs)
+        self.address = address
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        self._shm = None
+
+    @property
+    def model_name(self):
+        """Model the server transcribes with"""
+        if self._server_model is None:
+            self._server_model = self.ping()["model"]
+        return self._server_model
+
+    @model_name.setter
+    def model_name(self, value):
+        # The local default says nothing about the server's model
+        self._server_model = None
+
+    def load_model(self):
+        """Connect to the server (the models live there)"""
+        if self._conn is None:
+            self._conn = Client(self.address, family="AF_UNIX")
+
+    def _request(self, request):
+        """Send a request, reconnecting once if the server restarted"""
+        with self._conn_lock:
+            for attempt in range(2):
+                try:
+                    self.load_model()
+                    self._conn.send(request)
+                    response = self._conn.recv()
+                    break
+                except (EOFError, OSError) as e:
+                    self._conn = None
+                    if attempt:
+                        raise TranscriptionError(f"Inference server unavailable: {str(e)}")
+        if not response.get("ok"):
+            raise TranscriptionError(f"Inference server error: {response.get('error')}")
+        return response
+
+    def ping(self):
+        """Server status"""
+        return self._request({"op": "ping"})
+
+    def prepare_chunks(self, audio_file, output_dir):
+        """
+        Decode the file into shared memory
+
+        Returns:
+            List of (first sample, sample count) chunk ranges
+        """
+        self.release_chunks()
+        pcm = decode_audio(audio_file)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(len(pcm), 1))
+        self._shm.buf[:len(pcm)] = pcm
+
+        total_samples = len(pcm) // np.dtype(SAMPLE_DTYPE).itemsize
+        chunk_samples = int(self.chunk_size * SAMPLE_RATE)
+        chunks = [(start, min(chunk_samples, total_samples - start))
+                  for start in range(0, total_samples, chunk_samples)]
+        logger.info(f"Decoded {total_samples / SAMPLE_RATE:.0f}s of audio into {len(chunks)} chunks")
+        return chunks
+
+    def release_chunks(self):
+        """Free the shared memory block of the current file"""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def transcribe_chunk(self, chunk, language="en"):
+        """Transcribe one chunk range on the server"""
+        offset, length = chunk
+        response = self._request({
+            "op": "transcribe",
+            "shm": self._shm.name,
+            "offset": offset,
+            "length": length,
+            "language": language
+        })
+        return response["segments"]
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Serve WhisperX transcription to the worker processes on this host."
+    )
+    parser.add_argument(
+        "--socket", "-s",
+        type=str,
+        default=DEFAULT_SOCKET,
+        help=f"Unix socket to listen on. (Default: '{DEFAULT_SOCKET}')"
+    )
+    parser.add_argument(
+        "--model", "-m",
+        type=str,
+        default="large-v2",
+        help="WhisperX model to load. (Default: 'large-v2')"
+    )
+    parser.add_argument(
+        "--cpu",
+        action="store_true",
+        help="Use CPU instead of GPU for transcription."
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    args = parse_arguments()
+
+    transcriber = Transcriber(model_name=args.model, device="cpu" if args.cpu else "cuda")
+    server = InferenceServer(transcriber, args.socket)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Inference server stopped")
+    except Exception as e:
+        print(f"Error running inference server: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,37 @@
 import json
 import time
 import uuid
+import hashlib
 import logging
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 import boto3
 import os
 
+from storage import get_json, is_condition_failure, update_object
+
 logger = logging.getLogger(__name__)
 
+LOCK_MINUTES = 10
+DEFAULT_PROGRESS_INTERVAL = 30  # seconds between debounced progress writes
+DEFAULT_PROGRESS_STEPS = 10     # progress updates that force a write
+DEFAULT_WORKER_TTL = 30 * 60    # seconds a worker heartbeat counts as live
+DEFAULT_FETCH_WORKERS = 16      # threads used to fetch job records in bulk
+JOB_INDEX_PREFIX = "jobs/index"
+LEGACY_INDEX_KEY = "jobs/index.json"  # single-object index replaced by the shards
+INDEX_SHARDS = 16               # index objects, by job ID hash, so transitions rarely contend
+INDEX_MAX_RETRIES = 10          # conditional index writes before giving up
+INDEX_MAX_COMPLETED = 5000      # completed jobs kept in the index (counts stay exact)
+INDEX_MAX_FAILED = 5000         # failed jobs kept in the index (counts stay exact)
+INDEX_QUEUED_TTL = 14 * 24 * 60 * 60  # seconds a queued entry is kept (the longest SQS keeps a message)
+JOB_BACKENDS = ("s3", "sqlite")
+MAX_ATTEMPTS = 3                # attempts before an abandoned job fails, without a retry policy
+
+class JobConflictError(Exception):
+    """Raised when a conditional job write loses to a concurrent writer"""
+    pass
+
 class JobState:
     """Job state constants"""
     QUEUED = "queued"
@@ -18,17 +42,85 @@ class JobState:
     COMPLETED = "completed"
     FAILED = "failed"
 
+class JobStage:
+    """
+    Checkpointed stages of a job, in the order they run
+    
+    A finished stage is recorded in the job's "stages" map together with
+    its artifact (where its output is stored), so a retry on any worker
+    resumes at the first stage that is not recorded.
+    """
+    AUDIO = "audio"            # 16 kHz mono PCM, optionally staged to S3
+    METADATA = "metadata"      # video title and similar details
+    TRANSCRIPT = "transcript"  # full transcript in S3 (chunks are checkpointed by the transcriber)
+    RESULTS = "results"        # scan results in S3
+    ORDER = (AUDIO, METADATA, TRANSCRIPT, RESULTS)
+    
+    @staticmethod
+    def next_stage(job):
+        """First stage not yet recorded for a job, or None if every stage is done"""
+        stages = (job or {}).get("stages") or {}
+        return next((stage for stage in JobStage.ORDER if stage not in stages), None)
+
+def retry_abandoned(job, retry_policy=None):
+    """
+    True if an abandoned job gets another attempt
+    
+    Args:
+        job: Job dict
+        retry_policy: RetryPolicy whose per-class budgets apply (Default: MAX_ATTEMPTS for every job)
+    """
+    if retry_policy is not None:
+        return retry_policy.decide_abandoned(job)["retry"]
+    return job.get("attempts", 0) < MAX_ATTEMPTS
+
 class JobTracker:
     """Simple S3-based job tracking system"""
     
-    def __init__(self, s3_bucket, region="us-east-1"):
-        """Initialize the job tracker with S3 bucket"""
+    def __init__(self, s3_bucket, region="us-east-1",
+                 progress_interval=DEFAULT_PROGRESS_INTERVAL, progress_steps=DEFAULT_PROGRESS_STEPS,
+                 s3_client=None, worker_ttl=DEFAULT_WORKER_TTL):
+        """
+        Initialize the job tracker with S3 bucket
+        
+        Args:
+            s3_bucket: S3 bucket for job records
+            region: AWS region
+            progress_interval: Maximum seconds a progress update waits before it is written
+            progress_steps: Number of buffered progress updates that forces a write
+            s3_client: S3 client to use (Default: a boto3 client for region)
+            worker_ttl: Seconds since its last heartbeat that a worker still counts as live
+        """
         self.s3_bucket = s3_bucket
-        self.s3 = boto3.client('s3', region_name=region)
+        self.s3 = s3_client or boto3.client('s3', region_name=region)
         self.worker_id = f"worker-{uuid.uuid4()}"
+        self.progress_interval = progress_interval
+        self.progress_steps = progress_steps
+        self.worker_ttl = worker_ttl
+        
+        # In-memory copies of jobs this worker is processing, so progress
+        # updates do not need a GET and can be written on a debounce
+        self._owned_jobs = {}
+        self._etags = {}
+        self._lost_jobs = set()
+        self._created_etags = {}     # queued records written by create_job, until claimed
+        self._heartbeats = {}        # heartbeat key -> (ETag, status) as last read
+        self._pending_steps = {}
+        self._last_write = {}
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._flusher = None
     
     def create_job(self, job_id, video_id, youtube_url, phrase):
-        """Create a new job in the queued state"""
+        """
+        Create a new job in the queued state
+        
+        Creating a job that already exists (a redelivered message) keeps its
+        attempts and recorded stages, so the retry resumes where the last
+        attempt stopped. A job being processed is left alone.
+        """
         job = {
             "job_id": job_id,
             "video_id": video_id,
@@ -41,36 +133,182 @@ class JobTracker:
             "error": None
         }
         
-        self._save_job(job, JobState.QUEUED)
+        # The index says whether (and where) the job exists without probing every folder
+        previous_status = self.get_job_status(job_id)
+        existing = self.get_job_by_status(job_id, previous_status) if previous_status else None
+        if existing:
+            if previous_status == JobState.PROCESSING:
+                return existing
+            for field in ("created_at", "attempts", "stages", "error"):
+                if field in existing:
+                    job[field] = existing[field]
+        
+        etag = self._save_job(job, JobState.QUEUED)
+        if etag:
+            with self._lock:
+                self._created_etags[job_id] = etag
+        if existing and previous_status != JobState.QUEUED:
+            self._delete_job(job_id, previous_status)
+        self._update_index(job)
         return job
     
     def start_processing(self, job_id, worker_id=None):
-        """Mark a job as being processed by this worker"""
-        job = self.get_job(job_id)
-        if not job:
-            return None
-            
-        # Move from queued to processing
-        if job.get("status") == JobState.QUEUED:
-            self._delete_job(job_id, JobState.QUEUED)
+        """
+        Claim a job for this worker
+        
+        The claim is a conditional write of jobs/processing/{job_id}.json:
+        it is created with If-None-Match, or taken over from an expired lease
+        with If-Match, so exactly one of several racing workers wins.
+        
+        Returns:
+            Job dict, or None if the job does not exist or another worker holds it
+        """
+        worker_id = worker_id or self.worker_id
+        job, etag = self._get_job_with_etag(job_id, JobState.PROCESSING)
+        if job:
+            if job.get("worker_id") != worker_id and not self._lease_expired(job):
+                logger.info(f"Job {job_id} is already being processed by {job.get('worker_id')}")
+                self._discard_created(job_id)
+                return None
+        else:
+            job = self.get_job(job_id)
+            if not job:
+                return None
+        
+        previous_status = job.get("status")
         
         # Update job status
         job["status"] = JobState.PROCESSING
-        job["worker_id"] = worker_id or self.worker_id
+        job["worker_id"] = worker_id
         job["updated_at"] = datetime.now().isoformat()
-        job["lock_until"] = (datetime.now() + timedelta(minutes=10)).isoformat()
+        job["lock_until"] = (datetime.now() + timedelta(minutes=LOCK_MINUTES)).isoformat()
         
-        self._save_job(job, JobState.PROCESSING)
-        return job
+        with self._io_lock:
+            try:
+                if etag:
+                    new_etag = self._save_job(job, JobState.PROCESSING, if_match=etag)
+                else:
+                    new_etag = self._save_job(job, JobState.PROCESSING, if_none_match=True)
+            except JobConflictError:
+                logger.info(f"Job {job_id} was claimed by another worker")
+                self._discard_created(job_id)
+                return None
+            if not new_etag:
+                return None
+            
+            # Move from queued to processing only once the claim is ours
+            with self._lock:
+                self._created_etags.pop(job_id, None)
+            if previous_status == JobState.QUEUED:
+                self._delete_job(job_id, JobState.QUEUED)
+            
+            with self._lock:
+                self._owned_jobs[job_id] = job
+                self._etags[job_id] = new_etag
+                self._pending_steps[job_id] = 0
+                self._last_write[job_id] = time.time()
+                self._lost_jobs.discard(job_id)
+                claimed = dict(job)
+        
+        self._update_index(claimed)
+        self._ensure_flusher()
+        return dict(claimed)
+    
+    def _discard_created(self, job_id):
+        """
+        Delete the queued record create_job wrote for a job another worker claimed
+        
+        The delete is conditional on the record's ETag, so a queued record
+        written since (the owner requeueing the job) is kept.
+        """
+        with self._lock:
+            etag = self._created_etags.pop(job_id, None)
+        if etag and self._delete_job(job_id, JobState.QUEUED, if_match=etag):
+            # The index entry create_job wrote is just as stale
+            current = self.get_job_by_status(job_id, JobState.PROCESSING)
+            if current:
+                self._update_index(current)
+    
+    def renew_lease(self, job_id):
+        """
+        Extend the lock on an owned job now, writing any buffered progress with it
+        
+        Returns:
+            True if this tracker still holds the job
+        """
+        with self._lock:
+            if job_id not in self._owned_jobs:
+                return False
+            self._pending_steps[job_id] += 1
+        
+        self.flush(job_id, force=True)
+        with self._lock:
+            return job_id in self._owned_jobs
+    
+    def record_stage(self, job_id, stage, artifact=None):
+        """
+        Record a finished stage of an owned job, written immediately
+        
+        Args:
+            job_id: Job ID
+            stage: One of JobStage.ORDER
+            artifact: Dict describing the stage output (e.g. its S3 key)
+            
+        Returns:
+            True if the stage was recorded on a job this tracker still holds
+        """
+        with self._lock:
+            job = self._owned_jobs.get(job_id)
+            if job is None:
+                logger.warning(f"Cannot record stage {stage} of job {job_id}: not processing it here")
+                return False
+            entry = dict(artifact or {})
+            entry["completed_at"] = datetime.now().isoformat()
+            job.setdefault("stages", {})[stage] = entry
+            job["updated_at"] = entry["completed_at"]
+            self._pending_steps[job_id] += 1
+        
+        # A checkpoint is only useful if it survives this worker, so no debounce
+        self.flush(job_id, force=True)
+        with self._lock:
+            return job_id in self._owned_jobs
+    
+    def lease_lost(self, job_id):
+        """True if another worker took over a job this tracker was processing"""
+        with self._lock:
+            return job_id in self._lost_jobs
     
     def update_progress(self, job_id, total_chunks=None, completed_chunks=None):
-        """Update job progress"""
+        """
+        Update job progress
+        
+        For jobs this tracker is processing, the update is applied in memory
+        and written by the background flusher once progress_interval seconds
+        or progress_steps updates have accumulated.
+        """
+        with self._lock:
+            job = self._owned_jobs.get(job_id)
+            if job is not None:
+                job["updated_at"] = datetime.now().isoformat()
+                if total_chunks is not None:
+                    job["total_chunks"] = total_chunks
+                if completed_chunks is not None:
+                    job["completed_chunks"] = completed_chunks
+                self._pending_steps[job_id] += 1
+                due = self._pending_steps[job_id] >= self.progress_steps
+        
+        if job is not None:
+            if due:
+                self._wake.set()
+            return True
+        
+        # Not a job we own: fall back to a direct read-modify-write
         job = self.get_job_by_status(job_id, JobState.PROCESSING)
         if not job:
             return False
             
         job["updated_at"] = datetime.now().isoformat()
-        job["lock_until"] = (datetime.now() + timedelta(minutes=10)).isoformat()
+        job["lock_until"] = (datetime.now() + timedelta(minutes=LOCK_MINUTES)).isoformat()
         
         if total_chunks is not None:
             job["total_chunks"] = total_chunks
@@ -81,50 +319,239 @@ class JobTracker:
         self._save_job(job, JobState.PROCESSING)
         return True
     
+    def flush(self, job_id=None, force=False):
+        """
+        Write buffered progress to S3
+        
+        Args:
+            job_id: Only flush this job (Default: every owned job)
+            force: Write even if the debounce interval has not elapsed
+            
+        Returns:
+            Number of jobs written
+        """
+        written = 0
+        with self._lock:
+            job_ids = [job_id] if job_id else list(self._owned_jobs)
+        
+        for current_id in job_ids:
+            with self._io_lock:
+                with self._lock:
+                    job = self._owned_jobs.get(current_id)
+                    if job is None or self._pending_steps.get(current_id, 0) == 0:
+                        continue
+                    elapsed = time.time() - self._last_write.get(current_id, 0)
+                    if not (force or elapsed >= self.progress_interval
+                            or self._pending_steps[current_id] >= self.progress_steps):
+                        continue
+                    job["lock_until"] = (datetime.now() + timedelta(minutes=LOCK_MINUTES)).isoformat()
+                    snapshot = dict(job)
+                    etag = self._etags.get(current_id)
+                    self._pending_steps[current_id] = 0
+                    self._last_write[current_id] = time.time()
+                
+                try:
+                    new_etag = self._save_job(snapshot, JobState.PROCESSING, if_match=etag)
+                except JobConflictError:
+                    logger.warning(f"Lost the lease on job {current_id} to another worker")
+                    self._release_job(current_id)
+                    with self._lock:
+                        self._lost_jobs.add(current_id)
+                    continue
+                if new_etag:
+                    with self._lock:
+                        self._etags[current_id] = new_etag
+                    written += 1
+        
+        return written
+    
+    def stop(self):
+        """Stop the background flusher after writing any buffered progress"""
+        self._stopped.set()
+        self._wake.set()
+        if self._flusher:
+            self._flusher.join(timeout=10)
+        self.flush(force=True)
+    
+    def _ensure_flusher(self):
+        """Start the background flusher thread on first use"""
+        if self._flusher is None or not self._flusher.is_alive():
+            self._stopped.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, name="job-progress-flusher", daemon=True)
+            self._flusher.start()
+    
+    def _flush_loop(self):
+        """Background loop: write due progress updates"""
+        while not self._stopped.is_set():
+            self._wake.wait(timeout=1)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing job progress: {str(e)}")
+    
+    def _release_job(self, job_id):
+        """Stop tracking an owned job and return its in-memory copy (caller holds _io_lock)"""
+        with self._lock:
+            self._pending_steps.pop(job_id, None)
+            self._last_write.pop(job_id, None)
+            return self._owned_jobs.pop(job_id, None)
+    
+    def _finish_owned(self, job_id, job, etag):
+        """
+        Mark an owned processing record finished with an If-Match write
+        
+        Returns:
+            True if this worker still held the lease
+        """
+        job["lock_until"] = datetime.now().isoformat()
+        try:
+            self._save_job(job, JobState.PROCESSING, if_match=etag)
+            return True
+        except JobConflictError:
+            logger.warning(f"Job {job_id} was taken over by another worker before it finished here")
+            return False
+    
     def complete_job(self, job_id):
         """Mark job as completed"""
-        job = self.get_job_by_status(job_id, JobState.PROCESSING)
-        if not job:
-            return False
+        with self._io_lock:
+            etag = self._etags.pop(job_id, None)
+            job = self._release_job(job_id) or self.get_job_by_status(job_id, JobState.PROCESSING)
+            if not job:
+                return False
             
-        # Remove from processing
-        self._delete_job(job_id, JobState.PROCESSING)
-        
-        # Update and save to completed
-        job["status"] = JobState.COMPLETED
-        job["updated_at"] = datetime.now().isoformat()
-        job["completed_at"] = datetime.now().isoformat()
+            # Only remove the processing record if nobody took the job over
+            still_owned = self._finish_owned(job_id, dict(job), etag) if etag else True
+            
+            # Update and save to completed
+            job["status"] = JobState.COMPLETED
+            job["updated_at"] = datetime.now().isoformat()
+            job["completed_at"] = datetime.now().isoformat()
+            
+            self._save_job(job, JobState.COMPLETED)
+            if still_owned:
+                self._delete_job(job_id, JobState.PROCESSING)
         
-        self._save_job(job, JobState.COMPLETED)
+        self._update_index(job)
         return True
     
     def fail_job(self, job_id, error):
         """Mark job as failed with error info"""
-        job = self.get_job(job_id)
-        if not job:
-            return False
+        with self._io_lock:
+            etag = self._etags.pop(job_id, None)
+            owned = self._release_job(job_id)
+            job = owned or self.get_job(job_id)
+            if not job:
+                return False
+            
+            # A job another worker has taken over is theirs to fail
+            if etag and not self._finish_owned(job_id, dict(job), etag):
+                return False
+            if not owned and (self.lease_lost(job_id) or (job.get("status") == JobState.PROCESSING
+                                                          and not self._lease_expired(job))):
+                logger.warning(f"Job {job_id} is held by another worker, not failing it here")
+                return False
+            
+            current_status = job.get("status", JobState.QUEUED)
+            
+            # Update and save to failed
+            job["status"] = JobState.FAILED
+            job["updated_at"] = datetime.now().isoformat()
+            job["error"] = str(error)
+            job["attempts"] = job.get("attempts", 0) + 1
+            
+            self._save_job(job, JobState.FAILED)
             
-        # Remove from current status
-        current_status = job.get("status", JobState.QUEUED)
-        self._delete_job(job_id, current_status)
+            # Remove from previous status
+            self._delete_job(job_id, current_status)
         
-        # Update and save to failed
-        job["status"] = JobState.FAILED
-        job["updated_at"] = datetime.now().isoformat()
-        job["error"] = str(error)
-        job["attempts"] = job.get("attempts", 0) + 1
+        self._update_index(job)
+        return True
+    
+    def requeue_job(self, job_id, error=None, error_class=None):
+        """
+        Hand an owned job back to the queued state, keeping its recorded stages
         
-        self._save_job(job, JobState.FAILED)
+        Passes a job between workers that run different stages (the fetch
+        role hands jobs with staged audio to the transcribe role), and puts
+        back jobs that failed transiently for a delayed retry.
+        
+        Args:
+            job_id: Job ID
+            error: Error of a failed attempt; it is recorded and counts as an attempt
+            error_class: Retry policy class of the error, recorded for abandoned-job recovery
+        
+        Returns:
+            True if the job was requeued
+        """
+        with self._io_lock:
+            etag = self._etags.pop(job_id, None)
+            job = self._release_job(job_id)
+            if not job or not etag:
+                return False
+            
+            if not self._finish_owned(job_id, dict(job), etag):
+                return False
+            
+            job["status"] = JobState.QUEUED
+            job["worker_id"] = None
+            job["updated_at"] = datetime.now().isoformat()
+            job.pop("lock_until", None)
+            if error is not None:
+                job["error"] = str(error)
+                job["error_class"] = error_class
+                job["attempts"] = job.get("attempts", 0) + 1
+            
+            self._save_job(job, JobState.QUEUED)
+            self._delete_job(job_id, JobState.PROCESSING)
+        
+        self._update_index(job)
         return True
     
     def get_job(self, job_id):
-        """Get job from any status folder"""
+        """
+        Get job from any status folder
+        
+        The status index says which folder holds the job, so this is usually
+        two GETs instead of probing all four folders.
+        """
+        status = self.get_job_status(job_id)
+        if status:
+            job = self.get_job_by_status(job_id, status)
+            if job:
+                return job
+        
+        # Not indexed yet (or moved since): probe every folder
         for status in [JobState.QUEUED, JobState.PROCESSING, JobState.COMPLETED, JobState.FAILED]:
             job = self.get_job_by_status(job_id, status)
             if job:
                 return job
         return None
     
+    def get_job_status(self, job_id):
+        """Current status of a job from its index shard (a single GET), or None if not indexed"""
+        entry = self._load_index(self._index_shard(job_id))["jobs"].get(job_id)
+        return entry["status"] if entry else None
+    
+    def get_status_summary(self):
+        """
+        Fleet-wide job summary merged from the index shards (read in parallel)
+        
+        Returns:
+            Dict with "counts" per status and a "jobs" map of job_id to summary
+        """
+        with ThreadPoolExecutor(max_workers=INDEX_SHARDS) as executor:
+            shards = list(executor.map(self._load_index, range(INDEX_SHARDS)))
+        
+        summary = self._empty_index()
+        for shard in shards:
+            for status, count in shard["counts"].items():
+                summary["counts"][status] = summary["counts"].get(status, 0) + count
+            summary["jobs"].update(shard["jobs"])
+            if shard.get("updated_at") and (summary["updated_at"] or "") < shard["updated_at"]:
+                summary["updated_at"] = shard["updated_at"]
+        return summary
+    
     def get_job_by_status(self, job_id, status):
         """Get job from specific status folder"""
         key = f"jobs/{status}/{job_id}.json"
@@ -138,108 +565,457 @@ class JobTracker:
             logger.error(f"Error getting job {job_id}: {str(e)}")
             return None
     
-    def list_jobs_by_status(self, status):
-        """List all jobs with a specific status"""
+    def _get_job_with_etag(self, job_id, status):
+        """
+        Get a job and the ETag of its record, for a following conditional write
+        
+        Returns:
+            Tuple of (job dict, ETag), or (None, None) if it does not exist
+        """
+        key = f"jobs/{status}/{job_id}.json"
         try:
-            prefix = f"jobs/{status}/"
-            response = self.s3.list_objects_v2(
-                Bucket=self.s3_bucket,
-                Prefix=prefix
-            )
-            
-            jobs = []
-            if 'Contents' in response:
-                for item in response['Contents']:
-                    job_id = os.path.basename(item['Key']).replace('.json', '')
-                    job = self.get_job_by_status(job_id, status)
-                    if job:
-                        jobs.append(job)
-            return jobs
+            response = self.s3.get_object(Bucket=self.s3_bucket, Key=key)
+            job_data = json.loads(response['Body'].read().decode('utf-8'))
+            return job_data, response.get('ETag')
+        except self.s3.exceptions.NoSuchKey:
+            return None, None
+        except Exception as e:
+            logger.error(f"Error getting job {job_id}: {str(e)}")
+            return None, None
+    
+    @staticmethod
+    def _lease_expired(job):
+        """True if a processing job's lock has run out (or cannot be read)"""
+        lock_until = job.get('lock_until')
+        if not lock_until:
+            return True
+        try:
+            return datetime.fromisoformat(lock_until) < datetime.now()
+        except ValueError:
+            return True
+    
+    def list_jobs_by_status(self, status, max_workers=DEFAULT_FETCH_WORKERS):
+        """
+        List all jobs with a specific status
+        
+        Keys are listed page by page and the records are fetched in parallel.
+        """
+        try:
+            job_ids = [
+                os.path.basename(item['Key'])[:-len('.json')]
+                for item in self._iter_objects(f"jobs/{status}/")
+                if item['Key'].endswith('.json')
+            ]
+            return self.get_jobs(job_ids, status, max_workers)
         except Exception as e:
             logger.error(f"Error listing jobs: {str(e)}")
             return []
     
-    def find_abandoned_jobs(self):
-        """Find processing jobs with expired locks"""
-        processing_jobs = self.list_jobs_by_status(JobState.PROCESSING)
+    def get_jobs(self, job_ids, status, max_workers=DEFAULT_FETCH_WORKERS):
+        """Fetch many job records from one status folder with a thread pool"""
+        if not job_ids:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(job_ids))) as executor:
+            jobs = executor.map(lambda job_id: self.get_job_by_status(job_id, status), job_ids)
+            return [job for job in jobs if job]
+    
+    def _iter_objects(self, prefix):
+        """Yield every object listed under a prefix, following pagination"""
+        kwargs = {"Bucket": self.s3_bucket, "Prefix": prefix}
+        while True:
+            response = self.s3.list_objects_v2(**kwargs)
+            for item in response.get('Contents', []):
+                yield item
+            if not response.get('IsTruncated'):
+                break
+            kwargs["ContinuationToken"] = response['NextContinuationToken']
+    
+    def list_live_workers(self, max_workers=DEFAULT_FETCH_WORKERS):
+        """
+        List workers whose heartbeat was written within worker_ttl and who have not shut down
+        
+        Heartbeat age comes from the listing's LastModified. A heartbeat is
+        only read, for its status, when its ETag changed since the last
+        listing; a shutdown heartbeat never changes, so it is read once.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.worker_ttl)
+        fresh = {}
+        try:
+            for item in self._iter_objects("workers/"):
+                if not item['Key'].endswith('.json'):
+                    continue
+                modified = item.get('LastModified')
+                if modified is None or modified >= cutoff:
+                    fresh[item['Key']] = item.get('ETag')
+        except Exception as e:
+            logger.error(f"Error listing workers: {str(e)}")
+        
+        known = self._heartbeats
+        changed = [key for key, etag in fresh.items() if etag is None or known.get(key, (None,))[0] != etag]
+        if changed:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(changed))) as executor:
+                statuses = dict(zip(changed, executor.map(self._heartbeat_status, changed)))
+        else:
+            statuses = {}
+        # Heartbeats that aged out of the listing are forgotten
+        self._heartbeats = {key: (etag, statuses[key] if key in statuses else known[key][1])
+                            for key, etag in fresh.items()}
+        
+        return [os.path.basename(key)[:-len('.json')] for key, (_, status) in self._heartbeats.items()
+                if status != "shutdown"]
+    
+    def _heartbeat_status(self, key):
+        """Status field of a heartbeat, or None if it cannot be read (the worker counts as live)"""
+        try:
+            response = self.s3.get_object(Bucket=self.s3_bucket, Key=key)
+            return json.loads(response['Body'].read().decode('utf-8')).get("status")
+        except Exception as e:
+            logger.warning(f"Error reading heartbeat {key}: {str(e)}")
+            return None
+    
+    @staticmethod
+    def partition_owner(job_id, worker_ids):
+        """
+        Pick the worker responsible for recovering a job (rendezvous hashing)
+        
+        Every worker computes the same owner from the same worker list, and
+        adding or removing a worker only moves that worker's share of jobs.
+        """
+        def weight(worker_id):
+            return hashlib.sha1(f"{worker_id}:{job_id}".encode('utf-8')).digest()
+        return max(worker_ids, key=weight) if worker_ids else None
+    
+    def find_abandoned_jobs(self, worker_id=None, live_workers=None):
+        """
+        Find processing jobs with expired locks in this worker's partition
+        
+        Records written within the last LOCK_MINUTES cannot have expired and
+        are skipped from the listing alone. Of the rest, only jobs hashed to
+        this worker are read, plus stragglers abandoned for longer than
+        worker_ttl, which any worker picks up in case their owner's view of
+        the live workers was stale.
+        
+        Args:
+            worker_id: ID this worker heartbeats under (Default: the tracker's ID)
+            live_workers: Live worker IDs (Default: listed from workers/ heartbeats)
+            
+        Returns:
+            List of abandoned job dicts
+        """
+        worker_id = worker_id or self.worker_id
+        if live_workers is None:
+            live_workers = self.list_live_workers()
+        live_workers = sorted(set(live_workers) | {worker_id})
+        
+        lease_cutoff = datetime.now(timezone.utc) - timedelta(minutes=LOCK_MINUTES)
+        straggler_cutoff = lease_cutoff - timedelta(seconds=self.worker_ttl)
         abandoned_jobs = []
         
-        for job in processing_jobs:
-            lock_until = job.get('lock_until')
-            if not lock_until:
-                abandoned_jobs.append(job)
-                continue
+        try:
+            for item in self._iter_objects(f"jobs/{JobState.PROCESSING}/"):
+                if not item['Key'].endswith('.json'):
+                    continue
+                modified = item.get('LastModified')
+                if modified is not None and modified > lease_cutoff:
+                    continue
                 
-            try:
-                lock_time = datetime.fromisoformat(lock_until)
-                if lock_time < datetime.now():
-                    abandoned_jobs.append(job)
-            except:
-                # If we can't parse the time, consider it abandoned
-                abandoned_jobs.append(job)
+                job_id = os.path.basename(item['Key'])[:-len('.json')]
+                straggler = modified is not None and modified < straggler_cutoff
+                if not straggler and self.partition_owner(job_id, live_workers) != worker_id:
+                    continue
                 
+                job = self.get_job_by_status(job_id, JobState.PROCESSING)
+                if job and self._lease_expired(job):
+                    abandoned_jobs.append(job)
+        except Exception as e:
+            logger.error(f"Error finding abandoned jobs: {str(e)}")
+        
         return abandoned_jobs
     
-    def recover_abandoned_jobs(self):
-        """Recover abandoned jobs if they're not over max attempts"""
-        abandoned_jobs = self.find_abandoned_jobs()
+    def recover_abandoned_jobs(self, worker_id=None, live_workers=None, retry_policy=None):
+        """
+        Recover abandoned jobs that have attempts left (see retry_abandoned)
+        
+        Only this worker's partition is scanned (see find_abandoned_jobs).
+        Each abandoned record is first taken over with an If-Match write, so
+        when several workers recover at once only one of them requeues a job.
+        
+        Args:
+            worker_id: ID this worker heartbeats under (Default: the tracker's ID)
+            live_workers: Live worker IDs (Default: listed from workers/ heartbeats)
+            retry_policy: RetryPolicy deciding the attempt budget by error class
+        """
+        worker_id = worker_id or self.worker_id
+        abandoned_jobs = self.find_abandoned_jobs(worker_id, live_workers)
         recovered = 0
         
-        for job in abandoned_jobs:
+        for abandoned in abandoned_jobs:
+            job_id = abandoned["job_id"]
+            
+            # Re-read with the ETag; skip jobs renewed or recovered meanwhile
+            job, etag = self._get_job_with_etag(job_id, JobState.PROCESSING)
+            if not job or not self._lease_expired(job):
+                continue
+            
+            claim = dict(job)
+            claim["recovered_by"] = worker_id
+            claim["updated_at"] = datetime.now().isoformat()
+            claim["lock_until"] = (datetime.now() + timedelta(minutes=LOCK_MINUTES)).isoformat()
+            try:
+                if not self._save_job(claim, JobState.PROCESSING, if_match=etag):
+                    continue
+            except JobConflictError:
+                logger.info(f"Job {job_id} is being recovered by another worker")
+                continue
+            
             # Check if we should retry
             attempts = job.get("attempts", 0)
-            if attempts >= 3:  # Max 3 attempts
+            if not retry_abandoned(job, retry_policy):
                 # Move to failed
-                self._delete_job(job["job_id"], JobState.PROCESSING)
                 job["status"] = JobState.FAILED
                 job["updated_at"] = datetime.now().isoformat()
                 job["error"] = "Exceeded maximum retry attempts"
                 self._save_job(job, JobState.FAILED)
-                logger.info(f"Job {job['job_id']} exceeded max attempts, marked as failed")
+                self._delete_job(job_id, JobState.PROCESSING)
+                self._update_index(job)
+                logger.info(f"Job {job_id} exceeded max attempts, marked as failed")
             else:
                 # Move back to queued for retry
-                self._delete_job(job["job_id"], JobState.PROCESSING)
                 job["status"] = JobState.QUEUED
                 job["updated_at"] = datetime.now().isoformat()
                 job["attempts"] = attempts + 1
                 self._save_job(job, JobState.QUEUED)
-                logger.info(f"Recovered job {job['job_id']} for retry (attempt {attempts + 1})")
+                self._delete_job(job_id, JobState.PROCESSING)
+                self._update_index(job)
+                logger.info(f"Recovered job {job_id} for retry (attempt {attempts + 1})")
                 recovered += 1
                 
         return recovered
     
-    def _save_job(self, job, status):
-        """Save job data to S3"""
+    @staticmethod
+    def _empty_index():
+        """Index document with no jobs"""
+        return {
+            "updated_at": None,
+            "counts": {status: 0 for status in (JobState.QUEUED, JobState.PROCESSING,
+                                                JobState.COMPLETED, JobState.FAILED)},
+            "jobs": {}
+        }
+    
+    @staticmethod
+    def _index_shard(job_id):
+        """Index shard holding a job"""
+        return int(hashlib.sha1(job_id.encode('utf-8')).hexdigest()[:8], 16) % INDEX_SHARDS
+    
+    def _load_index(self, shard):
+        """
+        Read one index shard
+        
+        Returns:
+            Index dict, or an empty index if it does not exist or cannot be read
+        """
+        try:
+            return get_json(self.s3, self.s3_bucket, f"{JOB_INDEX_PREFIX}/{shard:02d}.json")
+        except self.s3.exceptions.NoSuchKey:
+            return self._empty_index()
+        except Exception as e:
+            logger.error(f"Error reading job index: {str(e)}")
+            return self._empty_index()
+    
+    @staticmethod
+    def _index_entry(job):
+        """Compact summary of a job kept in the index"""
+        return {
+            "status": job.get("status"),
+            "video_id": job.get("video_id"),
+            "worker_id": job.get("worker_id"),
+            "attempts": job.get("attempts", 0),
+            "updated_at": job.get("updated_at"),
+            # Known once the audio is downloaded; lets schedulers size the backlog
+            "duration": ((job.get("stages") or {}).get("metadata") or {}).get("duration")
+        }
+    
+    @staticmethod
+    def _prune_index(index, status, limit, counter=None):
+        """Drop the oldest entries of a status beyond limit, counting them under counter"""
+        job_ids = [job_id for job_id, entry in index["jobs"].items() if entry["status"] == status]
+        if len(job_ids) <= limit:
+            return
+        job_ids.sort(key=lambda job_id: index["jobs"][job_id].get("updated_at") or "")
+        for job_id in job_ids[:len(job_ids) - limit]:
+            del index["jobs"][job_id]
+        if counter:
+            index[counter] = index.get(counter, 0) + len(job_ids) - limit
+    
+    def _update_index(self, *jobs, rebuild=False):
+        """
+        Record jobs' current status in their index shards
+        
+        Called after a transition, outside _io_lock, so a contended shard
+        never holds up progress writes or lease renewals. Index writes are
+        best effort: a failure is logged and never fails the transition.
+        
+        Args:
+            jobs: Job dicts to record
+            rebuild: Replace every shard with only these jobs
+            
+        Returns:
+            True if every shard was written
+        """
+        by_shard = {}
+        for job in jobs:
+            by_shard.setdefault(self._index_shard(job["job_id"]), []).append(dict(job))
+        shards = range(INDEX_SHARDS) if rebuild else sorted(by_shard)
+        
+        written = True
+        for shard in shards:
+            written = self._update_index_shard(shard, by_shard.get(shard, []), rebuild) and written
+        return written
+    
+    def _update_index_shard(self, shard, jobs, rebuild=False):
+        """Record jobs in one index shard with conditional writes"""
+        queued_cutoff = (datetime.now() - timedelta(seconds=INDEX_QUEUED_TTL)).isoformat()
+        
+        def record(index):
+            if index is None or rebuild:
+                index = self._empty_index()
+            
+            for job in jobs:
+                index["jobs"][job["job_id"]] = self._index_entry(job)
+            
+            # Keep only the most recent final jobs; counts cover all of them.
+            # Queued jobs whose message SQS would have dropped are forgotten.
+            self._prune_index(index, JobState.COMPLETED, INDEX_MAX_COMPLETED // INDEX_SHARDS, "completed_pruned")
+            self._prune_index(index, JobState.FAILED, INDEX_MAX_FAILED // INDEX_SHARDS, "failed_pruned")
+            for job_id, entry in list(index["jobs"].items()):
+                if entry["status"] == JobState.QUEUED and (entry.get("updated_at") or "") < queued_cutoff:
+                    del index["jobs"][job_id]
+            
+            counts = self._empty_index()["counts"]
+            for entry in index["jobs"].values():
+                counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+            counts[JobState.COMPLETED] += index.get("completed_pruned", 0)
+            counts[JobState.FAILED] += index.get("failed_pruned", 0)
+            index["counts"] = counts
+            index["updated_at"] = datetime.now().isoformat()
+            return index
+        
+        try:
+            update_object(self.s3, self.s3_bucket, f"{JOB_INDEX_PREFIX}/{shard:02d}.json", record,
+                          max_retries=INDEX_MAX_RETRIES)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating job index: {str(e)}")
+            return False
+    
+    def rebuild_index(self, max_workers=DEFAULT_FETCH_WORKERS):
+        """
+        Rebuild the status index from the job folders (e.g. for an existing bucket)
+        
+        Returns:
+            Number of jobs indexed
+        """
+        jobs = []
+        for status in (JobState.QUEUED, JobState.PROCESSING, JobState.COMPLETED, JobState.FAILED):
+            jobs.extend(self.list_jobs_by_status(status, max_workers))
+        if self._update_index(*jobs, rebuild=True):
+            # The shards replace the single-object index of earlier versions
+            self.s3.delete_object(Bucket=self.s3_bucket, Key=LEGACY_INDEX_KEY)
+        return len(jobs)
+    
+    def _save_job(self, job, status, if_match=None, if_none_match=False):
+        """
+        Save job data to S3
+        
+        Args:
+            job: Job dict
+            status: Status folder to write to
+            if_match: Only write if the stored record still has this ETag
+            if_none_match: Only write if no record exists yet
+            
+        Returns:
+            ETag of the written record, or None on error
+            
+        Raises:
+            JobConflictError: If a condition did not hold
+        """
         job_id = job["job_id"]
         key = f"jobs/{status}/{job_id}.json"
         
+        params = {
+            "Body": json.dumps(job),
+            "Bucket": self.s3_bucket,
+            "Key": key,
+            "ContentType": "application/json"
+        }
+        if if_match:
+            params["IfMatch"] = if_match
+        if if_none_match:
+            params["IfNoneMatch"] = "*"
+        
         try:
-            self.s3.put_object(
-                Body=json.dumps(job),
-                Bucket=self.s3_bucket,
-                Key=key,
-                ContentType="application/json"
-            )
-            return True
+            response = self.s3.put_object(**params)
+            return response.get('ETag')
         except Exception as e:
+            if (if_match or if_none_match) and is_condition_failure(e):
+                raise JobConflictError(f"Conditional write of {key} failed") from e
             logger.error(f"Error saving job {job_id}: {str(e)}")
-            return False
+            return None
     
-    def _delete_job(self, job_id, status):
-        """Delete job data from S3"""
+    def _delete_job(self, job_id, status, if_match=None):
+        """
+        Delete job data from S3
+        
+        Args:
+            job_id: Job ID
+            status: Status folder to delete from
+            if_match: Only delete if the stored record still has this ETag
+        """
         key = f"jobs/{status}/{job_id}.json"
+        params = {"Bucket": self.s3_bucket, "Key": key}
+        if if_match:
+            params["IfMatch"] = if_match
         
         try:
-            self.s3.delete_object(
-                Bucket=self.s3_bucket,
-                Key=key
-            )
+            self.s3.delete_object(**params)
             return True
         except Exception as e:
+            if if_match and is_condition_failure(e):
+                return False
             logger.error(f"Error deleting job {job_id}: {str(e)}")
             return False
 
 
+def create_job_tracker(backend="s3", s3_bucket=None, region="us-east-1", db_path=None, **kwargs):
+    """
+    Create a job tracker for a backend
+    
+    Every backend provides the same methods: create_job, start_processing,
+    renew_lease, lease_lost, update_progress, record_stage, flush, stop,
+    complete_job, fail_job, requeue_job, get_job, get_job_by_status, get_job_status, get_status_summary,
+    list_jobs_by_status, find_abandoned_jobs and recover_abandoned_jobs.
+    
+    Args:
+        backend: 's3' (shared across hosts) or 'sqlite' (one host, local file)
+        s3_bucket: S3 bucket for job records (s3 backend)
+        region: AWS region (s3 backend)
+        db_path: SQLite database file (sqlite backend)
+        kwargs: Extra options for the backend's constructor
+        
+    Returns:
+        Job tracker instance
+        
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend == "s3":
+        return JobTracker(s3_bucket, region, **kwargs)
+    if backend == "sqlite":
+        from sqlite_job_tracker import SQLiteJobTracker, DEFAULT_JOB_DB
+        return SQLiteJobTracker(db_path or DEFAULT_JOB_DB, **kwargs)
+    raise ValueError(f"Unknown job backend: {backend}")
+
+
 # Example usage
 if __name__ == "__main__":
     # Simple test code
@@ -265,3 +1041,6 @@ if __name__ == "__main__":
     
     # Complete job
     tracker.complete_job(job_id)
+    
+    # Stop the background progress flusher
+    tracker.stop()
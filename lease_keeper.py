@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+# lease_keeper.py - Background lease renewal for running jobs
+
+import logging
+import threading
+
+from job_tracker import LOCK_MINUTES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VISIBILITY_TIMEOUT = LOCK_MINUTES * 60  # seconds, matches the tracker lock
+RENEWALS_PER_LEASE = 3  # renew well before either lease runs out
+
+class LeaseKeeper:
+    """
+    Keeps a job's tracker lock and its SQS message visibility alive together
+
+    One keeper runs per active job, for as long as the job is being processed,
+    so a slow download, ffmpeg conversion or chunk cannot let the lease expire
+    and have another worker recover a job that is still running.
+
+    Usage:
+        with LeaseKeeper(tracker, job_id, sqs, queue_url, receipt_handle) as lease:
+            ...
+    """
+
+    def __init__(self, job_tracker, job_id, sqs=None, queue_url=None, receipt_handle=None,
+                 visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT, interval=None):
+        """
+        Initialize the lease keeper
+
+        Args:
+            job_tracker: JobTracker holding the job
+            job_id: Job to keep alive
+            sqs: SQS client (Default: no visibility extension)
+            queue_url: Queue the message was received from
+            receipt_handle: Receipt handle of the job's message
+            visibility_timeout: Visibility timeout set on each renewal, in seconds
+            interval: Seconds between renewals (Default: a third of visibility_timeout)
+        """
+        self.job_tracker = job_tracker
+        self.job_id = job_id
+        self.sqs = sqs
+        self.queue_url = queue_url
+        self.receipt_handle = receipt_handle
+        self.visibility_timeout = visibility_timeout
+        self.interval = interval or max(visibility_timeout / RENEWALS_PER_LEASE, 1)
+        self.renewals = 0
+        self.lost = False
+
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start renewing in the background"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"lease-{self.job_id}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop renewing; safe to call more than once"""
+        self._stopped.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def renew(self):
+        """
+        Renew both leases once
+
+        Returns:
+            True if the job is still held by this worker
+        """
+        if not self.job_tracker.renew_lease(self.job_id):
+            logger.warning(f"Lease on job {self.job_id} was lost, stopping renewal")
+            self.lost = True
+            return False
+
+        if self.sqs and self.receipt_handle:
+            try:
+                self.sqs.change_message_visibility(
+                    QueueUrl=self.queue_url,
+                    ReceiptHandle=self.receipt_handle,
+                    VisibilityTimeout=int(self.visibility_timeout)
+                )
+            except Exception as e:
+                logger.error(f"Error extending visibility for job {self.job_id}: {str(e)}")
+
+        self.renewals += 1
+        return True
+
+    def _run(self):
+        """Renewal loop"""
+        while not self._stopped.wait(self.interval):
+            try:
+                if not self.renew():
+                    break
+            except Exception as e:
+                logger.error(f"Error renewing lease for job {self.job_id}: {str(e)}")
+
+
+# Example usage
+if __name__ == "__main__":
+    # Keep a job alive with a short interval against a local S3 stand-in
+    import time
+    import tempfile
+    from job_tracker import JobTracker
+    from local_s3 import LocalS3Client
+
+    logging.basicConfig(level=logging.INFO)
+
+    with tempfile.TemporaryDirectory() as root:
+        tracker = JobTracker("lease-test", s3_client=LocalS3Client(root))
+        tracker.create_job("job-1", "abc123", "https://www.youtube.com/watch?v=abc123", "test")
+        tracker.start_processing("job-1")
+
+        with LeaseKeeper(tracker, "job-1", interval=0.5) as lease:
+            time.sleep(2)
+
+        print(f"Renewed {lease.renewals} times, lock_until "
+              f"{tracker.get_job_by_status('job-1', 'processing')['lock_until']}")
+        tracker.complete_job("job-1")
+        tracker.stop()
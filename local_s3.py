@@ -0,0 +1,322 @@
+#!/usr/bin/python3
+# local_s3.py - Filesystem-backed S3 stand-in with conditional write semantics
+
+import io
+import os
+import json
+import fcntl
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import quote, unquote
+
+logger = logging.getLogger(__name__)
+
+class ClientError(Exception):
+    """Mirrors botocore's ClientError: error details are in .response['Error']"""
+
+    def __init__(self, error_response, operation_name):
+        self.response = error_response
+        self.operation_name = operation_name
+        error = error_response.get('Error', {})
+        super().__init__(f"An error occurred ({error.get('Code')}) when calling the "
+                         f"{operation_name} operation: {error.get('Message')}")
+
+class NoSuchKey(ClientError):
+    """Raised when an object does not exist"""
+    pass
+
+class _Exceptions:
+    """Namespace matching client.exceptions on boto3 clients"""
+    ClientError = ClientError
+    NoSuchKey = NoSuchKey
+
+def _error(code, message, operation, status):
+    """Build a ClientError response dict"""
+    return {
+        'Error': {'Code': code, 'Message': message},
+        'ResponseMetadata': {'HTTPStatusCode': status}
+    }
+
+
+class LocalS3Client:
+    """
+    Drop-in replacement for the subset of the boto3 S3 client used by this project
+
+    Objects live under {root}/{bucket}/ as one data file and one metadata file
+    per key. A per-bucket lock file serializes writes across threads and
+    processes, so If-None-Match / If-Match behave atomically like S3's
+    conditional writes.
+    """
+
+    exceptions = _Exceptions
+
+    def __init__(self, root):
+        """Initialize the stand-in rooted at a local directory"""
+        self.root = root
+        self._thread_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _bucket_dir(self, bucket):
+        path = os.path.join(self.root, bucket)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _paths(self, bucket, key):
+        base = os.path.join(self._bucket_dir(bucket), quote(key, safe=''))
+        return base + ".data", base + ".meta"
+
+    @contextmanager
+    def _locked(self, bucket):
+        """Exclusive lock on a bucket for this process and every other process"""
+        with self._thread_lock:
+            with open(os.path.join(self._bucket_dir(bucket), ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self, bucket, key):
+        _, meta_path = self._paths(bucket, key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_atomic(path, data):
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def put_object(self, Bucket, Key, Body=b"", ContentType="binary/octet-stream", ContentEncoding=None,
+                   Metadata=None, IfNoneMatch=None, IfMatch=None, **kwargs):
+        """Store an object, honouring If-None-Match: * and If-Match: <etag>"""
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        elif hasattr(Body, "read"):
+            Body = Body.read()
+
+        with self._locked(Bucket):
+            meta = self._read_meta(Bucket, Key)
+            if IfNoneMatch == "*" and meta is not None:
+                raise ClientError(_error("PreconditionFailed", "At least one of the pre-conditions "
+                                         "you specified did not hold", "PutObject", 412), "PutObject")
+            if IfMatch is not None:
+                if meta is None:
+                    raise NoSuchKey(_error("NoSuchKey", "The specified key does not exist.",
+                                           "PutObject", 404), "PutObject")
+                if meta["ETag"] != IfMatch:
+                    raise ClientError(_error("PreconditionFailed", "At least one of the pre-conditions "
+                                             "you specified did not hold", "PutObject", 412), "PutObject")
+
+            etag = '"' + hashlib.md5(Body).hexdigest() + '"'
+            data_path, meta_path = self._paths(Bucket, Key)
+            self._write_atomic(data_path, Body)
+            self._write_atomic(meta_path, json.dumps({
+                "Key": Key,
+                "ETag": etag,
+                "Size": len(Body),
+                "ContentType": ContentType,
+                "ContentEncoding": ContentEncoding,
+                "Metadata": Metadata or {},
+                "LastModified": datetime.now(timezone.utc).isoformat()
+            }).encode("utf-8"))
+
+        return {"ETag": etag}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        """Fetch an object; raises NoSuchKey if it does not exist"""
+        with self._locked(Bucket):
+            meta = self._read_meta(Bucket, Key)
+            if meta is None:
+                raise NoSuchKey(_error("NoSuchKey", "The specified key does not exist.",
+                                       "GetObject", 404), "GetObject")
+            data_path, _ = self._paths(Bucket, Key)
+            with open(data_path, "rb") as f:
+                body = f.read()
+
+        response = {
+            "Body": io.BytesIO(body),
+            "ETag": meta["ETag"],
+            "ContentLength": meta["Size"],
+            "ContentType": meta["ContentType"],
+            "Metadata": meta["Metadata"],
+            "LastModified": datetime.fromisoformat(meta["LastModified"])
+        }
+        if meta.get("ContentEncoding"):
+            response["ContentEncoding"] = meta["ContentEncoding"]
+        return response
+
+    def head_object(self, Bucket, Key, **kwargs):
+        """Object metadata without the body"""
+        response = self.get_object(Bucket, Key)
+        response.pop("Body")
+        return response
+
+    def delete_object(self, Bucket, Key, IfMatch=None, **kwargs):
+        """Delete an object (deleting a missing key succeeds, as on S3)"""
+        with self._locked(Bucket):
+            meta = self._read_meta(Bucket, Key)
+            if IfMatch is not None and meta is not None and meta["ETag"] != IfMatch:
+                raise ClientError(_error("PreconditionFailed", "At least one of the pre-conditions "
+                                         "you specified did not hold", "DeleteObject", 412), "DeleteObject")
+            for path in self._paths(Bucket, Key):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return {}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, **kwargs):
+        """Upload a local file (boto3's managed transfer, without multipart)"""
+        with open(Filename, "rb") as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f.read(), **(ExtraArgs or {}))
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        """Download an object to a local file; a missing key raises ClientError 404 like boto3"""
+        try:
+            body = self.get_object(Bucket, Key)["Body"].read()
+        except NoSuchKey:
+            raise ClientError(_error("404", "Not Found", "HeadObject", 404), "HeadObject")
+        self._write_atomic(Filename, body)
+
+    def list_objects_v2(self, Bucket, Prefix="", Delimiter=None, MaxKeys=1000,
+                        ContinuationToken=None, StartAfter=None, **kwargs):
+        """List keys in lexicographic order with S3-style pagination and common prefixes"""
+        bucket_dir = self._bucket_dir(Bucket)
+        keys = sorted(
+            unquote(name[:-len(".meta")]) for name in os.listdir(bucket_dir) if name.endswith(".meta")
+        )
+        start_after = ContinuationToken or StartAfter or ""
+
+        contents = []
+        common_prefixes = []
+        last_key = None
+        truncated = False
+
+        for key in keys:
+            if not key.startswith(Prefix) or key <= start_after:
+                continue
+
+            if Delimiter:
+                position = key.find(Delimiter, len(Prefix))
+                if position >= 0:
+                    common_prefix = key[:position + len(Delimiter)]
+                    if common_prefix <= start_after:
+                        continue
+                    if common_prefixes and common_prefixes[-1]["Prefix"] == common_prefix:
+                        continue
+                    if len(contents) + len(common_prefixes) >= MaxKeys:
+                        truncated = True
+                        break
+                    common_prefixes.append({"Prefix": common_prefix})
+                    # Skip the rest of this prefix on the next page
+                    last_key = common_prefix + "\uffff"
+                    continue
+
+            if len(contents) + len(common_prefixes) >= MaxKeys:
+                truncated = True
+                break
+
+            meta = self._read_meta(Bucket, key)
+            if meta is None:
+                continue
+            contents.append({
+                "Key": key,
+                "Size": meta["Size"],
+                "ETag": meta["ETag"],
+                "LastModified": datetime.fromisoformat(meta["LastModified"])
+            })
+            last_key = key
+
+        response = {
+            "IsTruncated": truncated,
+            "KeyCount": len(contents) + len(common_prefixes),
+            "Prefix": Prefix,
+            "MaxKeys": MaxKeys
+        }
+        if contents:
+            response["Contents"] = contents
+        if common_prefixes:
+            response["CommonPrefixes"] = common_prefixes
+        if truncated:
+            response["NextContinuationToken"] = last_key
+        return response
+
+    def set_last_modified(self, Bucket, Key, last_modified):
+        """Backdate an object (local testing aid; S3 has no equivalent)"""
+        with self._locked(Bucket):
+            meta = self._read_meta(Bucket, Key)
+            if meta is None:
+                raise NoSuchKey(_error("NoSuchKey", "The specified key does not exist.",
+                                       "SetLastModified", 404), "SetLastModified")
+            meta["LastModified"] = last_modified.isoformat()
+            _, meta_path = self._paths(Bucket, Key)
+            self._write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+
+    def head_bucket(self, Bucket, **kwargs):
+        """Buckets always exist locally"""
+        self._bucket_dir(Bucket)
+        return {}
+
+    def create_bucket(self, Bucket, **kwargs):
+        """Create the bucket directory"""
+        self._bucket_dir(Bucket)
+        return {}
+
+
+def _contention_worker(args):
+    """One simulated worker in the contention check (runs in its own process)"""
+    root, bucket, job_id, mode = args
+    from job_tracker import JobTracker
+
+    tracker = JobTracker(bucket, s3_client=LocalS3Client(root))
+    try:
+        if mode == "claim":
+            return 1 if tracker.start_processing(job_id, tracker.worker_id) else 0
+        return tracker.recover_abandoned_jobs()
+    finally:
+        tracker.stop()
+
+
+# Example usage
+if __name__ == "__main__":
+    # Contention check: many simulated workers race for the same job
+    import sys
+    import tempfile
+    import multiprocessing
+    from datetime import timedelta
+    from job_tracker import JobTracker, JobState, LOCK_MINUTES
+
+    logging.basicConfig(level=logging.WARNING)
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as root, multiprocessing.Pool(workers) as pool:
+        tracker = JobTracker("contention-test", s3_client=LocalS3Client(root))
+        for round_number in range(rounds):
+            job_id = f"job-{round_number}"
+            tracker.create_job(job_id, "abc123", "https://www.youtube.com/watch?v=abc123", "test")
+
+            claims = sum(pool.map(_contention_worker, [(root, "contention-test", job_id, "claim")] * workers))
+
+            # Expire the winner's lease (and backdate the record past the
+            # listing filter), then race recovery
+            job = tracker.get_job_by_status(job_id, JobState.PROCESSING)
+            job["lock_until"] = (datetime.now() - timedelta(minutes=1)).isoformat()
+            tracker._save_job(job, JobState.PROCESSING)
+            tracker.s3.set_last_modified("contention-test", f"jobs/processing/{job_id}.json",
+                                         datetime.now(timezone.utc) - timedelta(minutes=LOCK_MINUTES + 1))
+            recoveries = sum(pool.map(_contention_worker, [(root, "contention-test", job_id, "recover")] * workers))
+
+            status = "OK" if claims == 1 and recoveries == 1 else "FAILED"
+            print(f"Round {round_number}: {workers} workers, {claims} claim(s), {recoveries} recovery(ies) - {status}")
+            if status != "OK":
+                sys.exit(1)
+        tracker.stop()
@@ -0,0 +1,233 @@
+#!/usr/bin/python3
+# local_sqs.py - Filesystem-backed SQS stand-in with visibility timeouts
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+
+from local_s3 import ClientError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VISIBILITY_TIMEOUT = 30  # seconds, the SQS queue default
+POLL_SECONDS = 0.2               # how often a long poll looks for new messages
+
+def _error(code, message, operation):
+    """Build a ClientError for an SQS operation"""
+    return ClientError({
+        'Error': {'Code': code, 'Message': message},
+        'ResponseMetadata': {'HTTPStatusCode': 400}
+    }, operation)
+
+
+class LocalSQSClient:
+    """
+    Drop-in replacement for the subset of the boto3 SQS client used by this project
+
+    Each queue is a directory under root (the queue URL is any string, e.g.
+    a queue name) holding one JSON file per message. Receiving a message
+    hides it until its visibility timeout passes and issues a new receipt
+    handle, so unacknowledged messages are redelivered as on SQS. A lock
+    file per queue serializes access across threads and processes, so
+    several local workers can share one queue.
+    """
+
+    def __init__(self, root):
+        """Initialize the stand-in rooted at a local directory"""
+        self.root = root
+        self._thread_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _queue_dir(self, queue_url):
+        path = os.path.join(self.root, quote(queue_url, safe=''))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @contextmanager
+    def _locked(self, queue_url):
+        """Exclusive lock on a queue for this process and every other process"""
+        with self._thread_lock:
+            with open(os.path.join(self._queue_dir(queue_url), ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _message_path(self, queue_url, message_id):
+        return os.path.join(self._queue_dir(queue_url), f"{message_id}.json")
+
+    def _read(self, queue_url, message_id):
+        try:
+            with open(self._message_path(queue_url, message_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, queue_url, message):
+        path = self._message_path(queue_url, message["MessageId"])
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(message, f)
+        os.replace(temp_path, path)
+
+    def _messages(self, queue_url):
+        """Every message in a queue, oldest first"""
+        messages = []
+        for name in os.listdir(self._queue_dir(queue_url)):
+            if name.endswith(".json"):
+                message = self._read(queue_url, name[:-len(".json")])
+                if message:
+                    messages.append(message)
+        return sorted(messages, key=lambda message: message["SentTimestamp"])
+
+    @staticmethod
+    def _message_id(receipt_handle):
+        return receipt_handle.split(":", 1)[0]
+
+    def create_queue(self, QueueName, **kwargs):
+        """Create a queue; its URL is its name"""
+        self._queue_dir(QueueName)
+        return {"QueueUrl": QueueName}
+
+    def get_queue_url(self, QueueName, **kwargs):
+        """URL of an existing queue"""
+        return {"QueueUrl": QueueName}
+
+    def send_message(self, QueueUrl, MessageBody, DelaySeconds=0, MessageAttributes=None, **kwargs):
+        """Add a message, optionally hidden for DelaySeconds"""
+        now = time.time()
+        message = {
+            "MessageId": str(uuid.uuid4()),
+            "Body": MessageBody,
+            "MessageAttributes": MessageAttributes or {},
+            # Nanoseconds keep messages sent in the same millisecond in order
+            "SentTimestamp": time.time_ns(),
+            "VisibleAt": now + DelaySeconds,
+            "ReceiveCount": 0,
+            "ReceiptHandle": None
+        }
+        with self._locked(QueueUrl):
+            self._write(QueueUrl, message)
+        return {"MessageId": message["MessageId"]}
+
+    def send_message_batch(self, QueueUrl, Entries, **kwargs):
+        """Send up to 10 messages"""
+        successful = []
+        for entry in Entries:
+            response = self.send_message(QueueUrl, entry["MessageBody"], entry.get("DelaySeconds", 0),
+                                         entry.get("MessageAttributes"))
+            successful.append({"Id": entry["Id"], "MessageId": response["MessageId"]})
+        return {"Successful": successful, "Failed": []}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=0,
+                        VisibilityTimeout=DEFAULT_VISIBILITY_TIMEOUT, **kwargs):
+        """Receive up to MaxNumberOfMessages visible messages, waiting up to WaitTimeSeconds for one"""
+        deadline = time.time() + WaitTimeSeconds
+        while True:
+            received = []
+            with self._locked(QueueUrl):
+                now = time.time()
+                for message in self._messages(QueueUrl):
+                    if len(received) >= MaxNumberOfMessages:
+                        break
+                    if message["VisibleAt"] > now:
+                        continue
+                    message["VisibleAt"] = now + VisibilityTimeout
+                    message["ReceiveCount"] += 1
+                    message["ReceiptHandle"] = f"{message['MessageId']}:{uuid.uuid4()}"
+                    self._write(QueueUrl, message)
+                    received.append({
+                        "MessageId": message["MessageId"],
+                        "ReceiptHandle": message["ReceiptHandle"],
+                        "Body": message["Body"],
+                        "MessageAttributes": message["MessageAttributes"],
+                        "Attributes": {
+                            "ApproximateReceiveCount": str(message["ReceiveCount"]),
+                            "SentTimestamp": str(message["SentTimestamp"] // 1000000)
+                        }
+                    })
+
+            if received:
+                return {"Messages": received}
+            if time.time() >= deadline:
+                return {}
+            time.sleep(min(POLL_SECONDS, max(deadline - time.time(), 0)))
+
+    def delete_message(self, QueueUrl, ReceiptHandle, **kwargs):
+        """Delete a received message (deleting one that is already gone succeeds, as on SQS)"""
+        with self._locked(QueueUrl):
+            try:
+                os.remove(self._message_path(QueueUrl, self._message_id(ReceiptHandle)))
+            except FileNotFoundError:
+                pass
+        return {}
+
+    def delete_message_batch(self, QueueUrl, Entries, **kwargs):
+        """Delete up to 10 received messages"""
+        for entry in Entries:
+            self.delete_message(QueueUrl, entry["ReceiptHandle"])
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout, **kwargs):
+        """Hide a received message for VisibilityTimeout more seconds (0 makes it visible now)"""
+        with self._locked(QueueUrl):
+            message = self._read(QueueUrl, self._message_id(ReceiptHandle))
+            # Only the latest receipt handle of a message is valid
+            if not message or message["ReceiptHandle"] != ReceiptHandle:
+                raise _error("ReceiptHandleIsInvalid", f"The receipt handle {ReceiptHandle} is not valid.",
+                             "ChangeMessageVisibility")
+            message["VisibleAt"] = time.time() + VisibilityTimeout
+            self._write(QueueUrl, message)
+        return {}
+
+    def change_message_visibility_batch(self, QueueUrl, Entries, **kwargs):
+        """Change the visibility of up to 10 received messages"""
+        successful, failed = [], []
+        for entry in Entries:
+            try:
+                self.change_message_visibility(QueueUrl, entry["ReceiptHandle"], entry["VisibilityTimeout"])
+                successful.append({"Id": entry["Id"]})
+            except ClientError as e:
+                failed.append({"Id": entry["Id"], "Code": e.response["Error"]["Code"],
+                               "Message": e.response["Error"]["Message"], "SenderFault": True})
+        return {"Successful": successful, "Failed": failed}
+
+    def get_queue_attributes(self, QueueUrl, AttributeNames=None, **kwargs):
+        """Approximate visible and in-flight message counts"""
+        with self._locked(QueueUrl):
+            now = time.time()
+            messages = self._messages(QueueUrl)
+        visible = sum(1 for message in messages if message["VisibleAt"] <= now)
+        return {"Attributes": {
+            "ApproximateNumberOfMessages": str(visible),
+            "ApproximateNumberOfMessagesNotVisible": str(len(messages) - visible)
+        }}
+
+
+# Example usage
+if __name__ == "__main__":
+    # Show redelivery: a message that is received but not deleted comes back
+    import tempfile
+
+    logging.basicConfig(level=logging.INFO)
+
+    with tempfile.TemporaryDirectory() as root:
+        sqs = LocalSQSClient(root)
+        queue_url = sqs.create_queue(QueueName="videos")["QueueUrl"]
+        sqs.send_message(QueueUrl=queue_url, MessageBody=json.dumps({"youtube_url": "https://youtu.be/a1Ih5GGtR8Q"}))
+
+        first = sqs.receive_message(QueueUrl=queue_url, VisibilityTimeout=1)["Messages"][0]
+        print("Received:", first["Body"])
+        print("While in flight:", sqs.receive_message(QueueUrl=queue_url).get("Messages", []))
+
+        again = sqs.receive_message(QueueUrl=queue_url, WaitTimeSeconds=2)["Messages"][0]
+        print("Redelivered, receive count", again["Attributes"]["ApproximateReceiveCount"])
+        sqs.delete_message(QueueUrl=queue_url, ReceiptHandle=again["ReceiptHandle"])
+        print(sqs.get_queue_attributes(QueueUrl=queue_url)["Attributes"])
@@ -0,0 +1,248 @@
+#!/usr/bin/python3
+# message_receiver.py - Batched SQS receive with a prefetch buffer
+
+import time
+import logging
+import threading
+from collections import deque
+
+from lease_keeper import DEFAULT_VISIBILITY_TIMEOUT, RENEWALS_PER_LEASE
+
+logger = logging.getLogger(__name__)
+
+SQS_MAX_BATCH = 10          # receive and delete batch limit imposed by SQS
+DEFAULT_WAIT_TIME = 20      # seconds, the SQS long polling maximum
+DEFAULT_MAX_HOLD = 30 * 60  # seconds a prefetched message may wait before it is given back
+DELETE_FLUSH_SECONDS = 2    # longest a processed message waits for a batch delete
+MAX_VISIBILITY_TIMEOUT = 12 * 60 * 60  # seconds, the SQS limit
+
+class MessageReceiver:
+    """
+    Long-polls an SQS queue in batches and hands messages out one at a time
+
+    Prefetched messages wait in a buffer. A background thread extends their
+    visibility so other workers do not receive them in the meantime, and
+    gives back (visibility 0) any that have waited longer than max_hold, so
+    one busy worker does not sit on work another could start. Processed
+    messages are deleted in batches.
+    """
+
+    def __init__(self, sqs, queue_url, max_messages=SQS_MAX_BATCH, wait_time=DEFAULT_WAIT_TIME,
+                 visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT, max_hold=DEFAULT_MAX_HOLD):
+        """
+        Initialize the receiver
+
+        Args:
+            sqs: SQS client
+            queue_url: Queue to receive from
+            max_messages: Messages requested per receive (at most 10)
+            wait_time: Long polling wait in seconds
+            visibility_timeout: Visibility timeout for received messages, in seconds
+            max_hold: Seconds a buffered message may wait before it is released to other workers
+        """
+        self.sqs = sqs
+        self.queue_url = queue_url
+        self.max_messages = max(1, min(max_messages, SQS_MAX_BATCH))
+        self.wait_time = wait_time
+        self.visibility_timeout = visibility_timeout
+        self.max_hold = max_hold
+
+        self._buffer = deque()       # (message, received_at, visible_until)
+        self._pending_deletes = []   # (receipt handle, queued_at)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def next_message(self):
+        """
+        Next message to process, long-polling when the buffer is empty
+
+        Returns:
+            SQS message dict, or None if the queue is empty
+        """
+        with self._lock:
+            if self._buffer:
+                return self._buffer.popleft()[0]
+
+        self.flush_deletes()
+        messages = self.receive()
+        if not messages:
+            return None
+
+        now = time.time()
+        with self._lock:
+            for message in messages:
+                self._buffer.append((message, now, now + self.visibility_timeout))
+            message = self._buffer.popleft()[0]
+        self._ensure_thread()
+        return message
+
+    def receive(self):
+        """One long-poll receive of up to max_messages messages"""
+        try:
+            response = self.sqs.receive_message(
+                QueueUrl=self.queue_url,
+                AttributeNames=['All'],
+                MaxNumberOfMessages=self.max_messages,
+                MessageAttributeNames=['All'],
+                WaitTimeSeconds=self.wait_time,
+                VisibilityTimeout=int(self.visibility_timeout)
+            )
+        except Exception as e:
+            logger.error(f"Error receiving messages: {str(e)}")
+            return []
+
+        messages = response.get('Messages', [])
+        if messages:
+            logger.info(f"Received {len(messages)} messages")
+        return messages
+
+    def buffered(self):
+        """Number of prefetched messages waiting to be processed"""
+        with self._lock:
+            return len(self._buffer)
+
+    def delete(self, receipt_handle):
+        """Queue a processed message for deletion (sent in batches of up to 10)"""
+        with self._lock:
+            self._pending_deletes.append((receipt_handle, time.time()))
+            full = len(self._pending_deletes) >= SQS_MAX_BATCH
+        if full:
+            self.flush_deletes()
+        else:
+            self._ensure_thread()
+
+    def retry_later(self, receipt_handle, delay):
+        """
+        Keep a message but hide it for delay seconds, so it is received again after a backoff
+
+        Returns:
+            True if the visibility was changed
+        """
+        try:
+            self.sqs.change_message_visibility(
+                QueueUrl=self.queue_url,
+                ReceiptHandle=receipt_handle,
+                VisibilityTimeout=int(min(max(delay, 0), MAX_VISIBILITY_TIMEOUT))
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error delaying message: {str(e)}")
+            return False
+
+    def flush_deletes(self):
+        """Send every queued delete now"""
+        with self._lock:
+            handles = [handle for handle, _ in self._pending_deletes]
+            self._pending_deletes = []
+
+        for start in range(0, len(handles), SQS_MAX_BATCH):
+            batch = handles[start:start + SQS_MAX_BATCH]
+            try:
+                response = self.sqs.delete_message_batch(
+                    QueueUrl=self.queue_url,
+                    Entries=[{"Id": str(i), "ReceiptHandle": handle} for i, handle in enumerate(batch)]
+                )
+                for failure in response.get('Failed', []):
+                    logger.error(f"Error deleting message: {failure.get('Message', failure.get('Code'))}")
+            except Exception as e:
+                logger.error(f"Error deleting messages: {str(e)}")
+
+    def _change_visibility(self, entries, timeout):
+        """Set the visibility of buffered messages in batches"""
+        for start in range(0, len(entries), SQS_MAX_BATCH):
+            batch = entries[start:start + SQS_MAX_BATCH]
+            try:
+                self.sqs.change_message_visibility_batch(
+                    QueueUrl=self.queue_url,
+                    Entries=[
+                        {"Id": str(i), "ReceiptHandle": message['ReceiptHandle'], "VisibilityTimeout": int(timeout)}
+                        for i, message in enumerate(batch)
+                    ]
+                )
+            except Exception as e:
+                logger.error(f"Error changing message visibility: {str(e)}")
+
+    def maintain(self):
+        """
+        Keep the buffer healthy: extend messages close to reappearing in the
+        queue, release messages held longer than max_hold, flush old deletes
+        """
+        now = time.time()
+        renew_margin = self.visibility_timeout / RENEWALS_PER_LEASE
+        extend, release = [], []
+
+        with self._lock:
+            kept = deque()
+            for message, received_at, visible_until in self._buffer:
+                if now - received_at >= self.max_hold:
+                    release.append(message)
+                    continue
+                if visible_until - now <= renew_margin:
+                    extend.append(message)
+                    visible_until = now + self.visibility_timeout
+                kept.append((message, received_at, visible_until))
+            self._buffer = kept
+            due = self._pending_deletes and now - self._pending_deletes[0][1] >= DELETE_FLUSH_SECONDS
+
+        if extend:
+            self._change_visibility(extend, self.visibility_timeout)
+        if release:
+            logger.info(f"Releasing {len(release)} prefetched messages back to the queue")
+            self._change_visibility(release, 0)
+        if due:
+            self.flush_deletes()
+
+    def close(self):
+        """Flush deletes and give every buffered message back to the queue"""
+        self._stopped.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+        with self._lock:
+            release = [message for message, _, _ in self._buffer]
+            self._buffer.clear()
+        if release:
+            self._change_visibility(release, 0)
+        self.flush_deletes()
+
+    def _ensure_thread(self):
+        """Start the maintenance thread on first use"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="sqs-receiver", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """Maintenance loop"""
+        while not self._stopped.wait(1):
+            try:
+                self.maintain()
+            except Exception as e:
+                logger.error(f"Error maintaining message buffer: {str(e)}")
+
+
+# Example usage
+if __name__ == "__main__":
+    # Drain a queue without processing: python message_receiver.py <queue_url>
+    import sys
+    import boto3
+
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) < 2:
+        print("Usage: python message_receiver.py <queue_url> [region]")
+        sys.exit(1)
+
+    region = sys.argv[2] if len(sys.argv) > 2 else "us-east-1"
+    receiver = MessageReceiver(boto3.client('sqs', region_name=region), sys.argv[1])
+    count = 0
+    while True:
+        message = receiver.next_message()
+        if message is None:
+            break
+        print(message['Body'])
+        receiver.delete(message['ReceiptHandle'])
+        count += 1
+    receiver.close()
+    print(f"Drained {count} messages")
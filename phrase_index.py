@@ -0,0 +1,272 @@
+#!/usr/bin/python3
+# phrase_index.py - Indexed fuzzy phrase matching tolerant of ASR errors
+
+import re
+from collections import Counter, defaultdict
+
+TOKEN_PATTERN = re.compile(r"[\w']+")
+DEFAULT_NGRAM_SIZE = 3
+
+def character_ngrams(word, n=DEFAULT_NGRAM_SIZE):
+    """Return the set of padded character n-grams of a word"""
+    padded = "^" * (n - 1) + word + "$" * (n - 1)
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+def bounded_edit_distance(a, b, max_distance):
+    """
+    Levenshtein distance between two words, giving up once it exceeds max_distance
+
+    Returns:
+        The edit distance, or max_distance + 1 if it is larger than max_distance
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if a == b:
+        return 0
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j, char_b in enumerate(b, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            )
+            row_min = min(row_min, current[j])
+        # Every later row is at least this row's minimum
+        if row_min > max_distance:
+            return max_distance + 1
+        previous = current
+
+    return min(previous[-1], max_distance + 1)
+
+def metaphone(word):
+    """
+    Simplified Metaphone key for a word
+
+    Words that sound alike ("hustle", "hostel") share a key, which catches
+    ASR substitutions that are far apart in spelling.
+    """
+    word = re.sub(r"[^a-z]", "", word.lower())
+    if not word:
+        return ""
+
+    for prefix in ("kn", "gn", "pn", "ae", "wr"):
+        if word.startswith(prefix):
+            word = word[1:]
+            break
+    if word.startswith("x"):
+        word = "s" + word[1:]
+    elif word.startswith("wh"):
+        word = "w" + word[2:]
+
+    vowels = "aeiou"
+    key = []
+    for i, char in enumerate(word):
+        prev = word[i - 1] if i > 0 else ""
+        nxt = word[i + 1] if i + 1 < len(word) else ""
+        after = word[i + 2] if i + 2 < len(word) else ""
+
+        if char == prev and char != "c":
+            continue
+        if char in vowels:
+            if i == 0:
+                key.append(char.upper())
+        elif char == "b":
+            if not (prev == "m" and not nxt):
+                key.append("B")
+        elif char == "c":
+            if nxt == "i" and after == "a" or nxt == "h":
+                key.append("K" if prev == "s" else "X")
+            elif nxt in "iey" and nxt:
+                key.append("S")
+            else:
+                key.append("K")
+        elif char == "d":
+            key.append("J" if nxt == "g" and after and after in "iey" else "T")
+        elif char == "g":
+            if nxt == "h" and after and after not in vowels:
+                continue
+            if nxt == "n" and (not after or word[i + 2:] == "ed"):
+                continue
+            key.append("J" if nxt and nxt in "iey" and prev != "g" else "K")
+        elif char == "h":
+            if prev and prev in "csptg":
+                continue
+            if nxt and nxt in vowels:
+                key.append("H")
+        elif char == "k":
+            if prev != "c":
+                key.append("K")
+        elif char == "p":
+            key.append("F" if nxt == "h" else "P")
+        elif char == "q":
+            key.append("K")
+        elif char == "s":
+            if nxt == "h" or nxt == "i" and after in ("o", "a"):
+                key.append("X")
+            else:
+                key.append("S")
+        elif char == "t":
+            if nxt == "i" and after in ("o", "a"):
+                key.append("X")
+            elif nxt == "h":
+                key.append("0")
+            elif not (nxt == "c" and after == "h"):
+                key.append("T")
+        elif char == "v":
+            key.append("F")
+        elif char in "wy":
+            if nxt and nxt in vowels:
+                key.append(char.upper())
+        elif char == "x":
+            key.append("KS")
+        elif char == "z":
+            key.append("S")
+        else:
+            key.append(char.upper())
+
+    return "".join(key)
+
+
+class TranscriptIndex:
+    """Token index over one or more transcript texts used to generate match candidates"""
+
+    def __init__(self, texts, case_sensitive=False, ngram_size=DEFAULT_NGRAM_SIZE):
+        """
+        Tokenize and index transcript texts
+
+        Args:
+            texts: List of text strings (e.g. one per segment), indexed as one token stream
+            case_sensitive: Whether tokens keep their case
+            ngram_size: Character n-gram size for candidate generation
+        """
+        self.case_sensitive = case_sensitive
+        self.ngram_size = ngram_size
+        self.tokens = []  # (token, text_index, start_char, end_char)
+        self.positions = defaultdict(list)  # token -> positions in self.tokens
+
+        for text_index, text in enumerate(texts):
+            for match in TOKEN_PATTERN.finditer(text):
+                token = match.group(0) if case_sensitive else match.group(0).lower()
+                self.positions[token].append(len(self.tokens))
+                self.tokens.append((token, text_index, match.start(), match.end()))
+
+        # Built on first use, over the vocabulary rather than every token
+        self._ngram_index = None
+        self._phonetic_index = None
+
+    def ngram_index(self):
+        """Map of character n-gram -> vocabulary tokens containing it"""
+        if self._ngram_index is None:
+            self._ngram_index = defaultdict(list)
+            for token in self.positions:
+                for gram in character_ngrams(token, self.ngram_size):
+                    self._ngram_index[gram].append(token)
+        return self._ngram_index
+
+    def phonetic_index(self):
+        """Map of Metaphone key -> vocabulary tokens with that key"""
+        if self._phonetic_index is None:
+            self._phonetic_index = defaultdict(list)
+            for token in self.positions:
+                self._phonetic_index[metaphone(token)].append(token)
+        return self._phonetic_index
+
+    def candidates(self, word, max_edits):
+        """
+        Vocabulary tokens that may be within max_edits of word
+
+        Uses the q-gram count filter: each edit destroys at most n of the
+        word's n-grams, so a match shares at least len(grams) - max_edits * n.
+        """
+        grams = character_ngrams(word, self.ngram_size)
+        threshold = len(grams) - max_edits * self.ngram_size
+
+        if threshold <= 0:
+            # Word too short for the filter to prune anything
+            return [token for token in self.positions if abs(len(token) - len(word)) <= max_edits]
+
+        index = self.ngram_index()
+        shared = Counter()
+        for gram in grams:
+            shared.update(index.get(gram, ()))
+
+        return [
+            token for token, count in shared.items()
+            if count >= threshold and abs(len(token) - len(word)) <= max_edits
+        ]
+
+    def phonetic_candidates(self, word):
+        """Vocabulary tokens that share word's Metaphone key"""
+        return self.phonetic_index().get(metaphone(word), [])
+
+
+class FuzzyPhraseMatcher:
+    """Finds approximate occurrences of a phrase in a TranscriptIndex"""
+
+    def __init__(self, phrase, max_edits=1, phonetic=False, case_sensitive=False):
+        """
+        Initialize the matcher
+
+        Args:
+            phrase: Phrase to match (one or more words)
+            max_edits: Maximum edit distance allowed per word
+            phonetic: Also accept words with the same Metaphone key
+            case_sensitive: Whether matching keeps case
+        """
+        self.max_edits = max_edits
+        self.phonetic = phonetic
+        self.case_sensitive = case_sensitive
+        self.words = [
+            word if case_sensitive else word.lower()
+            for word in TOKEN_PATTERN.findall(phrase)
+        ]
+
+    def matching_forms(self, index):
+        """
+        Resolve which vocabulary tokens match each phrase word
+
+        Returns:
+            List with one set of accepted tokens per phrase word
+        """
+        forms = []
+        for word in self.words:
+            accepted = {
+                token for token in index.candidates(word, self.max_edits)
+                if bounded_edit_distance(token, word, self.max_edits) <= self.max_edits
+            }
+            if self.phonetic:
+                accepted.update(index.phonetic_candidates(word))
+            forms.append(accepted)
+        return forms
+
+    def find(self, index):
+        """
+        Find non-overlapping phrase matches
+
+        Returns:
+            List of (first_token_position, last_token_position) tuples
+        """
+        if not self.words:
+            return []
+
+        forms = self.matching_forms(index)
+        if not all(forms):
+            return []
+
+        starts = sorted(position for token in forms[0] for position in index.positions[token])
+        length = len(self.words)
+        matches = []
+        last_end = -1
+
+        for start in starts:
+            if start <= last_end or start + length > len(index.tokens):
+                continue
+            if all(index.tokens[start + j][0] in forms[j] for j in range(1, length)):
+                matches.append((start, start + length - 1))
+                last_end = start + length - 1
+
+        return matches
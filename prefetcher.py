@@ -0,0 +1,226 @@
+#!/usr/bin/python3
+# prefetcher.py - Download/convert stage that runs ahead of transcription
+
+import os
+import time
+import queue
+import shutil
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFETCH_THREADS = 1
+DEFAULT_MAX_READY = 2
+DEFAULT_DISK_QUOTA_GB = 20
+DEFAULT_MIN_FREE_GB = 2
+DEFAULT_IDLE_WAIT = 5  # seconds a fetch thread waits after finding the queue empty
+
+def directory_size(path):
+    """Total size in bytes of the files under a directory"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class PrefetchQueue:
+    """
+    Bounded producer/consumer queue of audio that is ready to transcribe
+
+    Fetch threads take work from source(), run prepare() on it (download and
+    convert) and put the result on a bounded queue that the transcription
+    stage consumes. A thread only starts a new fetch while the prepared items
+    on disk are under the quota and the disk has min_free bytes left.
+
+    Prepared items are dicts; their "temp_dir" is measured to account for
+    disk use, and released when the consumer calls done().
+    """
+
+    def __init__(self, source, prepare, discard=None, threads=DEFAULT_PREFETCH_THREADS,
+                 max_ready=DEFAULT_MAX_READY, disk_quota=DEFAULT_DISK_QUOTA_GB * 1024 ** 3,
+                 min_free=DEFAULT_MIN_FREE_GB * 1024 ** 3, disk_path=".", idle_wait=DEFAULT_IDLE_WAIT):
+        """
+        Initialize the prefetch queue
+
+        Args:
+            source: Callable returning the next unit of work, or None if there is none
+            prepare: Callable turning a unit into a prepared item dict, or None if it was handled
+            discard: Callable for prepared items that are never consumed (on stop)
+            threads: Number of fetch threads
+            max_ready: Maximum prepared items waiting for the consumer
+            disk_quota: Maximum bytes of prepared items on disk
+            min_free: Free bytes to leave on the disk holding disk_path
+            disk_path: Directory prepared items are written under
+            idle_wait: Seconds to wait after source() returned nothing
+        """
+        self.source = source
+        self.prepare = prepare
+        self.discard = discard
+        self.threads = threads
+        self.disk_quota = disk_quota
+        self.min_free = min_free
+        self.disk_path = disk_path
+        self.idle_wait = idle_wait
+
+        self._ready = queue.Queue(maxsize=max_ready)
+        self._used = 0
+        self._disk = threading.Condition()
+        self._stopped = threading.Event()
+        self._workers = []
+
+        self.prepared = 0
+        self.consumed = 0
+        self.consumer_wait = 0.0
+
+    def start(self):
+        """Start the fetch threads"""
+        if self._workers:
+            return self
+        self._stopped.clear()
+        for index in range(self.threads):
+            thread = threading.Thread(target=self._run, name=f"prefetch-{index}", daemon=True)
+            thread.start()
+            self._workers.append(thread)
+        logger.info(f"Started {self.threads} prefetch threads")
+        return self
+
+    def _disk_available(self):
+        """True if another item may be fetched without exceeding the disk limits"""
+        if self._used >= self.disk_quota:
+            return False
+        try:
+            return shutil.disk_usage(self.disk_path).free >= self.min_free
+        except OSError:
+            return True
+
+    def _run(self):
+        """Fetch loop"""
+        while not self._stopped.is_set():
+            with self._disk:
+                while not self._stopped.is_set() and not self._disk_available():
+                    self._disk.wait(timeout=5)
+            if self._stopped.is_set():
+                break
+
+            try:
+                unit = self.source()
+                if unit is None:
+                    self._stopped.wait(self.idle_wait)
+                    continue
+
+                item = self.prepare(unit)
+                if item is None:
+                    continue
+            except Exception as e:
+                logger.error(f"Error in prefetch thread: {str(e)}")
+                continue
+
+            item["disk_bytes"] = directory_size(item["temp_dir"]) if item.get("temp_dir") else 0
+            with self._disk:
+                self._used += item["disk_bytes"]
+            self.prepared += 1
+
+            # Blocks while the queue is full
+            while not self._stopped.is_set():
+                try:
+                    self._ready.put(item, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+            else:
+                self._discard(item)
+
+    def get(self, timeout=None):
+        """
+        Next prepared item
+
+        Returns:
+            Item dict, or None if nothing became ready within timeout
+        """
+        started = time.time()
+        try:
+            item = self._ready.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        finally:
+            self.consumer_wait += time.time() - started
+        self.consumed += 1
+        return item
+
+    def done(self, item):
+        """Release the disk space accounted to a consumed item"""
+        with self._disk:
+            self._used -= item.get("disk_bytes", 0)
+            self._disk.notify_all()
+
+    def ready(self):
+        """Number of prepared items waiting"""
+        return self._ready.qsize()
+
+    def stats(self):
+        """Counters for monitoring how well fetching keeps up with transcription"""
+        return {
+            "prepared": self.prepared,
+            "consumed": self.consumed,
+            "ready": self.ready(),
+            "disk_bytes": self._used,
+            "consumer_wait_sec": round(self.consumer_wait, 1)
+        }
+
+    def _discard(self, item):
+        """Hand an unconsumed item back to the owner"""
+        self.done(item)
+        if self.discard:
+            try:
+                self.discard(item)
+            except Exception as e:
+                logger.error(f"Error discarding prefetched item: {str(e)}")
+
+    def stop(self):
+        """Stop fetching and discard prepared items that were not consumed"""
+        self._stopped.set()
+        with self._disk:
+            self._disk.notify_all()
+        for thread in self._workers:
+            thread.join(timeout=10)
+        self._workers = []
+
+        while True:
+            try:
+                self._discard(self._ready.get_nowait())
+            except queue.Empty:
+                break
+
+
+# Example usage
+if __name__ == "__main__":
+    # Simulate slow fetches feeding a slower consumer
+    import tempfile
+
+    logging.basicConfig(level=logging.INFO)
+
+    units = iter(range(6))
+    with tempfile.TemporaryDirectory() as root:
+        def prepare(unit):
+            time.sleep(0.2)  # download + convert
+            path = os.path.join(root, str(unit))
+            os.makedirs(path)
+            with open(os.path.join(path, "audio.wav"), "wb") as f:
+                f.write(b"\0" * 1024)
+            return {"unit": unit, "temp_dir": path}
+
+        prefetcher = PrefetchQueue(lambda: next(units, None), prepare, threads=2, disk_path=root).start()
+        started = time.time()
+        for _ in range(6):
+            item = prefetcher.get(timeout=5)
+            time.sleep(0.3)  # transcribe
+            shutil.rmtree(item["temp_dir"])
+            prefetcher.done(item)
+        prefetcher.stop()
+        print(f"Processed 6 items in {time.time() - started:.1f}s (sequential: 3.0s)")
+        print(prefetcher.stats())
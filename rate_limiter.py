@@ -0,0 +1,211 @@
+#!/usr/bin/python3
+# rate_limiter.py - Fleet-wide token bucket pacing requests to YouTube
+
+import time
+import logging
+import threading
+
+from storage import update_object
+
+logger = logging.getLogger(__name__)
+
+RATE_KEY = "control/download_rate.json"
+RATE_MAX_RETRIES = 10         # conditional bucket writes before pacing locally
+DEFAULT_BURST = 2             # tokens a worker takes per bucket write
+DEFAULT_LOCAL_TTL = 60        # seconds a worker may hold unspent tokens
+THROTTLE_BACKOFF = 0.8        # rate factor kept after a throttling error
+RECOVERY_STEP = 0.01          # rate factor regained per bucket write
+MIN_RATE_FACTOR = 0.1
+
+class RateLimiter:
+    """
+    Distributed token bucket shared by every worker through one S3 object
+
+    The bucket refills at the fleet-wide rate. A worker takes up to burst
+    tokens with one If-Match write and spends them locally, so bucket
+    writes scale with downloads divided by burst, not with downloads.
+
+    Tokens are reserved, not polled for: a worker that finds the bucket
+    empty still takes a token, driving the balance negative, and sleeps
+    until the refill covers its debt. Requests therefore start at evenly
+    spaced times at the configured rate, instead of the fleet retrying in
+    waves and overshooting. Throttling errors reported with
+    record_throttle() lower the shared rate factor by 20%, and each bucket
+    write regains 1%, so the fleet settles just under the rate YouTube
+    accepts.
+    """
+
+    def __init__(self, s3_client, s3_bucket, rate_per_minute, key=RATE_KEY, burst=DEFAULT_BURST,
+                 capacity=None, local_ttl=DEFAULT_LOCAL_TTL):
+        """
+        Initialize the limiter
+
+        Args:
+            s3_client: S3 client (a LocalS3Client for local runs)
+            s3_bucket: Bucket holding the bucket state
+            rate_per_minute: Fleet-wide requests per minute
+            key: Key of the bucket state object
+            burst: Tokens a worker takes at once and may spend without a write
+            capacity: Most tokens the shared bucket accumulates while idle (Default: burst)
+            local_ttl: Seconds after which unspent local tokens are dropped
+        """
+        self.s3 = s3_client
+        self.s3_bucket = s3_bucket
+        self.rate = rate_per_minute / 60.0
+        self.key = key
+        self.burst = max(int(burst), 1)
+        self.capacity = capacity if capacity is not None else self.burst
+        self.local_ttl = local_ttl
+
+        self._local_tokens = 0
+        self._local_expires = 0
+        self._lock = threading.Lock()
+
+        # Metrics for this process
+        self.acquired = 0
+        self.delayed = 0
+        self.waited_seconds = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+        self.rate_factor = 1.0
+
+    def _empty_state(self):
+        return {"tokens": float(self.capacity), "updated_at": time.time(), "rate_factor": 1.0}
+
+    def _update(self, change):
+        """
+        Apply change(state, now) -> (new state, result) with conditional writes
+
+        Returns:
+            The result of the change that was written, or None if no write succeeded
+        """
+        outcome = {}
+
+        def apply(state):
+            state, outcome["result"] = change(state or self._empty_state(), time.time())
+            return state
+
+        try:
+            state = update_object(self.s3, self.s3_bucket, self.key, apply, max_retries=RATE_MAX_RETRIES)
+        except Exception as e:
+            logger.error(f"Error updating rate limiter state: {str(e)}")
+            return None
+        self.rate_factor = state["rate_factor"]
+        return outcome["result"]
+
+    def _refill(self, state, now):
+        """Bucket balance at now (may be negative while reservations are outstanding)"""
+        rate = self.rate * state.get("rate_factor", 1.0)
+        elapsed = max(now - state.get("updated_at", now), 0)
+        return min(self.capacity, state.get("tokens", 0) + elapsed * rate), rate
+
+    def _reserve(self):
+        """
+        Take tokens from the shared bucket
+
+        Returns:
+            Tuple of (tokens taken, seconds until they may be used)
+        """
+        def take(state, now):
+            tokens, rate = self._refill(state, now)
+            taken = min(self.burst, int(tokens)) if tokens >= 1 else 1
+            tokens -= taken
+            factor = min(1.0, state.get("rate_factor", 1.0) + RECOVERY_STEP)
+            return ({"tokens": tokens, "updated_at": now, "rate_factor": factor},
+                    (taken, max(-tokens / rate, 0) if rate > 0 else 0))
+
+        result = self._update(take)
+        if result is None:
+            # The shared bucket is unreachable: pace this worker alone at the fleet rate
+            logger.warning("Rate limiter state unavailable, pacing locally")
+            return 1, 1 / self.rate if self.rate > 0 else 0
+        return result
+
+    def acquire(self):
+        """
+        Block until this worker may send one request
+
+        Returns:
+            Seconds spent waiting
+        """
+        with self._lock:
+            now = time.time()
+            if self._local_tokens and now < self._local_expires:
+                self._local_tokens -= 1
+                self.acquired += 1
+                return 0.0
+            self._local_tokens = 0
+
+            taken, wait = self._reserve()
+            # The extra tokens of a burst become usable once the reservation is due
+            self._local_tokens = taken - 1
+            self._local_expires = now + wait + self.local_ttl
+
+            self.acquired += 1
+            self.last_wait = wait
+            if wait > 0:
+                self.delayed += 1
+                self.waited_seconds += wait
+                self.max_wait = max(self.max_wait, wait)
+
+        if wait > 1:
+            logger.info(f"Rate limiter: waiting {wait:.1f}s before the next YouTube request")
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def record_throttle(self):
+        """Lower the fleet's rate after YouTube throttled or bot-checked a request"""
+        def slow_down(state, now):
+            tokens, _ = self._refill(state, now)
+            factor = max(state.get("rate_factor", 1.0) * THROTTLE_BACKOFF, MIN_RATE_FACTOR)
+            return {"tokens": tokens, "updated_at": now, "rate_factor": factor}, factor
+
+        factor = self._update(slow_down)
+        if factor is not None:
+            logger.warning(f"YouTube throttling reported, fleet download rate now "
+                           f"{self.rate * 60 * factor:.1f}/min")
+        with self._lock:
+            self._local_tokens = 0
+
+    def stats(self):
+        """Pacing metrics for this process"""
+        return {
+            "rate_per_minute": round(self.rate * 60 * self.rate_factor, 2),
+            "rate_factor": round(self.rate_factor, 3),
+            "acquired": self.acquired,
+            "delayed": self.delayed,
+            "waited_seconds": round(self.waited_seconds, 1),
+            "max_wait": round(self.max_wait, 1),
+            "last_wait": round(self.last_wait, 1),
+            "local_tokens": self._local_tokens
+        }
+
+
+# Example usage
+if __name__ == "__main__":
+    # Four workers sharing 60 requests per minute against the local S3 stand-in
+    import tempfile
+    from local_s3 import LocalS3Client
+
+    logging.basicConfig(level=logging.INFO)
+
+    with tempfile.TemporaryDirectory() as root:
+        s3 = LocalS3Client(root)
+        starts = []
+
+        def run_worker():
+            limiter = RateLimiter(s3, "bucket", rate_per_minute=60, burst=2)
+            for _ in range(5):
+                limiter.acquire()
+                starts.append(time.time())
+
+        began = time.time()
+        threads = [threading.Thread(target=run_worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        elapsed = max(starts) - began
+        print(f"{len(starts)} requests in {elapsed:.1f}s ({len(starts) / max(elapsed, 1e-9) * 60:.0f}/min)")
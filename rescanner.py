@@ -0,0 +1,246 @@
+#!/usr/bin/python3
+# rescanner.py - Re-scan existing transcripts for new phrases (CPU only)
+
+import sys
+import json
+import argparse
+import logging
+import boto3
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from scanner import PhraseScanner
+from compact_transcript import CompactTranscript, COMPACT_TRANSCRIPT_NAME
+from storage import put_json, get_json, get_bytes, COMPRESSION_TYPES, DEFAULT_COMPRESSION
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 16
+
+class Rescanner:
+    """Applies phrases to transcripts already stored in S3 without downloading or transcribing"""
+
+    def __init__(self, s3_bucket, region="us-east-1", max_workers=DEFAULT_MAX_WORKERS, s3_client=None,
+                 compression=DEFAULT_COMPRESSION):
+        """
+        Initialize the rescanner
+
+        Args:
+            s3_bucket: S3 bucket holding transcripts and results
+            region: AWS region
+            max_workers: Maximum number of transcripts fetched and scanned concurrently
+            s3_client: Optional pre-built S3 client
+            compression: Compression for results objects ('gzip', 'zstd' or 'none')
+        """
+        self.s3_bucket = s3_bucket
+        self.s3 = s3_client or boto3.client('s3', region_name=region)
+        self.max_workers = max_workers
+        self.compression = compression
+
+    def list_transcribed_videos(self):
+        """List every video ID that has a transcript folder in S3"""
+        video_ids = []
+        kwargs = {
+            "Bucket": self.s3_bucket,
+            "Prefix": "transcripts/",
+            "Delimiter": "/"
+        }
+
+        while True:
+            response = self.s3.list_objects_v2(**kwargs)
+            for common_prefix in response.get('CommonPrefixes', []):
+                video_id = common_prefix['Prefix'][len("transcripts/"):].strip('/')
+                if video_id:
+                    video_ids.append(video_id)
+
+            if not response.get('IsTruncated'):
+                break
+            kwargs["ContinuationToken"] = response['NextContinuationToken']
+
+        return video_ids
+
+    def load_segments(self, video_id):
+        """
+        Load a video's transcript segments, or None if it has not been transcribed
+
+        Prefers the compact transcript, which skips word-level detail the
+        scanner does not need, and falls back to full_transcript.json.
+        """
+        try:
+            compact = get_bytes(self.s3, self.s3_bucket, f"transcripts/{video_id}/{COMPACT_TRANSCRIPT_NAME}")
+            return CompactTranscript(compact).segments(include_words=False)
+        except self.s3.exceptions.NoSuchKey:
+            pass
+
+        try:
+            transcript = get_json(self.s3, self.s3_bucket, f"transcripts/{video_id}/full_transcript.json")
+            return transcript.get("segments", [])
+        except self.s3.exceptions.NoSuchKey:
+            return None
+
+    def scan_video(self, video_id, phrases):
+        """
+        Scan one video's transcript for every phrase and save the results
+
+        Args:
+            video_id: YouTube video ID
+            phrases: List of phrases to scan for
+
+        Returns:
+            Dict of results keyed by phrase, or None if no transcript exists
+        """
+        segments = self.load_segments(video_id)
+        if segments is None:
+            logger.warning(f"No transcript found for {video_id}, skipping")
+            return None
+
+        results = {
+            "video_id": video_id,
+            "rescanned_at": datetime.now().isoformat(),
+            "phrases": {}
+        }
+
+        for phrase in phrases:
+            stats = PhraseScanner.from_spec(phrase).scan_segments(segments)
+            stats["video_id"] = video_id
+            stats["phrase"] = phrase
+            stats["processed_at"] = results["rescanned_at"]
+            results["phrases"][phrase] = stats
+
+        self.save_results(video_id, results)
+        return results
+
+    def save_results(self, video_id, results):
+        """Save re-scan results next to the worker's results for the video"""
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        s3_key = f"results/{video_id}/{timestamp}-rescan-results.json"
+
+        put_json(self.s3, self.s3_bucket, s3_key, results, self.compression)
+        return s3_key
+
+    def rescan(self, phrases, video_ids=None):
+        """
+        Re-scan a set of videos (or the whole corpus) for a list of phrases
+
+        Args:
+            phrases: List of phrases to scan for
+            video_ids: Video IDs to scan, or None for every transcribed video
+
+        Returns:
+            Summary dict with per-phrase totals
+        """
+        if not phrases:
+            raise ValueError("At least one phrase is required for a re-scan")
+
+        if not video_ids:
+            video_ids = self.list_transcribed_videos()
+
+        logger.info(f"Re-scanning {len(video_ids)} videos for {len(phrases)} phrases "
+                    f"with {self.max_workers} threads")
+
+        summary = {
+            "phrases": list(phrases),
+            "videos_requested": len(video_ids),
+            "videos_scanned": 0,
+            "videos_missing": [],
+            "videos_failed": {},
+            "total_occurrences": {phrase: 0 for phrase in phrases},
+            "started_at": datetime.now().isoformat()
+        }
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.scan_video, video_id, phrases): video_id
+                for video_id in video_ids
+            }
+
+            for future in as_completed(futures):
+                video_id = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    logger.error(f"Error re-scanning {video_id}: {str(e)}")
+                    summary["videos_failed"][video_id] = str(e)
+                    continue
+
+                if results is None:
+                    summary["videos_missing"].append(video_id)
+                    continue
+
+                summary["videos_scanned"] += 1
+                for phrase, stats in results["phrases"].items():
+                    summary["total_occurrences"][phrase] += stats.get("total_occurrences", 0)
+
+        summary["completed_at"] = datetime.now().isoformat()
+        logger.info(f"Re-scan complete: {summary['videos_scanned']} scanned, "
+                    f"{len(summary['videos_missing'])} missing, {len(summary['videos_failed'])} failed")
+        return summary
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Re-scan existing transcripts in S3 for new phrases without downloading or transcribing."
+    )
+    parser.add_argument(
+        "--phrases", "-p",
+        type=str,
+        nargs="+",
+        required=True,
+        help="One or more phrases to search for"
+    )
+    parser.add_argument(
+        "--video_ids", "-v",
+        type=str,
+        nargs="*",
+        help="Video IDs to re-scan (Default: every transcribed video)"
+    )
+    parser.add_argument(
+        "--s3_bucket", "-b",
+        type=str,
+        default="youtube-transcripts",
+        help="S3 bucket holding transcripts and results. (Default: 'youtube-transcripts')"
+    )
+    parser.add_argument(
+        "--region", "-r",
+        type=str,
+        default="us-east-1",
+        help="AWS region for S3. (Default: 'us-east-1')"
+    )
+    parser.add_argument(
+        "--max_workers", "-w",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help=f"Number of transcripts fetched and scanned in parallel. (Default: {DEFAULT_MAX_WORKERS})"
+    )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        choices=COMPRESSION_TYPES,
+        default=DEFAULT_COMPRESSION,
+        help=f"Compression for results objects. (Default: '{DEFAULT_COMPRESSION}')"
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    args = parse_arguments()
+
+    rescanner = Rescanner(args.s3_bucket, args.region, max_workers=args.max_workers,
+                          compression=args.compression)
+    try:
+        summary = rescanner.rescan(args.phrases, args.video_ids)
+    except Exception as e:
+        print(f"Error re-scanning transcripts: {str(e)}")
+        sys.exit(1)
+
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+#!/usr/bin/python3
+# retry_policy.py - Error-class-aware retry backoff and a fleet-wide download circuit breaker
+
+import time
+import uuid
+import random
+import logging
+
+from downloader import DownloadError, TokenError, NetworkError, UnavailableError
+from transcriber import TranscriptionError
+from storage import get_json, update_object
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_KEY = "control/circuit_breaker.json"
+MAX_DELAY = 12 * 60 * 60        # SQS visibility timeout limit, in seconds
+CIRCUIT_MAX_RETRIES = 10        # conditional state writes before giving up
+DEFAULT_CIRCUIT_THRESHOLD = 5   # token errors within the window that open the circuit
+DEFAULT_CIRCUIT_WINDOW = 300    # seconds a token error counts towards the threshold
+DEFAULT_CIRCUIT_COOLDOWN = 300  # seconds the circuit stays open the first time
+DEFAULT_CIRCUIT_MAX_COOLDOWN = 3600
+DEFAULT_CIRCUIT_REFRESH = 15    # seconds a worker reuses the state it last read
+
+# Backoff and attempt budget per error class. Attempts count every failed
+# attempt of the job, so a budget is the most attempts a job may have
+# when its latest failure is of that class.
+DEFAULT_RULES = {
+    "token": {"base_delay": 120, "max_delay": 3600, "max_attempts": 6},
+    "network": {"base_delay": 15, "max_delay": 900, "max_attempts": 5},
+    "unavailable": {"base_delay": 0, "max_delay": 0, "max_attempts": 1},
+    "download": {"base_delay": 60, "max_delay": 900, "max_attempts": 3},
+    "transcription": {"base_delay": 30, "max_delay": 600, "max_attempts": 3},
+    "other": {"base_delay": 30, "max_delay": 600, "max_attempts": 3}
+}
+
+class CircuitOpenError(DownloadError):
+    """Raised instead of downloading while the circuit breaker is open"""
+
+    def __init__(self, message, retry_after=DEFAULT_CIRCUIT_COOLDOWN):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed job is retried, and after how long
+
+    Delays grow exponentially with the job's attempts, up to the class's
+    maximum, with equal jitter (half fixed, half random) so jobs that
+    failed together do not come back together. Jobs deferred by an open
+    circuit come back shortly after it is due to close, spread over a
+    quarter of the cooldown, and do not use up an attempt.
+    """
+
+    def __init__(self, rules=None):
+        """
+        Initialize the policy
+
+        Args:
+            rules: Per-class overrides of DEFAULT_RULES, e.g. {"token": {"max_attempts": 10}}
+        """
+        self.rules = {error_class: dict(rule) for error_class, rule in DEFAULT_RULES.items()}
+        for error_class, rule in (rules or {}).items():
+            self.rules.setdefault(error_class, dict(DEFAULT_RULES["other"])).update(rule)
+
+    @staticmethod
+    def classify(error):
+        """Error class of an exception (a key of the rules, or "circuit_open")"""
+        if isinstance(error, CircuitOpenError):
+            return "circuit_open"
+        if isinstance(error, UnavailableError):
+            return "unavailable"
+        if isinstance(error, TokenError):
+            return "token"
+        if isinstance(error, NetworkError):
+            return "network"
+        if isinstance(error, DownloadError):
+            return "download"
+        if isinstance(error, TranscriptionError):
+            return "transcription"
+        return "other"
+
+    def delay(self, error_class, attempts):
+        """Seconds to wait before retrying a job that has failed attempts times"""
+        rule = self.rules.get(error_class, self.rules["other"])
+        ceiling = min(rule["max_delay"], rule["base_delay"] * 2 ** max(attempts - 1, 0))
+        return min(ceiling / 2 + random.uniform(0, ceiling / 2), MAX_DELAY)
+
+    def decide(self, error, attempts):
+        """
+        Decide how to handle a failed attempt
+
+        Args:
+            error: Exception that ended the attempt
+            attempts: Failed attempts of the job before this one
+
+        Returns:
+            Dict with retry (bool), delay (seconds), error_class and
+            counts_attempt (False for circuit-open deferrals)
+        """
+        error_class = self.classify(error)
+        if error_class == "circuit_open":
+            retry_after = max(error.retry_after, 1)
+            return {"retry": True, "delay": min(retry_after + random.uniform(0, retry_after / 4), MAX_DELAY),
+                    "error_class": error_class, "counts_attempt": False}
+
+        rule = self.rules.get(error_class, self.rules["other"])
+        attempts += 1
+        if attempts >= rule["max_attempts"]:
+            return {"retry": False, "delay": 0, "error_class": error_class, "counts_attempt": True}
+        return {"retry": True, "delay": self.delay(error_class, attempts),
+                "error_class": error_class, "counts_attempt": True}
+
+    def decide_abandoned(self, job):
+        """
+        Decide whether a job whose worker stopped mid-attempt is retried
+
+        The lost attempt counts against the budget of the job's last
+        recorded error class ("other" if it never failed), so a job that
+        was being retried for token errors keeps the token budget.
+
+        Args:
+            job: Job dict (its attempts and error_class)
+
+        Returns:
+            Dict with retry, delay (0: the message reappears by itself),
+            error_class and counts_attempt
+        """
+        error_class = job.get("error_class") or "other"
+        rule = self.rules.get(error_class, self.rules["other"])
+        return {"retry": job.get("attempts", 0) + 1 < rule["max_attempts"], "delay": 0,
+                "error_class": error_class, "counts_attempt": True}
+
+
+class CircuitBreaker:
+    """
+    Fleet-wide switch that pauses YouTube downloads while tokens are rejected
+
+    State lives in one S3 object updated with If-Match writes, so every
+    worker sees the same circuit:
+
+    - closed: downloads run. Token errors are recorded; threshold errors
+      within the window open the circuit.
+    - open: nobody downloads until open_until.
+    - half_open: one worker (the probe) downloads. Its success closes the
+      circuit; its failure opens it again for twice as long, up to
+      max_cooldown.
+
+    Workers read the state at most every refresh seconds and write only
+    on token errors and transitions, so a healthy fleet adds one GET per
+    worker per refresh interval.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, s3_client, s3_bucket, key=CIRCUIT_KEY, threshold=DEFAULT_CIRCUIT_THRESHOLD,
+                 window=DEFAULT_CIRCUIT_WINDOW, cooldown=DEFAULT_CIRCUIT_COOLDOWN,
+                 max_cooldown=DEFAULT_CIRCUIT_MAX_COOLDOWN, refresh=DEFAULT_CIRCUIT_REFRESH):
+        """
+        Initialize the breaker
+
+        Args:
+            s3_client: S3 client
+            s3_bucket: Bucket holding the state
+            key: Key of the state object
+            threshold: Token errors within window that open the circuit
+            window: Seconds a token error counts
+            cooldown: Seconds the circuit first stays open
+            max_cooldown: Longest the circuit stays open after failed probes
+            refresh: Seconds a read of the state is reused
+        """
+        self.s3 = s3_client
+        self.s3_bucket = s3_bucket
+        self.key = key
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.refresh = refresh
+        self.owner = f"breaker-{uuid.uuid4()}"
+        self._state = None
+        self._read_at = 0
+
+    def _closed_state(self):
+        return {"state": self.CLOSED, "failures": [], "cooldown": self.cooldown}
+
+    def _load(self):
+        """
+        Read the state
+
+        Returns:
+            State dict, or a closed state if it does not exist or cannot be read
+        """
+        try:
+            return get_json(self.s3, self.s3_bucket, self.key)
+        except self.s3.exceptions.NoSuchKey:
+            return self._closed_state()
+        except Exception as e:
+            logger.error(f"Error reading circuit breaker state: {str(e)}")
+            return self._closed_state()
+
+    def state(self, refresh=False):
+        """Current state dict, re-read from S3 when the cached copy is stale"""
+        if refresh or self._state is None or time.time() - self._read_at >= self.refresh:
+            self._state = self._load()
+            self._read_at = time.time()
+        return self._state
+
+    def _update(self, change):
+        """
+        Apply change(state) -> new state (or None for no change) with conditional writes
+
+        Returns:
+            The state after the update (the last state read if it could not be written)
+        """
+        try:
+            state = update_object(self.s3, self.s3_bucket, self.key,
+                                  lambda state: change(state or self._closed_state()),
+                                  max_retries=CIRCUIT_MAX_RETRIES) or self._closed_state()
+        except Exception as e:
+            logger.error(f"Error updating circuit breaker state: {str(e)}")
+            state = self._load()
+
+        self._state = state
+        self._read_at = time.time()
+        return state
+
+    def closed(self):
+        """True while downloads run normally (no probing: use allow() before a download)"""
+        return self.state()["state"] == self.CLOSED
+
+    def allow(self):
+        """
+        True if this worker may download now
+
+        An open circuit whose cooldown has passed lets exactly one worker
+        through as the probe.
+        """
+        state = self.state()
+        if state["state"] == self.CLOSED:
+            return True
+        if state.get("probe_owner") == self.owner:
+            return True
+        if time.time() < state.get("open_until", 0):
+            return False
+
+        def take_probe(state):
+            if state["state"] == self.CLOSED or time.time() < state.get("open_until", 0):
+                return None
+            # A probe that never reports back is replaced after another cooldown
+            return dict(state, state=self.HALF_OPEN, probe_owner=self.owner,
+                        open_until=time.time() + state.get("cooldown", self.cooldown))
+
+        state = self._update(take_probe)
+        if state.get("probe_owner") == self.owner and state["state"] == self.HALF_OPEN:
+            logger.info("Circuit breaker half open: this worker probes YouTube")
+            return True
+        return state["state"] == self.CLOSED
+
+    def retry_after(self):
+        """Seconds until the circuit may let a download through"""
+        return max(self.state().get("open_until", 0) - time.time(), 0)
+
+    def check(self):
+        """
+        Raise unless this worker may download now
+
+        Raises:
+            CircuitOpenError: While the circuit is open
+        """
+        if not self.allow():
+            retry_after = self.retry_after() or self.refresh
+            raise CircuitOpenError(f"YouTube downloads paused by the circuit breaker for {retry_after:.0f}s",
+                                   retry_after)
+
+    def record_failure(self):
+        """Record a token error, opening the circuit at the threshold or when the probe fails"""
+        def add_failure(state):
+            now = time.time()
+            if state["state"] == self.HALF_OPEN:
+                if state.get("probe_owner") != self.owner:
+                    return None
+                cooldown = min(state.get("cooldown", self.cooldown) * 2, self.max_cooldown)
+                logger.warning(f"Circuit breaker probe failed, reopening for {cooldown}s")
+                return {"state": self.OPEN, "failures": [], "cooldown": cooldown,
+                        "opened_at": now, "open_until": now + cooldown}
+            if state["state"] == self.OPEN:
+                return None
+
+            failures = [t for t in state.get("failures", []) if now - t < self.window] + [now]
+            if len(failures) >= self.threshold:
+                logger.warning(f"Circuit breaker opened after {len(failures)} token errors "
+                               f"in {self.window}s, pausing downloads for {self.cooldown}s")
+                return {"state": self.OPEN, "failures": [], "cooldown": self.cooldown,
+                        "opened_at": now, "open_until": now + self.cooldown}
+            return dict(state, failures=failures)
+
+        return self._update(add_failure)
+
+    def record_success(self):
+        """Record a successful download; the probe's success closes the circuit"""
+        state = self.state()
+        if state["state"] != self.HALF_OPEN or state.get("probe_owner") != self.owner:
+            return state
+
+        def close(state):
+            if state["state"] != self.HALF_OPEN or state.get("probe_owner") != self.owner:
+                return None
+            return self._closed_state()
+
+        state = self._update(close)
+        if state["state"] == self.CLOSED:
+            logger.info("Circuit breaker closed, downloads resume")
+        return state
+
+
+# Example usage
+if __name__ == "__main__":
+    # Trip and recover a breaker against the local S3 stand-in
+    import tempfile
+    from local_s3 import LocalS3Client
+
+    logging.basicConfig(level=logging.INFO)
+
+    policy = RetryPolicy()
+    for error in (TokenError("HTTP Error 403: Forbidden"), UnavailableError("Private video"),
+                  TranscriptionError("CUDA out of memory")):
+        print(type(error).__name__, [round(policy.decide(error, attempts)["delay"]) for attempts in range(3)],
+              policy.decide(error, 0)["retry"])
+
+    with tempfile.TemporaryDirectory() as root:
+        s3 = LocalS3Client(root)
+        workers = [CircuitBreaker(s3, "bucket", threshold=3, cooldown=1, refresh=0) for _ in range(3)]
+        for breaker in workers:
+            breaker.record_failure()
+        print("After 3 token errors:", [breaker.allow() for breaker in workers])
+
+        time.sleep(1.1)
+        print("After the cooldown:", [breaker.allow() for breaker in workers])
+        for breaker in workers:
+            breaker.record_success()
+        print("After the probe succeeded:", [breaker.allow() for breaker in workers])
@@ -4,23 +4,64 @@ import re
 import logging
 from typing import List, Dict, Any
 import json
+import time
+from bisect import bisect_right
 from datetime import datetime
 
+from phrase_index import TranscriptIndex, FuzzyPhraseMatcher
+
 logger = logging.getLogger(__name__)
 
+# Phrase spec suffix for fuzzy matching, e.g. "hustle~2" or "hustle~1p"
+PHRASE_SPEC_PATTERN = re.compile(r"^(.*?)~(\d*)(p?)$")
+
+# Minimum seconds between partial result publishes that carry no new hits
+DEFAULT_PUBLISH_INTERVAL = 10
+
 class PhraseScanner:
     """Scans transcripts for phrases and analyzes results"""
     
-    def __init__(self, phrase, case_sensitive=False):
+    def __init__(self, phrase, case_sensitive=False, max_edits=0, phonetic=False):
         """
         Initialize the phrase scanner
         
         Args:
             phrase: The phrase to search for
             case_sensitive: Whether to perform case-sensitive matching
+            max_edits: Maximum edit distance per word for fuzzy matching (0 for exact)
+            phonetic: Also match words that sound like the phrase words
         """
         self.phrase = phrase
         self.case_sensitive = case_sensitive
+        self.max_edits = max_edits
+        self.phonetic = phonetic
+        self.fuzzy = max_edits > 0 or phonetic
+        self.matcher = FuzzyPhraseMatcher(phrase, max_edits, phonetic, case_sensitive) if self.fuzzy else None
+    
+    @classmethod
+    def from_spec(cls, spec, case_sensitive=False):
+        """
+        Create a scanner from a phrase spec
+        
+        A plain phrase matches exactly. A "~N" suffix allows N edits per word
+        and a trailing "p" adds phonetic matching ("hustle~2", "hustle~p").
+        """
+        match = PHRASE_SPEC_PATTERN.match(spec)
+        if not match:
+            return cls(spec, case_sensitive)
+        
+        phrase, edits, phonetic = match.groups()
+        max_edits = int(edits) if edits else (0 if phonetic else 1)
+        return cls(phrase.strip(), case_sensitive, max_edits=max_edits, phonetic=bool(phonetic))
+    
+    def count_occurrences(self, content):
+        """Count occurrences of the phrase in a block of text"""
+        if self.fuzzy:
+            return len(self.matcher.find(TranscriptIndex([content], self.case_sensitive)))
+        
+        pattern = re.escape(self.phrase)
+        flags = 0 if self.case_sensitive else re.IGNORECASE
+        return len(re.findall(pattern, content, flags))
     
     def scan_file(self, transcript_file):
         """
@@ -40,13 +81,8 @@ class PhraseScanner:
             with open(transcript_file, "r", encoding="utf-8") as f:
                 content = f.read()
                 
-            # Compile the pattern for the search
-            pattern = re.escape(self.phrase)
-            flags = 0 if self.case_sensitive else re.IGNORECASE
-            
             # Find all occurrences
-            occurrences = re.findall(pattern, content, flags)
-            count = len(occurrences)
+            count = self.count_occurrences(content)
             
             # Calculate some basic stats
             words = content.split()
@@ -126,6 +162,8 @@ class PhraseScanner:
         return {
             "phrase": self.phrase,
             "case_sensitive": self.case_sensitive,
+            "max_edits": self.max_edits,
+            "phonetic": self.phonetic,
             "video_duration_sec": video_duration_sec,
             "video_duration_min": video_duration_sec / 60,
             "total_occurrences": total_occurrences,
@@ -135,7 +173,7 @@ class PhraseScanner:
             "segments_with_phrase": segments_with_phrase,
             "scanned_at": datetime.now().isoformat()
         }
-    
+
     def scan_transcripts(self, transcript_files):
         """
         Scan a list of transcript files
@@ -205,6 +243,8 @@ class PhraseScanner:
                     "directory": dir_path,
                     "phrase": self.phrase,
                     "case_sensitive": self.case_sensitive,
+                    "max_edits": self.max_edits,
+                    "phonetic": self.phonetic,
                     "video_duration_sec": video_duration_sec,
                     "video_duration_min": video_duration_sec / 60,
                     "total_occurrences": total_occurrences,
@@ -222,7 +262,61 @@ class PhraseScanner:
             return all_results[0]
         else:
             return {"directories": all_results}
-    
+
+    def scan_segments(self, segments):
+        """
+        Scan transcript segments already held in memory
+
+        Produces the same result layout as scan_transcripts, so results from
+        a re-scan are interchangeable with results written by the worker.
+
+        Args:
+            segments: List of segment dicts from full_transcript.json
+
+        Returns:
+            Dict with aggregated scan results
+        """
+        if not segments:
+            logger.warning("No transcript segments provided")
+            return {"total_occurrences": 0, "segments": [], "error": "No transcript segments provided"}
+
+        stream = StreamingScanner(self)
+        stream.add_chunk(0, segments)
+        return stream.results()
+
+    def count_by_end(self, texts):
+        """
+        Count occurrences across consecutive texts, attributing each match to
+        the text it ends in
+
+        The texts are matched as one stream so phrases that straddle text
+        boundaries are found. texts[0] is context only: matches ending inside
+        it are not counted.
+
+        Returns:
+            List of counts, one per text
+        """
+        counts = [0] * len(texts)
+
+        if self.fuzzy:
+            index = TranscriptIndex(texts, self.case_sensitive)
+            for _, end in self.matcher.find(index):
+                counts[index.tokens[end][1]] += 1
+        else:
+            offsets = []
+            position = 0
+            for text in texts:
+                offsets.append(position)
+                position += len(text) + 1
+
+            pattern = re.escape(self.phrase)
+            flags = 0 if self.case_sensitive else re.IGNORECASE
+            for match in re.finditer(pattern, " ".join(texts), flags):
+                counts[bisect_right(offsets, match.end() - 1) - 1] += 1
+
+        counts[0] = 0
+        return counts
+
     def to_json(self, scan_results, indent=2):
         """Convert scan results to JSON string"""
         return json.dumps(scan_results, indent=indent)
@@ -241,6 +335,181 @@ class PhraseScanner:
             return False
 
 
+
+class StreamingScanner:
+    """Scans transcript chunks incrementally as they finish transcribing"""
+    
+    def __init__(self, scanner, publisher=None, context=None, publish_interval=DEFAULT_PUBLISH_INTERVAL):
+        """
+        Initialize the streaming scanner
+        
+        Args:
+            scanner: PhraseScanner that defines the phrase and matching mode
+            publisher: Optional object with a publish(payload) method for partial results
+            context: Extra fields (e.g. video_id, job_id) added to published payloads
+            publish_interval: Minimum seconds between publishes without new hits
+        """
+        self.scanner = scanner
+        self.publisher = publisher
+        self.context = context or {}
+        self.publish_interval = publish_interval
+        
+        # Trailing words of the stream so far, kept to catch phrases that straddle chunks
+        self.tail_words = max(len(scanner.phrase.split()), 1)
+        self._tail = ""
+        
+        self.segment_results = []
+        self.segments_with_phrase = []
+        self.total_occurrences = 0
+        self.total_words = 0
+        self.total_chars = 0
+        self.last_end = None
+        self.chunks_scanned = 0
+        self.total_chunks = None
+        self.first_hit = None
+        self.started_at = time.time()
+        self._last_publish = 0
+    
+    def add_chunk(self, chunk_index, segments, total_chunks=None):
+        """
+        Scan the segments of one chunk, in chunk order
+        
+        Args:
+            chunk_index: Index of the chunk within the audio
+            segments: Aligned segment dicts for the chunk
+            total_chunks: Total number of chunks, if known
+        """
+        if total_chunks is not None:
+            self.total_chunks = total_chunks
+        
+        texts = [segment.get("text", "") for segment in segments]
+        counts = self.scanner.count_by_end([self._tail] + texts)[1:]
+        new_hits = 0
+        
+        for segment, content, count in zip(segments, texts, counts):
+            i = len(self.segment_results)
+            segment_result = {
+                "filename": f"segment_{i:03d}.txt",
+                "minute": i + 1,
+                "start": segment.get("start"),
+                "end": segment.get("end"),
+                "occurrences": count,
+                "word_count": len(content.split()),
+                "char_count": len(content),
+                "has_phrase": count > 0
+            }
+            
+            self.total_occurrences += count
+            self.total_words += segment_result["word_count"]
+            self.total_chars += segment_result["char_count"]
+            self.last_end = segment.get("end", self.last_end)
+            
+            if count > 0:
+                new_hits += count
+                self.segments_with_phrase.append(segment_result)
+                if self.first_hit is None:
+                    self.first_hit = {
+                        "chunk": chunk_index,
+                        "start": segment.get("start"),
+                        "seconds_after_start": round(time.time() - self.started_at, 3)
+                    }
+            
+            self.segment_results.append(segment_result)
+        
+        words = " ".join([self._tail] + texts).split()
+        self._tail = " ".join(words[-self.tail_words:])
+        self.chunks_scanned += 1
+        
+        self._publish("partial", force=new_hits > 0)
+    
+    def results(self):
+        """Aggregated results so far, in the same layout as PhraseScanner.scan_segments"""
+        # Use real timestamps for the duration when they are available
+        video_duration_sec = self.last_end or len(self.segment_results) * 60
+        
+        return {
+            "phrase": self.scanner.phrase,
+            "case_sensitive": self.scanner.case_sensitive,
+            "max_edits": self.scanner.max_edits,
+            "phonetic": self.scanner.phonetic,
+            "video_duration_sec": video_duration_sec,
+            "video_duration_min": video_duration_sec / 60,
+            "total_occurrences": self.total_occurrences,
+            "total_words": self.total_words,
+            "total_chars": self.total_chars,
+            "segments": self.segment_results,
+            "segments_with_phrase": self.segments_with_phrase,
+            "scanned_at": datetime.now().isoformat()
+        }
+    
+    def finish(self):
+        """Publish the final state and return the complete results"""
+        self._publish("final", force=True)
+        return self.results()
+    
+    def progress(self, status):
+        """Compact progress payload with hits so far (without per-segment detail)"""
+        payload = dict(self.context)
+        payload.update({
+            "status": status,
+            "phrase": self.scanner.phrase,
+            "chunks_scanned": self.chunks_scanned,
+            "total_chunks": self.total_chunks,
+            "total_occurrences": self.total_occurrences,
+            "segments_with_phrase": self.segments_with_phrase,
+            "first_hit": self.first_hit,
+            "updated_at": datetime.now().isoformat()
+        })
+        return payload
+    
+    def _publish(self, status, force=False):
+        """Publish progress if there is a publisher and it is due"""
+        if not self.publisher:
+            return
+        if not force and time.time() - self._last_publish < self.publish_interval:
+            return
+        
+        try:
+            self.publisher.publish(self.progress(status))
+            self._last_publish = time.time()
+        except Exception as e:
+            # Partial results are best effort; never fail the scan over them
+            logger.warning(f"Error publishing partial results: {str(e)}")
+
+
+class S3PartialResultPublisher:
+    """Publishes streaming scan progress to partial_results/{video_id}/{job_id}.json"""
+    
+    def __init__(self, s3, s3_bucket, video_id, job_id):
+        """Initialize with an existing S3 client"""
+        self.s3 = s3
+        self.s3_bucket = s3_bucket
+        self.key = f"partial_results/{video_id}/{job_id}.json"
+    
+    def publish(self, payload):
+        """Overwrite the partial results object with the latest progress"""
+        self.s3.put_object(
+            Body=json.dumps(payload),
+            Bucket=self.s3_bucket,
+            Key=self.key,
+            ContentType="application/json"
+        )
+
+
+class EventLogPublisher:
+    """Appends streaming scan progress to a local JSON-lines event log"""
+    
+    def __init__(self, log_file):
+        """Initialize with the path of the event log"""
+        self.log_file = log_file
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+    
+    def publish(self, payload):
+        """Append one progress event"""
+        with open(self.log_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload) + "\n")
+
+
 # Example usage
 if __name__ == "__main__":
     # Simple test code
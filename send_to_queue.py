@@ -4,8 +4,20 @@
 import argparse
 import boto3
 import json
+import os
 import sys
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from downloader import YouTubeDownloader, DownloadError
+from video_index import VideoIndex, DEFAULT_MODEL, DEFAULT_PHRASE
+
+SQS_MAX_BATCH = 10          # messages per send_message_batch call, the SQS limit
+DEFAULT_SEND_THREADS = 8    # concurrent send_message_batch calls
+PROGRESS_SECONDS = 1        # seconds between enqueue progress lines
+VIDEO_URL = "https://www.youtube.com/watch?v={video_id}"
+COLLECTION_PATTERN = r'^(https?://)?(www\.|m\.)?youtube\.com/(playlist\?list=|@|channel/|c/|user/)'
 
 def parse_arguments():
     """Parse command line arguments"""
@@ -15,8 +27,41 @@ def parse_arguments():
     parser.add_argument(
         "--youtube_url", "-y",
         type=str,
-        required=True,
-        help="YouTube URL to process (e.g., https://www.youtube.com/watch?v=a1Ih5GGtR8Q)"
+        nargs="+",
+        help="YouTube video, playlist or channel URLs to process (e.g., https://www.youtube.com/watch?v=a1Ih5GGtR8Q, https://www.youtube.com/@channel)"
+    )
+    parser.add_argument(
+        "--urls_file", "-f",
+        type=str,
+        help="File with one video, playlist or channel URL per line ('-' for stdin; blank lines and # comments are skipped)"
+    )
+    parser.add_argument(
+        "--threads", "-t",
+        type=int,
+        default=DEFAULT_SEND_THREADS,
+        help=f"Concurrent batch sends of up to {SQS_MAX_BATCH} messages each. (Default: {DEFAULT_SEND_THREADS})"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Queue videos even if the video index lists them as processed, and make workers reprocess them"
+    )
+    parser.add_argument(
+        "--s3_bucket", "-b",
+        type=str,
+        default="youtube-transcripts",
+        help="S3 bucket holding the video index (Default: 'youtube-transcripts')"
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        default=DEFAULT_MODEL,
+        help=f"WhisperX model the workers run, which the video index is keyed by (Default: '{DEFAULT_MODEL}')"
+    )
+    parser.add_argument(
+        "--dry_run",
+        action="store_true",
+        help="List the videos that would be queued without sending anything"
     )
     parser.add_argument(
         "--queue_url", "-q",
@@ -35,36 +80,234 @@ def parse_arguments():
         type=str,
         help="Optional custom phrase to search for in the video"
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--rescan",
+        action="store_true",
+        help="Re-scan existing transcripts for --phrases instead of processing a new video"
+    )
+    parser.add_argument(
+        "--phrases",
+        type=str,
+        nargs="+",
+        help="Phrases to apply in a re-scan"
+    )
+    parser.add_argument(
+        "--video_ids",
+        type=str,
+        nargs="*",
+        help="Video IDs to re-scan (Default: every transcribed video)"
+    )
+    parser.add_argument(
+        "--local_root",
+        type=str,
+        help="Send to a filesystem queue under this directory (see local_sqs.py) instead of SQS"
+    )
+    args = parser.parse_args()
+    
+    if args.rescan:
+        if not args.phrases and not args.phrase:
+            parser.error("--rescan requires --phrases or --phrase")
+    elif not args.youtube_url and not args.urls_file:
+        parser.error("--youtube_url or --urls_file is required unless --rescan is given")
+    
+    return args
 
-def validate_youtube_url(url):
-    """Validate that the URL is a valid YouTube URL"""
+def build_rescan_message(args):
+    """Build a re-scan message that only touches existing transcripts"""
+    message = {
+        'type': 'rescan',
+        'phrases': args.phrases or [args.phrase]
+    }
+    if args.video_ids:
+        message['video_ids'] = args.video_ids
+    return message
+
+def video_id_from_url(url):
+    """Video ID of a YouTube video URL, or None if it is not one"""
     youtube_pattern = r'^(https?://)?(www\.)?(youtube\.com/watch\?v=|youtu\.be/)([a-zA-Z0-9_-]{11}).*$'
     match = re.match(youtube_pattern, url)
-    if not match:
-        return False
-    return True
+    return match.group(4) if match else None
+
+def validate_youtube_url(url):
+    """Validate that the URL is a valid YouTube URL"""
+    return video_id_from_url(url) is not None
+
+def is_collection_url(url):
+    """True for playlist and channel URLs"""
+    return re.match(COLLECTION_PATTERN, url) is not None
+
+def read_urls_file(path):
+    """URLs listed in a file (or stdin for '-'), skipping blank lines and comments"""
+    lines = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        return [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+def collect_video_ids(urls, downloader):
+    """
+    Expand playlists and channels and deduplicate videos
+    
+    Args:
+        urls: Video, playlist and channel URLs
+        downloader: YouTubeDownloader used for flat playlist extraction
+        
+    Returns:
+        Tuple of (video IDs in first-seen order, list of (url, reason) that were skipped)
+    """
+    video_ids = {}
+    skipped = []
+    for url in urls:
+        video_id = video_id_from_url(url)
+        if video_id:
+            video_ids.setdefault(video_id, None)
+        elif is_collection_url(url):
+            try:
+                found = downloader.list_videos(url)
+            except DownloadError as e:
+                skipped.append((url, str(e)))
+                continue
+            print(f"{url}: {len(found)} videos")
+            for video_id in found:
+                video_ids.setdefault(video_id, None)
+        else:
+            skipped.append((url, "not a YouTube video, playlist or channel URL"))
+    return list(video_ids), skipped
+
+def send_batches(sqs, queue_url, bodies, threads=DEFAULT_SEND_THREADS):
+    """
+    Send message bodies with send_message_batch, 10 per call, over a thread pool
+    
+    Entries that SQS rejects are retried once in a new batch. Progress and
+    throughput are printed about once per second.
+    
+    Returns:
+        Tuple of (messages sent, list of failure messages)
+    """
+    batches = [bodies[start:start + SQS_MAX_BATCH] for start in range(0, len(bodies), SQS_MAX_BATCH)]
+    sent = 0
+    failures = []
+    started = time.time()
+    last_report = started
+    
+    def send(batch, retry=True):
+        entries = [{"Id": str(i), "MessageBody": body} for i, body in enumerate(batch)]
+        try:
+            response = sqs.send_message_batch(QueueUrl=queue_url, Entries=entries)
+        except Exception as e:
+            return 0, [str(e)] * len(batch)
+        failed = response.get("Failed", [])
+        if failed and retry:
+            retried, errors = send([batch[int(entry["Id"])] for entry in failed], retry=False)
+            return len(response.get("Successful", [])) + retried, errors
+        return len(response.get("Successful", [])), [entry.get("Message", entry.get("Code")) for entry in failed]
+    
+    with ThreadPoolExecutor(max_workers=max(threads, 1)) as executor:
+        futures = [executor.submit(send, batch) for batch in batches]
+        for future in as_completed(futures):
+            batch_sent, batch_failures = future.result()
+            sent += batch_sent
+            failures.extend(batch_failures)
+            now = time.time()
+            if now - last_report >= PROGRESS_SECONDS:
+                print(f"Queued {sent}/{len(bodies)} ({sent / (now - started):.0f} messages/s)")
+                last_report = now
+    
+    elapsed = time.time() - started
+    print(f"Queued {sent} messages in {elapsed:.1f}s ({sent / max(elapsed, 1e-9):.0f} messages/s)")
+    return sent, failures
+
+def open_video_index(args):
+    """Video index for the message phrase (workers' default when none is given), or None with --force"""
+    if args.force:
+        return None
+    if args.local_root:
+        from local_s3 import LocalS3Client
+        s3 = LocalS3Client(os.path.join(args.local_root, "s3"))
+    else:
+        s3 = boto3.client('s3', region_name=args.region)
+    return VideoIndex(s3, args.s3_bucket, args.model, args.phrase or DEFAULT_PHRASE)
+
+def build_video_message(youtube_url, args):
+    """Build a message for one video"""
+    message = {'youtube_url': youtube_url}
+    
+    # Add custom phrase if provided
+    if args.phrase:
+        message['phrase'] = args.phrase
+    # Workers skip indexed videos unless told otherwise
+    if args.force:
+        message['force'] = True
+    return message
+
+def send_many(sqs, args):
+    """Expand, deduplicate and batch-send every URL given on the command line or in --urls_file"""
+    urls = list(args.youtube_url or [])
+    if args.urls_file:
+        urls.extend(read_urls_file(args.urls_file))
+    
+    video_ids, skipped = collect_video_ids(urls, YouTubeDownloader())
+    for url, reason in skipped:
+        print(f"Skipped {url}: {reason}")
+    print(f"{len(video_ids)} unique videos from {len(urls)} URLs")
+    
+    # Videos already processed for this phrase cost nothing to skip here
+    video_index = open_video_index(args)
+    if video_index and video_ids:
+        video_ids, processed = video_index.filter_new(video_ids)
+        if processed:
+            print(f"Skipped {len(processed)} videos already processed for this phrase (use --force to requeue)")
+    
+    if args.dry_run:
+        for video_id in video_ids:
+            print(VIDEO_URL.format(video_id=video_id))
+        return
+    
+    bodies = [json.dumps(build_video_message(VIDEO_URL.format(video_id=video_id), args)) for video_id in video_ids]
+    
+    sent, failures = send_batches(sqs, args.queue_url, bodies, args.threads)
+    if args.phrase:
+        print(f"Custom phrase: {args.phrase}")
+    print(f"Queue URL: {args.queue_url}")
+    if failures:
+        print(f"Failed to queue {len(failures)} messages, e.g.: {failures[0]}")
+        sys.exit(1)
 
 def main():
     """Main entry point"""
     args = parse_arguments()
     
     # Validate YouTube URL
-    if not validate_youtube_url(args.youtube_url):
-        print(f"Error: '{args.youtube_url}' is not a valid YouTube URL")
+    if (not args.rescan and not args.urls_file and len(args.youtube_url) == 1
+            and not validate_youtube_url(args.youtube_url[0]) and not is_collection_url(args.youtube_url[0])):
+        print(f"Error: '{args.youtube_url[0]}' is not a valid YouTube URL")
         sys.exit(1)
     
     try:
-        # Initialize SQS client
-        sqs = boto3.client('sqs', region_name=args.region)
+        # Initialize SQS client (or the local stand-in workers with --local_root read)
+        if args.local_root:
+            from local_sqs import LocalSQSClient
+            sqs = LocalSQSClient(os.path.join(args.local_root, "sqs"))
+        else:
+            sqs = boto3.client('sqs', region_name=args.region)
+        
+        # Several videos, playlists or channels go out in batches
+        if not args.rescan and (args.urls_file or args.dry_run or len(args.youtube_url or []) > 1
+                                or is_collection_url(args.youtube_url[0])):
+            send_many(sqs, args)
+            return
         
         # Create message body
-        message = {'youtube_url': args.youtube_url}
+        if args.rescan:
+            message = build_rescan_message(args)
+        else:
+            video_index = open_video_index(args)
+            if video_index and video_index.contains(video_id_from_url(args.youtube_url[0])):
+                print(f"Video {args.youtube_url[0]} was already processed for this phrase (use --force to requeue)")
+                return
+            message = build_video_message(args.youtube_url[0], args)
         
-        # Add custom phrase if provided
-        if args.phrase:
-            message['phrase'] = args.phrase
-            
         message_body = json.dumps(message)
         
         # Send message to SQS queue
@@ -74,9 +317,13 @@ def main():
         )
         
         print(f"Message sent successfully!")
-        print(f"YouTube URL: {args.youtube_url}")
-        if args.phrase:
-            print(f"Custom phrase: {args.phrase}")
+        if args.rescan:
+            print(f"Re-scan phrases: {', '.join(message['phrases'])}")
+            print(f"Videos: {', '.join(args.video_ids) if args.video_ids else 'all transcribed videos'}")
+        else:
+            print(f"YouTube URL: {args.youtube_url[0]}")
+            if args.phrase:
+                print(f"Custom phrase: {args.phrase}")
         print(f"Message ID: {response['MessageId']}")
         print(f"Queue URL: {args.queue_url}")
         
@@ -0,0 +1,445 @@
+#!/usr/bin/python3
+# sqlite_job_tracker.py - SQLite-based Job Tracking for single-host deployments
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from job_tracker import JobState, LOCK_MINUTES, retry_abandoned
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_DB = "jobs.db"
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    worker_id TEXT,
+    lock_until REAL,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, lock_until);
+"""
+
+class SQLiteJobTracker:
+    """
+    Job tracker backed by a local SQLite database in WAL mode
+
+    Provides the same methods as the S3 JobTracker. Claims, lease renewals
+    and recovery are single transactions, and status listing and lease
+    expiry queries use an index on (status, lock_until). Several worker
+    processes on one host can share the database file.
+    """
+
+    def __init__(self, db_path=DEFAULT_JOB_DB, **kwargs):
+        """
+        Initialize the tracker and create the schema if needed
+
+        Args:
+            db_path: Path of the SQLite database file
+            kwargs: S3 tracker options (progress_interval, ...), accepted and ignored
+        """
+        self.db_path = db_path
+        self.worker_id = f"worker-{uuid.uuid4()}"
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._owned = {}
+        self._lost_jobs = set()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    def _connection(self):
+        """One connection per thread (sqlite3 connections are not shared across threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _transaction(self):
+        """Start a write transaction that takes the database lock up front"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    @staticmethod
+    def _write(conn, job):
+        """Insert or replace a job row from its dict"""
+        lock_until = job.get("lock_until")
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, worker_id, lock_until, updated_at, data) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job["job_id"], job["status"], job.get("worker_id"),
+             datetime.fromisoformat(lock_until).timestamp() if lock_until else None,
+             job.get("updated_at"), json.dumps(job))
+        )
+
+    @staticmethod
+    def _read(conn, job_id):
+        """Job dict for a row, or None"""
+        row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def create_job(self, job_id, video_id, youtube_url, phrase):
+        """
+        Create a new job in the queued state
+
+        An existing job keeps its attempts and recorded stages; a job being
+        processed is left alone.
+        """
+        job = {
+            "job_id": job_id,
+            "video_id": video_id,
+            "youtube_url": youtube_url,
+            "phrase": phrase,
+            "status": JobState.QUEUED,
+            "created_at": datetime.now().isoformat(),
+            "updated_at": datetime.now().isoformat(),
+            "attempts": 0,
+            "error": None
+        }
+
+        conn = self._transaction()
+        try:
+            current = self._read(conn, job_id)
+            if current and current.get("status") == JobState.PROCESSING:
+                conn.execute("COMMIT")
+                return current
+            if current:
+                for field in ("created_at", "attempts", "stages", "error"):
+                    if field in current:
+                        job[field] = current[field]
+            self._write(conn, job)
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.error(f"Error saving job {job_id}: {str(e)}")
+        return job
+
+    def start_processing(self, job_id, worker_id=None):
+        """
+        Claim a job for this worker in one transaction
+
+        Returns:
+            Job dict, or None if the job does not exist or another worker holds it
+        """
+        worker_id = worker_id or self.worker_id
+        conn = self._transaction()
+        try:
+            job = self._read(conn, job_id)
+            if not job:
+                conn.execute("COMMIT")
+                return None
+
+            if (job.get("status") == JobState.PROCESSING and job.get("worker_id") != worker_id
+                    and not self._lease_expired(job)):
+                conn.execute("COMMIT")
+                logger.info(f"Job {job_id} is already being processed by {job.get('worker_id')}")
+                return None
+
+            job["status"] = JobState.PROCESSING
+            job["worker_id"] = worker_id
+            job["updated_at"] = datetime.now().isoformat()
+            job["lock_until"] = (datetime.now() + timedelta(minutes=LOCK_MINUTES)).isoformat()
+            self._write(conn, job)
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.error(f"Error claiming job {job_id}: {str(e)}")
+            return None
+
+        with self._lock:
+            self._owned[job_id] = worker_id
+            self._lost_jobs.discard(job_id)
+        return job
+
+    def _owned_update(self, job_id, changes):
+        """
+        Apply changes to a processing job this tracker owns, renewing its lock
+
+        Returns:
+            True if the job was still held by this tracker
+        """
+        with self._lock:
+            worker_id = self._owned.get(job_id)
+        if worker_id is None:
+            return False
+
+        conn = self._transaction()
+        try:
+            job = self._read(conn, job_id)
+            if not job or job.get("status") != JobState.PROCESSING or job.get("worker_id") != worker_id:
+                conn.execute("COMMIT")
+                logger.warning(f"Lost the lease on job {job_id} to another worker")
+                with self._lock:
+                    self._owned.pop(job_id, None)
+                    self._lost_jobs.add(job_id)
+                return False
+
+            # Stages are merged into the recorded ones rather than replacing them
+            changes = dict(changes)
+            stages = changes.pop("stages", None)
+            job.update(changes)
+            if stages:
+                job.setdefault("stages", {}).update(stages)
+            job["updated_at"] = datetime.now().isoformat()
+            job["lock_until"] = (datetime.now() + timedelta(minutes=LOCK_MINUTES)).isoformat()
+            self._write(conn, job)
+            conn.execute("COMMIT")
+            return True
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.error(f"Error updating job {job_id}: {str(e)}")
+            return False
+
+    def renew_lease(self, job_id):
+        """Extend the lock on an owned job; returns True if it is still held"""
+        return self._owned_update(job_id, {})
+
+    def lease_lost(self, job_id):
+        """True if another worker took over a job this tracker was processing"""
+        with self._lock:
+            return job_id in self._lost_jobs
+
+    def update_progress(self, job_id, total_chunks=None, completed_chunks=None):
+        """Update job progress (written immediately; local writes need no debounce)"""
+        changes = {}
+        if total_chunks is not None:
+            changes["total_chunks"] = total_chunks
+        if completed_chunks is not None:
+            changes["completed_chunks"] = completed_chunks
+        return self._owned_update(job_id, changes)
+
+    def record_stage(self, job_id, stage, artifact=None):
+        """Record a finished stage (see JobStage) of an owned job"""
+        entry = dict(artifact or {})
+        entry["completed_at"] = datetime.now().isoformat()
+        return self._owned_update(job_id, {"stages": {stage: entry}})
+
+    def flush(self, job_id=None, force=False):
+        """Nothing is buffered; kept for interface compatibility"""
+        return 0
+
+    def stop(self):
+        """Close every connection opened by this tracker"""
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+    def _finish(self, job_id, status, changes):
+        """Move a job to a final status if this tracker still holds it (or nobody does)"""
+        with self._lock:
+            worker_id = self._owned.pop(job_id, None)
+            lost = job_id in self._lost_jobs
+        if lost:
+            logger.warning(f"Job {job_id} was taken over by another worker before it finished here")
+            return False
+
+        conn = self._transaction()
+        try:
+            job = self._read(conn, job_id)
+            if not job:
+                conn.execute("COMMIT")
+                return False
+            taken_over = worker_id and job.get("worker_id") != worker_id
+            # A job nobody here holds may still be another worker's live claim
+            claimed = (job.get("status") == JobState.PROCESSING and job.get("worker_id") != worker_id
+                       and not self._lease_expired(job))
+            if taken_over or claimed:
+                conn.execute("COMMIT")
+                logger.warning(f"Job {job_id} was taken over by another worker before it finished here")
+                return False
+
+            job.update(changes)
+            job["status"] = status
+            job["updated_at"] = datetime.now().isoformat()
+            job.pop("lock_until", None)
+            self._write(conn, job)
+            conn.execute("COMMIT")
+            return True
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.error(f"Error updating job {job_id}: {str(e)}")
+            return False
+
+    def complete_job(self, job_id):
+        """Mark job as completed"""
+        return self._finish(job_id, JobState.COMPLETED, {"completed_at": datetime.now().isoformat()})
+
+    def fail_job(self, job_id, error):
+        """Mark job as failed with error info"""
+        job = self.get_job(job_id)
+        if not job:
+            return False
+        return self._finish(job_id, JobState.FAILED, {
+            "error": str(error),
+            "attempts": job.get("attempts", 0) + 1
+        })
+
+    def requeue_job(self, job_id, error=None, error_class=None):
+        """Hand an owned job back to the queued state, keeping its recorded stages (an error counts an attempt)"""
+        with self._lock:
+            if job_id not in self._owned:
+                return False
+        changes = {"worker_id": None}
+        if error is not None:
+            job = self.get_job(job_id) or {}
+            changes.update({"error": str(error), "error_class": error_class, "attempts": job.get("attempts", 0) + 1})
+        return self._finish(job_id, JobState.QUEUED, changes)
+
+    def get_job(self, job_id):
+        """Get a job in any status"""
+        return self._read(self._connection(), job_id)
+
+    def get_job_by_status(self, job_id, status):
+        """Get a job only if it is in the given status"""
+        row = self._connection().execute(
+            "SELECT data FROM jobs WHERE job_id = ? AND status = ?", (job_id, status)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_job_status(self, job_id):
+        """Current status of a job, or None"""
+        row = self._connection().execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_status_summary(self):
+        """Per-status counts plus a summary of every job"""
+        conn = self._connection()
+        counts = {status: 0 for status in (JobState.QUEUED, JobState.PROCESSING,
+                                           JobState.COMPLETED, JobState.FAILED)}
+        for status, count in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = count
+
+        jobs = {}
+        for data in conn.execute("SELECT data FROM jobs"):
+            job = json.loads(data[0])
+            jobs[job["job_id"]] = {
+                "status": job.get("status"),
+                "video_id": job.get("video_id"),
+                "worker_id": job.get("worker_id"),
+                "attempts": job.get("attempts", 0),
+                "updated_at": job.get("updated_at"),
+                "duration": ((job.get("stages") or {}).get("metadata") or {}).get("duration")
+            }
+        return {"updated_at": datetime.now().isoformat(), "counts": counts, "jobs": jobs}
+
+    def list_jobs_by_status(self, status, max_workers=None):
+        """List all jobs with a specific status (uses the status index)"""
+        rows = self._connection().execute("SELECT data FROM jobs WHERE status = ?", (status,))
+        return [json.loads(row[0]) for row in rows]
+
+    def get_jobs(self, job_ids, status, max_workers=None):
+        """Fetch many jobs in one status"""
+        jobs = [self.get_job_by_status(job_id, status) for job_id in job_ids]
+        return [job for job in jobs if job]
+
+    @staticmethod
+    def _lease_expired(job):
+        """True if a processing job's lock has run out (or cannot be read)"""
+        lock_until = job.get("lock_until")
+        if not lock_until:
+            return True
+        try:
+            return datetime.fromisoformat(lock_until) < datetime.now()
+        except ValueError:
+            return True
+
+    def find_abandoned_jobs(self, worker_id=None, live_workers=None):
+        """Find processing jobs with expired locks (an index range query)"""
+        rows = self._connection().execute(
+            "SELECT data FROM jobs WHERE status = ? AND (lock_until IS NULL OR lock_until < ?)",
+            (JobState.PROCESSING, time.time())
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def recover_abandoned_jobs(self, worker_id=None, live_workers=None, retry_policy=None):
+        """
+        Recover abandoned jobs that have attempts left (see job_tracker.retry_abandoned)
+
+        The query and the moves happen in one transaction, so concurrent
+        recoveries cannot requeue the same job twice. Worker partitioning is
+        not needed locally; the arguments are accepted for compatibility.
+        """
+        recovered = 0
+        conn = self._transaction()
+        try:
+            rows = conn.execute(
+                "SELECT data FROM jobs WHERE status = ? AND (lock_until IS NULL OR lock_until < ?)",
+                (JobState.PROCESSING, time.time())
+            ).fetchall()
+
+            for row in rows:
+                job = json.loads(row[0])
+                attempts = job.get("attempts", 0)
+                job["updated_at"] = datetime.now().isoformat()
+                job.pop("lock_until", None)
+                if not retry_abandoned(job, retry_policy):
+                    job["status"] = JobState.FAILED
+                    job["error"] = "Exceeded maximum retry attempts"
+                    logger.info(f"Job {job['job_id']} exceeded max attempts, marked as failed")
+                else:
+                    job["status"] = JobState.QUEUED
+                    job["attempts"] = attempts + 1
+                    logger.info(f"Recovered job {job['job_id']} for retry (attempt {attempts + 1})")
+                    recovered += 1
+                self._write(conn, job)
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.error(f"Error recovering abandoned jobs: {str(e)}")
+            return 0
+        return recovered
+
+    def rebuild_index(self, max_workers=None):
+        """The status index is maintained by SQLite; returns the number of jobs"""
+        return self._connection().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+
+# Example usage
+if __name__ == "__main__":
+    # Time the job lifecycle against a local database
+    import sys
+    import tempfile
+
+    logging.basicConfig(level=logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    with tempfile.TemporaryDirectory() as directory:
+        tracker = SQLiteJobTracker(os.path.join(directory, "jobs.db"))
+
+        started = time.perf_counter()
+        for i in range(count):
+            job_id = f"job-{i}"
+            tracker.create_job(job_id, "abc123", "https://www.youtube.com/watch?v=abc123", "test")
+            tracker.start_processing(job_id)
+            tracker.update_progress(job_id, total_chunks=10, completed_chunks=5)
+            tracker.complete_job(job_id)
+        elapsed = time.perf_counter() - started
+
+        print(f"{count} jobs, 4 operations each: {elapsed * 1e6 / (count * 4):.0f} us per operation")
+        print(json.dumps(tracker.get_status_summary()["counts"]))
+        tracker.stop()
@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+# storage.py - Compressed S3 object storage with transparent decode
+
+import gzip
+import json
+import time
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_TYPES = ("gzip", "zstd", "none")
+DEFAULT_COMPRESSION = "gzip"
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+UPDATE_MAX_RETRIES = 10   # conditional writes before update_object gives up
+
+class UpdateConflictError(Exception):
+    """Raised when update_object keeps losing races to other writers"""
+    pass
+
+def is_condition_failure(error):
+    """True if an S3 error means a conditional write lost a race"""
+    response = getattr(error, 'response', None) or {}
+    code = response.get('Error', {}).get('Code')
+    # If-Match against a deleted key fails with NoSuchKey
+    return code in ("PreconditionFailed", "ConditionalRequestConflict", "NoSuchKey", "412", "409")
+
+def compress(body, compression=DEFAULT_COMPRESSION):
+    """
+    Compress a payload
+
+    Args:
+        body: Bytes to compress
+        compression: 'gzip', 'zstd' or 'none'
+
+    Returns:
+        Tuple of (compressed bytes, Content-Encoding value or None)
+    """
+    if compression == "zstd":
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=6).compress(body), "zstd"
+        logger.warning("zstandard is not installed, falling back to gzip")
+        compression = "gzip"
+
+    if compression == "gzip":
+        return gzip.compress(body, compresslevel=6, mtime=0), "gzip"
+
+    return body, None
+
+def decompress(body, encoding=None):
+    """
+    Decode a payload written by compress()
+
+    The Content-Encoding is used when present; otherwise the payload is
+    sniffed, so objects written before compression was enabled still load.
+    """
+    if encoding == "gzip" or (encoding is None and body[:2] == GZIP_MAGIC):
+        return gzip.decompress(body)
+
+    if encoding == "zstd" or (encoding is None and body[:4] == ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed objects")
+        return zstandard.ZstdDecompressor().decompress(body, max_output_size=1 << 31)
+
+    return body
+
+def put_bytes(s3, bucket, key, body, content_type="application/octet-stream",
+              compression=DEFAULT_COMPRESSION, metadata=None, **kwargs):
+    """
+    Upload a payload, compressed, with Content-Encoding and size metadata set
+
+    metadata adds user metadata entries next to the size. Extra keyword
+    arguments are passed through to put_object.
+    """
+    payload, encoding = compress(body, compression)
+    params = {
+        "Body": payload,
+        "Bucket": bucket,
+        "Key": key,
+        "ContentType": content_type,
+        "Metadata": dict(metadata or {}, **{"uncompressed-size": str(len(body))})
+    }
+    if encoding:
+        params["ContentEncoding"] = encoding
+    params.update(kwargs)
+    return s3.put_object(**params)
+
+def put_json(s3, bucket, key, data, compression=DEFAULT_COMPRESSION, metadata=None, **kwargs):
+    """Upload a JSON document (compact separators, compressed)"""
+    body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    return put_bytes(s3, bucket, key, body, "application/json", compression, metadata, **kwargs)
+
+def get_bytes(s3, bucket, key):
+    """
+    Download and decode an object
+
+    Raises:
+        s3.exceptions.NoSuchKey: If the object does not exist
+    """
+    response = s3.get_object(Bucket=bucket, Key=key)
+    return decompress(response['Body'].read(), response.get('ContentEncoding'))
+
+def get_json(s3, bucket, key):
+    """Download and decode a JSON document"""
+    return json.loads(get_bytes(s3, bucket, key).decode('utf-8'))
+
+def update_object(s3, bucket, key, change, parse=None, write=None, max_retries=UPDATE_MAX_RETRIES):
+    """
+    Read-modify-write an object shared by many writers
+
+    The object is read with its ETag and change(current) is written back
+    with If-Match (If-None-Match when the object did not exist). A write
+    that loses to another writer re-reads and retries after a short
+    jittered backoff, so change may be called several times.
+
+    Args:
+        s3: S3 client
+        bucket: Bucket name
+        key: Object key
+        change: Function(current value, or None if missing) -> new value, or None to leave it as it is
+        parse: Function(decoded bytes) -> value (Default: JSON)
+        write: Function(value, **condition) storing a value (Default: put_json to key)
+        max_retries: Conditional writes before giving up
+
+    Returns:
+        The value written, or the current value if change returned None
+
+    Raises:
+        UpdateConflictError: If every write lost a race
+        Exception: Errors reading or writing the object other than lost races
+    """
+    parse = parse or (lambda body: json.loads(body.decode('utf-8')))
+    write = write or (lambda value, **condition: put_json(s3, bucket, key, value, **condition))
+
+    for attempt in range(max_retries):
+        try:
+            response = s3.get_object(Bucket=bucket, Key=key)
+            current = parse(decompress(response['Body'].read(), response.get('ContentEncoding')))
+            etag = response.get('ETag')
+        except s3.exceptions.NoSuchKey:
+            current, etag = None, None
+
+        value = change(current)
+        if value is None:
+            return current
+        try:
+            write(value, **({"IfMatch": etag} if etag else {"IfNoneMatch": "*"}))
+            return value
+        except Exception as e:
+            if not is_condition_failure(e):
+                raise
+        # Another writer got there first: back off briefly and retry
+        time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+
+    raise UpdateConflictError(f"Gave up updating {key} after {max_retries} attempts")
@@ -0,0 +1,6 @@
+# conftest.py - Puts the repository's top-level modules on the import path
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
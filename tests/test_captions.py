@@ -0,0 +1,96 @@
+# test_captions.py - Caption parsing and the policy deciding when captions replace ASR
+
+import os
+
+import pytest
+
+from captions import CaptionPolicy, parse_captions
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def fixture(name):
+    return os.path.join(FIXTURES, name)
+
+
+def track(name, language="en", automatic=True):
+    return {"path": fixture(name), "language": language, "automatic": automatic,
+            "format": os.path.splitext(name)[1].lstrip(".")}
+
+
+def test_rolling_vtt_cues_are_deduplicated_with_word_times():
+    segments = parse_captions(fixture("auto.en.vtt"))
+
+    # Each rolling cue repeats the line before it; only new lines count
+    assert [segment["text"] for segment in segments] == ["so today we're talking about", "the hustle"]
+    assert segments[0]["words"][:3] == [
+        {"word": "so", "start": 0.16, "end": 0.48},
+        {"word": "today", "start": 0.48, "end": 0.8},
+        {"word": "we're", "start": 0.8, "end": 1.04},
+    ]
+    # The last word ends with its cue; [Music] is dropped
+    assert segments[0]["words"][-1] == {"word": "about", "start": 1.36, "end": 2.27}
+    assert segments[1]["words"] == [
+        {"word": "the", "start": 2.28, "end": 2.56},
+        {"word": "hustle", "start": 2.56, "end": 4.95},
+    ]
+
+
+def test_manual_vtt_is_unescaped_and_untimed():
+    segments = parse_captions(fixture("manual.en.vtt"))
+
+    assert [segment["text"] for segment in segments] == ["Welcome back & thanks for watching.",
+                                                         "Keep the hustle going."]
+    assert (segments[0]["start"], segments[0]["end"]) == (1.0, 3.5)
+    assert all("start" not in word for segment in segments for word in segment["words"])
+
+
+def test_srv3_word_offsets():
+    segments = parse_captions(fixture("auto.en.srv3"))
+
+    assert [segment["text"] for segment in segments] == ["so today we're talking", "the hustle"]
+    # The paragraph spans until the next one begins (2.28s), not its declared 4.95s
+    assert (segments[0]["start"], segments[0]["end"]) == (0.16, 2.28)
+    assert segments[0]["words"][-1] == {"word": "talking", "start": 1.04, "end": 2.28}
+    assert segments[1]["words"] == [
+        {"word": "the", "start": 2.28, "end": 2.56},
+        {"word": "hustle", "start": 2.56, "end": 4.95},
+    ]
+
+
+def test_unsupported_format(tmp_path):
+    path = tmp_path / "captions.en.json3"
+    path.write_text("{}")
+    with pytest.raises(ValueError):
+        parse_captions(str(path))
+
+
+def test_policy_accepts_dense_captions():
+    decision = CaptionPolicy().choose({"tracks": [track("auto.en.srv3")], "duration": 5})
+    assert decision["accepted"]
+    assert decision["track"]["path"] == fixture("auto.en.srv3")
+
+
+def test_policy_prefers_creator_captions():
+    tracks = [track("auto.en.vtt"), track("manual.en.vtt", automatic=False)]
+    decision = CaptionPolicy().choose({"tracks": tracks, "duration": 5})
+    assert decision["track"]["automatic"] is False
+
+
+@pytest.mark.parametrize("policy, captions, reason", [
+    (CaptionPolicy(), {"tracks": [track("auto.en.srv3")], "duration": 600},
+     "en: captions cover 1% of the video"),
+    (CaptionPolicy(), {"tracks": [track("sparse.en.vtt", automatic=False)], "duration": 60},
+     "en: captions average 2 words per minute"),
+    (CaptionPolicy(allow_automatic=False), {"tracks": [track("auto.en.vtt")], "duration": 5},
+     "en: only automatic captions are available"),
+    (CaptionPolicy(), {"tracks": [track("auto.en.vtt")], "duration": 5, "language": "de"},
+     "en: automatic captions are translated from de"),
+    (CaptionPolicy(), {"tracks": [track("manual.en.vtt", language="fr", automatic=False)], "duration": 5},
+     "fr: caption language fr is not one of en"),
+    (CaptionPolicy(), {"tracks": [], "duration": 5}, "no captions"),
+])
+def test_policy_rejections(policy, captions, reason):
+    decision = policy.choose(captions)
+    assert not decision["accepted"]
+    assert decision["reason"] == reason
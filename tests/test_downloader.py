@@ -0,0 +1,36 @@
+# test_downloader.py - Download throughput accounting without running yt-dlp
+
+import json
+import subprocess
+
+import pytest
+
+import downloader
+from downloader import YouTubeDownloader, TUNER_MIN_BYTES
+
+
+@pytest.fixture
+def fake_ytdlp(monkeypatch):
+    """Replace the yt-dlp process with one that writes a file of the given size"""
+    sizes = []
+
+    def run(command, **kwargs):
+        output_file = command[command.index("-o") + 1]
+        with open(output_file, "wb") as f:
+            f.truncate(sizes.pop(0))
+        return subprocess.CompletedProcess(command, 0, json.dumps({"title": "Title", "duration": 60}), "")
+    monkeypatch.setattr(downloader.subprocess, "run", run)
+    return sizes
+
+
+@pytest.mark.parametrize("size, tuned", [(TUNER_MIN_BYTES - 1, False), (TUNER_MIN_BYTES, True)])
+def test_tuner_skips_small_downloads(tmp_path, fake_ytdlp, size, tuned):
+    fake_ytdlp.append(size)
+    ytdl = YouTubeDownloader(str(tmp_path / "tmp"), concurrent_fragments="auto")
+
+    path, metadata = ytdl.download_with_metadata("https://www.youtube.com/watch?v=aaaaaaaaaaa", str(tmp_path))
+
+    assert metadata["title"] == "Title"
+    assert ytdl.last_download()["bytes"] == size
+    assert ytdl.stats()["downloads"] == 1
+    assert bool(ytdl.tuner.throughput) is tuned
@@ -0,0 +1,78 @@
+# test_inference_server.py - Inference server and client over a local socket, without models
+
+import os
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+
+import pytest
+
+pytest.importorskip("boto3")
+np = pytest.importorskip("numpy")
+pytest.importorskip("soundfile")
+
+import inference_server
+from inference_server import InferenceServer, RemoteTranscriber, SAMPLE_RATE, SAMPLE_DTYPE
+
+
+class FakeTranscriber:
+    """Stands in for the server's Transcriber: reports the audio it was given"""
+
+    model_name = "fake"
+    device = "cpu"
+
+    def load_model(self):
+        pass
+
+    def transcribe_chunk(self, audio, language="en"):
+        return [{"shape": audio.shape, "sum": audio.sum(), "language": language}]
+
+
+@pytest.fixture
+def server_address(tmp_path):
+    """Socket of an InferenceServer running in its own process, as it does on a host"""
+    address = str(tmp_path / "inference.sock")
+    server = InferenceServer(FakeTranscriber(), address)
+    process = multiprocessing.get_context("fork").Process(target=server.serve_forever, daemon=True)
+    process.start()
+    deadline = time.time() + 5
+    while not os.path.exists(address) and time.time() < deadline:
+        time.sleep(0.01)
+    yield address
+    process.terminate()
+    process.join()
+
+
+def test_remote_model_name_comes_from_the_server():
+    transcriber = RemoteTranscriber(address="/nonexistent.sock")
+    pings = []
+
+    def ping():
+        pings.append(1)
+        return {"ok": True, "model": "medium"}
+    transcriber.ping = ping
+
+    assert transcriber.model_name == "medium"
+    assert transcriber.model_name == "medium"
+    assert len(pings) == 1
+    assert transcriber.reusable("medium") and not transcriber.reusable("large-v2")
+
+
+def test_chunks_are_read_from_shared_memory(server_address, monkeypatch):
+    pcm = np.arange(2 * SAMPLE_RATE + 500, dtype=SAMPLE_DTYPE)
+    monkeypatch.setattr(inference_server, "decode_audio", lambda audio_file: pcm.tobytes())
+    transcriber = RemoteTranscriber(address=server_address, chunk_size=1)
+
+    chunks = transcriber.prepare_chunks("audio.wav", None)
+    assert chunks == [(0, SAMPLE_RATE), (SAMPLE_RATE, SAMPLE_RATE), (2 * SAMPLE_RATE, 500)]
+
+    for offset, length in chunks:
+        [result] = transcriber.transcribe_chunk((offset, length), "de")
+        assert result == {"shape": (length,), "sum": pcm[offset:offset + length].sum(), "language": "de"}
+    assert transcriber.ping()["requests"] == len(chunks)
+    assert transcriber.model_name == "fake"
+
+    name = transcriber._shm.name
+    transcriber.release_chunks()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
@@ -0,0 +1,130 @@
+# test_job_tracker.py - S3 job tracker against the local S3 stand-in
+
+import json
+import time
+
+import pytest
+
+pytest.importorskip("boto3")
+
+from job_tracker import JobTracker, JobState
+from local_s3 import LocalS3Client
+
+BUCKET = "bucket"
+
+
+@pytest.fixture
+def s3(tmp_path):
+    return LocalS3Client(str(tmp_path))
+
+
+def tracker(s3):
+    return JobTracker(BUCKET, s3_client=s3)
+
+
+def create(tracker_, job_id="job-1", video_id="aaaaaaaaaaa"):
+    return tracker_.create_job(job_id, video_id, f"https://www.youtube.com/watch?v={video_id}", "hustle")
+
+
+def keys(s3, prefix):
+    return [item["Key"] for item in s3.list_objects_v2(Bucket=BUCKET, Prefix=prefix).get("Contents", [])]
+
+
+def test_losing_claim_removes_its_queued_record(s3):
+    a, b = tracker(s3), tracker(s3)
+    create(b)
+    # a read the index before b's claim landed
+    a.get_job_status = lambda job_id: JobState.QUEUED
+    assert b.start_processing("job-1", "worker-b")
+
+    create(a)
+    assert a.start_processing("job-1", "worker-a") is None
+
+    assert keys(s3, "jobs/queued/") == []
+    assert keys(s3, "jobs/processing/") == ["jobs/processing/job-1.json"]
+    assert b.get_job_status("job-1") == JobState.PROCESSING
+    a.stop()
+    b.stop()
+
+
+def test_losing_claim_keeps_a_newer_queued_record(s3):
+    a, b = tracker(s3), tracker(s3)
+    create(b)
+    create(a)
+    assert b.start_processing("job-1", "worker-b")
+    assert b.requeue_job("job-1")
+
+    # b's requeued record replaced the one a wrote, so a must not delete it
+    a._discard_created("job-1")
+    assert keys(s3, "jobs/queued/") == ["jobs/queued/job-1.json"]
+    a.stop()
+    b.stop()
+
+
+def heartbeat(s3, worker_id, status):
+    s3.put_object(Bucket=BUCKET, Key=f"workers/{worker_id}.json",
+                  Body=json.dumps({"worker_id": worker_id, "status": status,
+                                   "last_heartbeat": time.time()}).encode("utf-8"))
+
+
+def test_shut_down_workers_are_not_live(s3):
+    tracker_ = tracker(s3)
+    heartbeat(s3, "worker-a", "active")
+    heartbeat(s3, "worker-b", "active")
+    assert sorted(tracker_.list_live_workers()) == ["worker-a", "worker-b"]
+
+    heartbeat(s3, "worker-b", "shutdown")
+    assert tracker_.list_live_workers() == ["worker-a"]
+
+
+def test_unchanged_heartbeats_are_not_reread(s3):
+    tracker_ = tracker(s3)
+    heartbeat(s3, "worker-a", "active")
+    heartbeat(s3, "worker-b", "shutdown")
+    tracker_.list_live_workers()
+
+    reads = []
+    get_object = s3.get_object
+    s3.get_object = lambda **kwargs: reads.append(kwargs["Key"]) or get_object(**kwargs)
+    heartbeat(s3, "worker-a", "active")
+    assert tracker_.list_live_workers() == ["worker-a"]
+    assert reads == ["workers/worker-a.json"]
+
+
+def test_index_shards_track_transitions(s3):
+    tracker_ = tracker(s3)
+    for i in range(20):
+        create(tracker_, f"job-{i}")
+    for i in range(5):
+        assert tracker_.start_processing(f"job-{i}")
+        tracker_.complete_job(f"job-{i}")
+    assert tracker_.start_processing("job-5")
+    tracker_.fail_job("job-5", "boom")
+
+    assert len(keys(s3, "jobs/index/")) > 1
+    assert tracker_.get_job_status("job-0") == JobState.COMPLETED
+    assert tracker_.get_job_status("job-5") == JobState.FAILED
+    assert tracker_.get_job_status("job-6") == JobState.QUEUED
+    summary = tracker_.get_status_summary()
+    assert summary["counts"] == {"queued": 14, "processing": 0, "completed": 5, "failed": 1}
+    assert len(summary["jobs"]) == 20
+    tracker_.stop()
+
+
+def test_index_prunes_failed_and_expired_queued_entries(s3, monkeypatch):
+    monkeypatch.setattr("job_tracker.INDEX_SHARDS", 1)
+    monkeypatch.setattr("job_tracker.INDEX_MAX_FAILED", 2)
+    tracker_ = tracker(s3)
+    for i in range(4):
+        create(tracker_, f"failed-{i}")
+        tracker_.fail_job(f"failed-{i}", "boom")
+    stale = create(tracker_, "stale")
+    stale["updated_at"] = "2000-01-01T00:00:00"
+    tracker_._save_job(stale, JobState.QUEUED)
+    s3.delete_object(Bucket=BUCKET, Key="jobs/index/00.json")
+    tracker_.rebuild_index()
+
+    summary = tracker_.get_status_summary()
+    assert sorted(summary["jobs"]) == ["failed-2", "failed-3"]
+    assert summary["counts"]["failed"] == 4
+    assert summary["counts"]["queued"] == 0
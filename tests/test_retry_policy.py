@@ -0,0 +1,58 @@
+# test_retry_policy.py - Retry decisions and their use in job recovery
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("numpy")
+pytest.importorskip("soundfile")
+
+from downloader import TokenError
+from job_tracker import JobTracker, JobState
+from local_s3 import LocalS3Client
+from retry_policy import RetryPolicy
+
+BUCKET = "bucket"
+
+
+def test_decide_uses_the_error_class_budget():
+    policy = RetryPolicy()
+    assert policy.decide(TokenError("HTTP Error 403"), 4)["retry"]
+    assert not policy.decide(TokenError("HTTP Error 403"), 5)["retry"]
+    assert not policy.decide(ValueError("bad"), 2)["retry"]
+
+
+@pytest.mark.parametrize("job, retry", [
+    ({"attempts": 4, "error_class": "token"}, True),
+    ({"attempts": 5, "error_class": "token"}, False),
+    ({"attempts": 1}, True),
+    ({"attempts": 2}, False),
+])
+def test_abandoned_jobs_keep_their_error_class_budget(job, retry):
+    assert RetryPolicy().decide_abandoned(job)["retry"] is retry
+
+
+def abandon(s3, tracker, job_id, attempts, error_class):
+    """Leave a claimed job behind as a crashed worker would"""
+    tracker.create_job(job_id, "aaaaaaaaaaa", "https://www.youtube.com/watch?v=aaaaaaaaaaa", "hustle")
+    job = tracker.start_processing(job_id, "dead-worker")
+    job.update(attempts=attempts, error_class=error_class,
+               lock_until=(datetime.now() - timedelta(minutes=1)).isoformat())
+    tracker._save_job(job, JobState.PROCESSING)
+    s3.set_last_modified(BUCKET, f"jobs/{JobState.PROCESSING}/{job_id}.json",
+                         datetime.now(timezone.utc) - timedelta(hours=1))
+
+
+@pytest.mark.parametrize("retry_policy, status", [
+    (RetryPolicy(), JobState.QUEUED),
+    (None, JobState.FAILED),
+])
+def test_recovery_applies_the_retry_policy(tmp_path, retry_policy, status):
+    s3 = LocalS3Client(str(tmp_path))
+    tracker = JobTracker(BUCKET, s3_client=s3)
+    abandon(s3, tracker, "job-1", 3, "token")
+
+    tracker.recover_abandoned_jobs("worker-a", live_workers=[], retry_policy=retry_policy)
+    assert tracker.get_job_by_status("job-1", status)
+    tracker.stop()
@@ -0,0 +1,112 @@
+# test_send_to_queue.py - Expanding and batch-sending URLs against the local SQS stand-in
+
+import json
+from argparse import Namespace
+
+import pytest
+
+pytest.importorskip("boto3")
+
+import send_to_queue
+from downloader import DownloadError
+from local_sqs import LocalSQSClient
+from send_to_queue import collect_video_ids, send_batches, send_many
+
+QUEUE = "videos"
+
+
+class StubDownloader:
+    """Lists collections from a dict; a listing that is an exception is raised"""
+
+    def __init__(self, collections):
+        self.collections = collections
+
+    def list_videos(self, url):
+        found = self.collections[url]
+        if isinstance(found, Exception):
+            raise found
+        return found
+
+
+class RecordingSQS:
+    """LocalSQSClient that records batch calls and can fail chosen entries of each call"""
+
+    def __init__(self, sqs, failures=()):
+        self.sqs = sqs
+        self.calls = []
+        self.failures = list(failures)
+
+    def send_message_batch(self, QueueUrl, Entries):
+        self.calls.append([entry["MessageBody"] for entry in Entries])
+        failing = self.failures.pop(0) if self.failures else set()
+        response = self.sqs.send_message_batch(
+            QueueUrl=QueueUrl, Entries=[entry for entry in Entries if entry["Id"] not in failing])
+        response["Failed"] = response.get("Failed", []) + [
+            {"Id": entry["Id"], "Code": "InternalError", "Message": f"rejected {entry['MessageBody']}"}
+            for entry in Entries if entry["Id"] in failing]
+        return response
+
+
+@pytest.fixture
+def sqs(tmp_path):
+    return LocalSQSClient(str(tmp_path / "sqs"))
+
+
+def queued_bodies(sqs):
+    bodies = []
+    while True:
+        messages = sqs.receive_message(QueueUrl=QUEUE, MaxNumberOfMessages=10).get("Messages", [])
+        if not messages:
+            return bodies
+        bodies.extend(message["Body"] for message in messages)
+
+
+def test_bodies_are_sent_in_batches_of_ten(sqs):
+    client = RecordingSQS(sqs)
+    bodies = [f"body-{i}" for i in range(25)]
+
+    assert send_batches(client, QUEUE, bodies, threads=4) == (25, [])
+    assert sorted(len(call) for call in client.calls) == [5, 10, 10]
+    assert sorted(queued_bodies(sqs)) == sorted(bodies)
+
+
+def test_rejected_entries_are_retried_once(sqs):
+    # First call rejects two entries; the retry of those two rejects one again
+    client = RecordingSQS(sqs, failures=[{"1", "3"}, {"0"}])
+    bodies = [f"body-{i}" for i in range(5)]
+
+    sent, failures = send_batches(client, QUEUE, bodies, threads=1)
+
+    assert client.calls == [bodies, ["body-1", "body-3"]]
+    assert (sent, failures) == (4, ["rejected body-1"])
+    assert sorted(queued_bodies(sqs)) == ["body-0", "body-2", "body-3", "body-4"]
+
+
+def test_videos_are_deduplicated_in_first_seen_order():
+    downloader = StubDownloader({"https://www.youtube.com/playlist?list=PL1": ["bbbbbbbbbbb", "aaaaaaaaaaa", "ccccccccccc"]})
+    urls = [
+        "https://www.youtube.com/watch?v=aaaaaaaaaaa",
+        "https://www.youtube.com/playlist?list=PL1",
+        "https://youtu.be/bbbbbbbbbbb",
+        "https://example.com/video",
+    ]
+
+    video_ids, skipped = collect_video_ids(urls, downloader)
+
+    assert video_ids == ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"]
+    assert skipped == [("https://example.com/video", "not a YouTube video, playlist or channel URL")]
+
+
+def test_failed_listing_is_skipped_without_aborting(sqs, tmp_path, monkeypatch, capsys):
+    channel = "https://www.youtube.com/@gone"
+    monkeypatch.setattr(send_to_queue, "YouTubeDownloader",
+                        lambda: StubDownloader({channel: DownloadError("channel does not exist")}))
+    args = Namespace(youtube_url=[channel, "https://www.youtube.com/watch?v=aaaaaaaaaaa"], urls_file=None,
+                     force=False, local_root=str(tmp_path), s3_bucket="bucket", model="large-v2",
+                     phrase=None, dry_run=False, queue_url=QUEUE, threads=2, region="us-east-1")
+
+    send_many(sqs, args)
+
+    assert f"Skipped {channel}: channel does not exist" in capsys.readouterr().out
+    assert [json.loads(body) for body in queued_bodies(sqs)] == [
+        {"youtube_url": "https://www.youtube.com/watch?v=aaaaaaaaaaa"}]
@@ -0,0 +1,66 @@
+# test_sqlite_job_tracker.py - Lease ownership rules of the SQLite job tracker
+
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("boto3")  # job_tracker, which defines the job states, creates a boto3 client
+
+from job_tracker import JobState
+from sqlite_job_tracker import SQLiteJobTracker
+
+
+def expire_lease(tracker, job_id):
+    """Move a processing job's lock into the past"""
+    job = tracker.get_job(job_id)
+    job["lock_until"] = (datetime.now() - timedelta(minutes=1)).isoformat()
+    conn = tracker._transaction()
+    tracker._write(conn, job)
+    conn.execute("COMMIT")
+
+
+@pytest.fixture
+def trackers(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    a, b = SQLiteJobTracker(db_path), SQLiteJobTracker(db_path)
+    a.create_job("job-1", "aaaaaaaaaaa", "https://www.youtube.com/watch?v=aaaaaaaaaaa", "hustle")
+    yield a, b
+    a.stop()
+    b.stop()
+
+
+@pytest.mark.parametrize("finish", [
+    lambda tracker: tracker.fail_job("job-1", "boom"),
+    lambda tracker: tracker.complete_job("job-1"),
+    lambda tracker: tracker.requeue_job("job-1", "boom"),
+])
+def test_worker_that_lost_its_lease_cannot_finish_the_job(trackers, finish):
+    a, b = trackers
+    assert a.start_processing("job-1", "worker-a")
+    expire_lease(a, "job-1")
+    assert b.start_processing("job-1", "worker-b")
+
+    assert not a.renew_lease("job-1")
+    assert a.lease_lost("job-1")
+    assert not finish(a)
+
+    job = b.get_job("job-1")
+    assert job["status"] == JobState.PROCESSING
+    assert job["worker_id"] == "worker-b"
+    assert b.renew_lease("job-1")
+
+
+def test_unowned_tracker_cannot_fail_a_live_claim(trackers):
+    a, b = trackers
+    assert b.start_processing("job-1", "worker-b")
+
+    assert not a.fail_job("job-1", "boom")
+    assert a.get_job("job-1")["status"] == JobState.PROCESSING
+
+
+def test_unowned_tracker_can_fail_a_queued_job(trackers):
+    a, _ = trackers
+    assert a.fail_job("job-1", "boom")
+    job = a.get_job("job-1")
+    assert job["status"] == JobState.FAILED
+    assert job["attempts"] == 1
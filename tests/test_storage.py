@@ -0,0 +1,53 @@
+# test_storage.py - Compressed object helpers and conditional updates
+
+import threading
+
+import pytest
+
+from local_s3 import LocalS3Client
+from storage import compress, decompress, get_json, update_object, UpdateConflictError
+
+
+@pytest.mark.parametrize("compression", ["gzip", "none"])
+def test_compress_round_trip(compression):
+    body = b'{"segments": []}' * 100
+    payload, encoding = compress(body, compression)
+    assert decompress(payload, encoding) == body
+    assert decompress(payload) == body
+
+
+def test_update_object_creates_then_changes(tmp_path):
+    s3 = LocalS3Client(str(tmp_path))
+    assert update_object(s3, "bucket", "state.json", lambda state: {"n": 1}) == {"n": 1}
+    assert update_object(s3, "bucket", "state.json", lambda state: dict(state, n=state["n"] + 1)) == {"n": 2}
+    # No change returns the stored value without writing
+    assert update_object(s3, "bucket", "state.json", lambda state: None) == {"n": 2}
+
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    s3 = LocalS3Client(str(tmp_path))
+
+    def increment():
+        for _ in range(5):
+            update_object(s3, "bucket", "counter.json",
+                          lambda state: {"n": (state or {"n": 0})["n"] + 1}, max_retries=100)
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert get_json(s3, "bucket", "counter.json") == {"n": 20}
+
+
+def test_update_object_gives_up_after_max_retries(tmp_path):
+    s3 = LocalS3Client(str(tmp_path))
+    update_object(s3, "bucket", "state.json", lambda state: {"n": 0})
+
+    def race(state):
+        # Another writer changes the object between every read and write
+        s3.put_object(Bucket="bucket", Key="state.json", Body=f'{{"n": {state["n"] + 1}}}'.encode())
+        return {"n": -1}
+
+    with pytest.raises(UpdateConflictError):
+        update_object(s3, "bucket", "state.json", race, max_retries=3)
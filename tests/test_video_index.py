@@ -0,0 +1,73 @@
+# test_video_index.py - Processed-video index against the local S3 stand-in
+
+import pytest
+
+from local_s3 import LocalS3Client
+from storage import get_bytes
+from video_index import VideoIndex, BloomFilter, phrase_key
+
+BUCKET = "bucket"
+VIDEO_IDS = ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc", "ddddddddddd", "eeeeeeeeeee"]
+
+
+@pytest.fixture
+def s3(tmp_path):
+    return LocalS3Client(str(tmp_path))
+
+
+def bloom(s3, index):
+    return BloomFilter.from_bytes(get_bytes(s3, BUCKET, f"{index.prefix}/bloom.bin"))
+
+
+def test_phrase_key_ignores_order_and_case():
+    assert phrase_key(["Hustle", "grind "]) == phrase_key(["grind", "hustle"])
+    assert phrase_key("hustle") == phrase_key(["HUSTLE"])
+    assert phrase_key(["hustle"]) != phrase_key(["hustle", "grind"])
+
+
+def test_added_videos_are_found_in_input_order(s3):
+    index = VideoIndex(s3, BUCKET, phrases=["hustle"])
+    for video_id in ("ddddddddddd", "bbbbbbbbbbb"):
+        assert index.add(video_id)
+
+    assert index.contains("bbbbbbbbbbb")
+    assert not index.contains("aaaaaaaaaaa")
+    new, processed = index.filter_new(VIDEO_IDS)
+    assert new == ["aaaaaaaaaaa", "ccccccccccc", "eeeeeeeeeee"]
+    assert processed == ["bbbbbbbbbbb", "ddddddddddd"]
+
+
+@pytest.mark.parametrize("model, phrases", [
+    ("large-v2", ["grind"]),
+    ("large-v2", ["hustle", "grind"]),
+    ("medium", ["hustle"]),
+])
+def test_other_model_or_phrase_set_does_not_see_the_video(s3, model, phrases):
+    VideoIndex(s3, BUCKET, model="large-v2", phrases=["hustle"]).add("aaaaaaaaaaa")
+
+    other = VideoIndex(s3, BUCKET, model=model, phrases=phrases)
+    assert not other.contains("aaaaaaaaaaa")
+    assert other.filter_new(["aaaaaaaaaaa"]) == (["aaaaaaaaaaa"], [])
+
+
+def test_bloom_filter_is_rebuilt_past_capacity(s3):
+    index = VideoIndex(s3, BUCKET, capacity=4)
+    for video_id in VIDEO_IDS[:4]:
+        index.add(video_id)
+    assert bloom(s3, index).capacity == 4
+
+    index.add(VIDEO_IDS[4])
+    rebuilt = bloom(s3, index)
+    assert (rebuilt.capacity, rebuilt.count) == (8, 5)
+    assert all(video_id in rebuilt for video_id in VIDEO_IDS)
+    assert index.filter_new(VIDEO_IDS) == ([], VIDEO_IDS)
+
+
+def test_missing_bloom_filter_reports_all_new(s3):
+    index = VideoIndex(s3, BUCKET)
+    index.add("aaaaaaaaaaa")
+    s3.delete_object(Bucket=BUCKET, Key=f"{index.prefix}/bloom.bin")
+
+    assert index.filter_new(["aaaaaaaaaaa", "bbbbbbbbbbb"]) == (["aaaaaaaaaaa", "bbbbbbbbbbb"], [])
+    # The shard is authoritative, so the worker's single check still sees it
+    assert index.contains("aaaaaaaaaaa")
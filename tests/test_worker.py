@@ -0,0 +1,198 @@
+# test_worker.py - Worker message handling against the local S3 and SQS stand-ins
+
+import json
+import os
+
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("numpy")
+pytest.importorskip("soundfile")
+
+import worker as worker_module
+from job_tracker import JobState
+from local_sqs import LocalSQSClient
+from worker import Worker, STAGED_AUDIO_KEY
+
+VIDEO_ID = "aaaaaaaaaaa"
+
+
+class StubDownloader:
+    """Stands in for YouTubeDownloader without touching the network"""
+
+    downloads = 0
+
+    def extract_video_id(self, url):
+        return url[-11:]
+
+    def download_with_metadata(self, url, output_dir):
+        self.downloads += 1
+        path = os.path.join(output_dir, "audio.mp4")
+        with open(path, "wb") as f:
+            f.write(b"mp4")
+        return path, {"title": "Title", "duration": 321, "channel": "Channel"}
+
+    def convert_to_wav(self, path, output_dir):
+        wav = os.path.join(output_dir, "audio.wav")
+        with open(wav, "wb") as f:
+            f.write(b"RIFF")
+        return wav
+
+    def fetch_metadata(self, url):
+        return {}
+
+    def last_download(self):
+        return None
+
+    def stats(self):
+        return {}
+
+
+class StubTranscription:
+    """Stands in for Transcriber.resume_transcription: one segment containing the phrase"""
+
+    def __init__(self):
+        self.audio = []
+        self.reuse = []
+
+    def __call__(self, audio_file, job_id, job_tracker, video_id, on_chunk=None, reuse=True):
+        self.reuse.append(reuse)
+        if audio_file:
+            with open(audio_file, "rb") as f:
+                self.audio.append(f.read())
+        segments = [{"start": 0.0, "end": 2.0, "text": " hustle hard"}]
+        on_chunk(0, segments, 1)
+        return {"segments": segments}
+
+
+def make_worker(root, tmp_path, **kwargs):
+    worker = Worker(temp_dir=str(tmp_path / "tmp"), poll_interval=1, partial_results="off",
+                    audio_cache_gb=0, prefetch_threads=0, local_root=root, **kwargs)
+    worker.downloader = StubDownloader()
+    worker.receiver.wait_time = 0
+    return worker
+
+
+def send(sqs, queue_url, video_id=VIDEO_ID, **fields):
+    sqs.send_message(QueueUrl=queue_url,
+                     MessageBody=json.dumps({"youtube_url": f"https://www.youtube.com/watch?v={video_id}", **fields}))
+
+
+def queue_counts(sqs, queue_url):
+    attributes = sqs.get_queue_attributes(QueueUrl=queue_url)["Attributes"]
+    return int(attributes["ApproximateNumberOfMessages"]), int(attributes["ApproximateNumberOfMessagesNotVisible"])
+
+
+def test_failure_before_the_claim_is_retried(tmp_path):
+    root = str(tmp_path / "local")
+    sqs = LocalSQSClient(f"{root}/sqs")
+    send(sqs, "videos")
+    worker = make_worker(root, tmp_path, queue_url="videos")
+
+    def unavailable(**kwargs):
+        raise ConnectionError("job store unavailable")
+    worker.job_tracker.create_job = unavailable
+
+    worker.process_batch()
+    worker.receiver.flush_deletes()
+
+    # The message is kept, hidden for the backoff, and no job was failed
+    assert queue_counts(sqs, "videos") == (0, 1)
+    assert worker.job_tracker.list_jobs_by_status(JobState.FAILED) == []
+    worker.job_tracker.stop()
+
+
+@pytest.fixture
+def roles(tmp_path, monkeypatch):
+    """A fetch and a transcribe worker sharing one local root"""
+    monkeypatch.setattr(worker_module, "HANDOFF_DELAY", 0)
+    root = str(tmp_path / "local")
+    sqs = LocalSQSClient(f"{root}/sqs")
+    fetch = make_worker(root, tmp_path, queue_url="videos", role="fetch", transcribe_queue_url="transcribe")
+    transcribe = make_worker(root, tmp_path, role="transcribe", transcribe_queue_url="transcribe")
+    transcribe.transcriber.resume_transcription = StubTranscription()
+    yield sqs, fetch, transcribe
+    fetch.job_tracker.stop()
+    transcribe.job_tracker.stop()
+
+
+def test_fetch_hands_off_to_transcribe(roles):
+    sqs, fetch, transcribe = roles
+    send(sqs, "videos")
+
+    fetch.process_batch()
+    fetch.receiver.flush_deletes()
+    assert fetch.downloader.downloads == 1
+    assert queue_counts(sqs, "videos") == (0, 0)
+    assert queue_counts(sqs, "transcribe") == (1, 0)
+    [job] = fetch.job_tracker.list_jobs_by_status(JobState.QUEUED)
+    assert set(job["stages"]) >= {"audio", "metadata"}
+
+    assert transcribe.process_batch() == 1
+    transcribe.receiver.flush_deletes()
+    assert transcribe.transcriber.resume_transcription.audio == [b"RIFF"]
+    assert queue_counts(sqs, "transcribe") == (0, 0)
+    [job] = transcribe.job_tracker.list_jobs_by_status(JobState.COMPLETED)
+    assert set(job["stages"]) >= {"audio", "metadata", "transcript", "results"}
+    assert not transcribe.s3_object_exists(STAGED_AUDIO_KEY.format(video_id=VIDEO_ID))
+
+
+def test_failed_hand_off_keeps_the_job_claimed(roles):
+    sqs, fetch, transcribe = roles
+    send(sqs, "videos")
+
+    def unavailable(**kwargs):
+        raise ConnectionError("transcribe queue unavailable")
+    fetch.sqs.send_message = unavailable
+
+    fetch.process_batch()
+    fetch.receiver.flush_deletes()
+
+    # The job was not requeued without a message: the fetch message is retried
+    assert queue_counts(sqs, "videos") == (0, 1)
+    [job] = fetch.job_tracker.list_jobs_by_status(JobState.QUEUED)
+    assert job["attempts"] == 1
+    assert transcribe.process_batch() == 0
+
+
+@pytest.mark.parametrize("model, force, reused", [
+    ("large-v2", False, True),
+    (None, False, True),
+    ("tiny", False, False),
+    ("large-v2", True, False),
+])
+def test_saved_transcript_reuse(tmp_path, model, force, reused):
+    root = str(tmp_path / "local")
+    sqs = LocalSQSClient(f"{root}/sqs")
+    send(sqs, "videos", force=force)
+    worker = make_worker(root, tmp_path, queue_url="videos", use_gpu=False)
+    worker.transcriber.resume_transcription = StubTranscription()
+    transcript = {"segments": [{"start": 0.0, "end": 2.0, "text": " hustle hard"}], "model": model}
+    worker.transcriber.save_transcript_to_s3(VIDEO_ID, transcript)
+
+    assert worker.process_batch() == 1
+    # Only a transcript that is not reused needs the audio
+    assert worker.downloader.downloads == (0 if reused else 1)
+    assert worker.transcriber.resume_transcription.reuse == [not force]
+    worker.job_tracker.stop()
+
+
+@pytest.mark.parametrize("force", [False, True])
+def test_indexed_video_is_skipped_unless_forced(tmp_path, force):
+    root = str(tmp_path / "local")
+    sqs = LocalSQSClient(f"{root}/sqs")
+    send(sqs, "videos", force=force)
+    worker = make_worker(root, tmp_path, queue_url="videos", use_gpu=False)
+    worker.transcriber.resume_transcription = StubTranscription()
+    worker.video_index(worker.phrase).add(VIDEO_ID)
+
+    worker.process_batch()
+    worker.receiver.flush_deletes()
+
+    # The message is gone either way; only a forced one created and ran a job
+    assert queue_counts(sqs, "videos") == (0, 0)
+    counts = worker.job_tracker.get_status_summary()["counts"]
+    assert counts == {JobState.QUEUED: 0, JobState.PROCESSING: 0,
+                      JobState.COMPLETED: 1 if force else 0, JobState.FAILED: 0}
+    assert worker.downloader.downloads == (1 if force else 0)
+    worker.job_tracker.stop()
@@ -5,13 +5,23 @@ import os
 import json
 import logging
 import numpy as np
-import torch
-import whisperx
 from datetime import datetime
 import tempfile
 import boto3
 import soundfile as sf
 
+# The models are only needed where transcription runs; processes that send
+# audio to an inference server (RemoteTranscriber) can skip installing them
+try:
+    import torch
+    import whisperx
+except ImportError:
+    torch = None
+    whisperx = None
+
+from compact_transcript import encode_transcript, COMPACT_TRANSCRIPT_NAME
+from storage import put_json, put_bytes, get_json, DEFAULT_COMPRESSION
+
 logger = logging.getLogger(__name__)
 
 class TranscriptionError(Exception):
@@ -30,7 +40,8 @@ class Transcriber:
     """Handles audio transcription using WhisperX with chunking and progress tracking"""
     
     def __init__(self, model_name="large-v2", device="cuda", chunk_size=30, 
-                 s3_bucket=None, region="us-east-1", batch_size=16, vlad_onset=0.3, vlad_offset=0.3):
+                 s3_bucket=None, region="us-east-1", batch_size=16, vlad_onset=0.3, vlad_offset=0.3,
+                 compression=DEFAULT_COMPRESSION, s3_client=None):
         """
         Initialize the transcriber
         
@@ -43,15 +54,18 @@ class Transcriber:
             batch_size: Batch size for processing
             vlad_onset: Voice activity detection onset threshold (0-1)
             vlad_offset: Voice activity detection offset threshold (0-1)
+            compression: Compression for stored transcript objects ('gzip', 'zstd' or 'none')
+            s3_client: S3 client to use (Default: a boto3 client for region)
         """
         self.model_name = model_name
-        self.device = "cuda" if torch.cuda.is_available() and device == "cuda" else "cpu"
+        self.device = "cuda" if torch is not None and torch.cuda.is_available() and device == "cuda" else "cpu"
         self.chunk_size = chunk_size
         self.s3_bucket = s3_bucket
-        self.s3 = boto3.client('s3', region_name=region) if s3_bucket else None
+        self.s3 = (s3_client or boto3.client('s3', region_name=region)) if s3_bucket else None
         self.batch_size = batch_size
         self.vlad_onset = vlad_onset
         self.vlad_offset = vlad_offset
+        self.compression = compression
         self.model = None
         
         logger.info(f"Initializing transcriber with model={model_name}, device={self.device}")
@@ -60,6 +74,9 @@ class Transcriber:
         """Load the WhisperX model"""
         if self.model is not None:
             return
+        
+        if whisperx is None:
+            raise ModelLoadError("whisperx is not installed")
             
         try:
             logger.info(f"Loading WhisperX model {self.model_name} on {self.device}")
@@ -119,7 +136,53 @@ class Transcriber:
             logger.error(error_msg)
             raise AudioProcessingError(error_msg)
     
-    def transcribe_audio(self, audio_file, job_id=None, job_tracker=None, video_id=None, language="en"):
+    def prepare_chunks(self, audio_file, output_dir):
+        """
+        Split audio into the chunk inputs passed to transcribe_chunk
+        
+        Returns:
+            List of chunk file paths
+        """
+        return self.segment_audio(audio_file, output_dir)
+    
+    def release_chunks(self):
+        """Free resources held for the chunks of the current file (nothing to free locally)"""
+        pass
+    
+    def transcribe_chunk(self, chunk, language="en"):
+        """
+        Transcribe and align one chunk
+        
+        Args:
+            chunk: Chunk file path, or 16 kHz mono float32 samples
+            language: Language code
+            
+        Returns:
+            Aligned segments with timestamps relative to the chunk start
+        """
+        self.load_model()
+        
+        # Transcribe chunk
+        result = self.model.transcribe(
+            chunk, 
+            batch_size=self.batch_size, 
+            language=language,
+            vlad_onset=self.vlad_onset,  # Add VAD onset parameter
+            vlad_offset=self.vlad_offset  # Add VAD offset parameter
+        )
+        
+        # Align words for precise timestamps
+        result = whisperx.align(
+            result["segments"],
+            self.alignment_model,
+            self.metadata,
+            chunk,
+            device=self.device
+        )
+        return result["segments"]
+    
+    def transcribe_audio(self, audio_file, job_id=None, job_tracker=None, video_id=None, language="en",
+                         on_chunk=None):
         """
         Transcribe audio file with progress tracking
         
@@ -129,6 +192,8 @@ class Transcriber:
             job_tracker: JobTracker instance for progress updates
             video_id: YouTube video ID
             language: Language code
+            on_chunk: Optional callback(chunk_index, segments, total_chunks) called
+                as soon as each chunk is aligned, in chunk order
             
         Returns:
             Transcription result with word-level timestamps
@@ -142,7 +207,7 @@ class Transcriber:
                 logger.info(f"Created temporary directory: {temp_dir}")
                 
                 # Segment audio
-                chunk_files = self.segment_audio(audio_file, temp_dir)
+                chunk_files = self.prepare_chunks(audio_file, temp_dir)
                 
                 if job_tracker and job_id:
                     job_tracker.update_progress(job_id, total_chunks=len(chunk_files), completed_chunks=0)
@@ -153,23 +218,8 @@ class Transcriber:
                 for i, chunk_file in enumerate(chunk_files):
                     logger.info(f"Processing chunk {i+1}/{len(chunk_files)}")
                     
-                    # Transcribe chunk
-                    result = self.model.transcribe(
-                        chunk_file, 
-                        batch_size=self.batch_size, 
-                        language=language,
-                        vlad_onset=self.vlad_onset,  # Add VAD onset parameter
-                        vlad_offset=self.vlad_offset  # Add VAD offset parameter
-                    )
-                    
-                    # Align words for precise timestamps
-                    result = whisperx.align(
-                        result["segments"],
-                        self.alignment_model,
-                        self.metadata,
-                        chunk_file,
-                        device=self.device
-                    )
+                    # Transcribe and align chunk
+                    result = {"segments": self.transcribe_chunk(chunk_file, language)}
                     
                     # Adjust timestamps for chunk position
                     chunk_start_time = i * self.chunk_size
@@ -184,15 +234,13 @@ class Transcriber:
                     # Add to results
                     all_segments.extend(result["segments"])
                     
+                    if on_chunk:
+                        on_chunk(i, result["segments"], len(chunk_files))
+                    
                     # Save progress to S3 if needed
                     if self.s3_bucket and video_id:
                         segment_key = f"transcripts/{video_id}/segments/chunk_{i:04d}.json"
-                        self.s3.put_object(
-                            Body=json.dumps(result["segments"]),
-                            Bucket=self.s3_bucket,
-                            Key=segment_key,
-                            ContentType="application/json"
-                        )
+                        put_json(self.s3, self.s3_bucket, segment_key, result["segments"], self.compression)
                     
                     # Update progress
                     if job_tracker and job_id:
@@ -203,18 +251,13 @@ class Transcriber:
                     "segments": sorted(all_segments, key=lambda x: x["start"]),
                     "language": language,
                     "video_id": video_id,
+                    "model": self.model_name,
                     "transcribed_at": datetime.now().isoformat()
                 }
                 
                 # Save complete transcript
                 if self.s3_bucket and video_id:
-                    transcript_key = f"transcripts/{video_id}/full_transcript.json"
-                    self.s3.put_object(
-                        Body=json.dumps(final_result),
-                        Bucket=self.s3_bucket,
-                        Key=transcript_key,
-                        ContentType="application/json"
-                    )
+                    self.save_transcript_to_s3(video_id, final_result)
                 
                 return final_result
                 
@@ -222,6 +265,30 @@ class Transcriber:
             error_msg = f"Error transcribing audio: {str(e)}"
             logger.error(error_msg)
             raise TranscriptionError(error_msg)
+        finally:
+            self.release_chunks()
+    
+    def save_transcript_to_s3(self, video_id, transcript):
+        """
+        Save the full transcript as JSON plus the compact binary form next to it
+        
+        The model of an ASR transcript is also stored as object metadata, so
+        workers can tell from a HEAD request whether they may reuse it.
+        
+        Args:
+            video_id: YouTube video ID
+            transcript: Full transcript dict
+        """
+        put_json(self.s3, self.s3_bucket, f"transcripts/{video_id}/full_transcript.json",
+                 transcript, self.compression,
+                 metadata={"model": transcript["model"]} if transcript.get("model") else None)
+        
+        # The compact copy is an optimization for readers; JSON stays authoritative
+        try:
+            put_bytes(self.s3, self.s3_bucket, f"transcripts/{video_id}/{COMPACT_TRANSCRIPT_NAME}",
+                      encode_transcript(transcript), compression=self.compression)
+        except Exception as e:
+            logger.warning(f"Error saving compact transcript for {video_id}: {str(e)}")
     
     def load_transcript_from_s3(self, video_id):
         """
@@ -238,8 +305,7 @@ class Transcriber:
             
         try:
             transcript_key = f"transcripts/{video_id}/full_transcript.json"
-            response = self.s3.get_object(Bucket=self.s3_bucket, Key=transcript_key)
-            transcript_data = json.loads(response['Body'].read().decode('utf-8'))
+            transcript_data = get_json(self.s3, self.s3_bucket, transcript_key)
             return transcript_data
             
         except self.s3.exceptions.NoSuchKey:
@@ -248,6 +314,15 @@ class Transcriber:
             logger.error(f"Error loading transcript from S3: {str(e)}")
             return None
     
+    def reusable(self, model):
+        """
+        True if a transcript made with model may stand in for one from this transcriber
+        
+        Caption transcripts and those saved before transcripts recorded
+        their model have none, and are reusable by any model.
+        """
+        return not model or model == self.model_name
+    
     def load_segment_from_s3(self, video_id, chunk_index):
         """
         Load specific segment from S3
@@ -264,8 +339,7 @@ class Transcriber:
             
         try:
             segment_key = f"transcripts/{video_id}/segments/chunk_{chunk_index:04d}.json"
-            response = self.s3.get_object(Bucket=self.s3_bucket, Key=segment_key)
-            segment_data = json.loads(response['Body'].read().decode('utf-8'))
+            segment_data = get_json(self.s3, self.s3_bucket, segment_key)
             return segment_data
             
         except self.s3.exceptions.NoSuchKey:
@@ -310,28 +384,43 @@ class Transcriber:
             logger.error(f"Error listing completed segments: {str(e)}")
             return []
     
-    def resume_transcription(self, audio_file, job_id, job_tracker, video_id, language="en"):
+    def resume_transcription(self, audio_file, job_id, job_tracker, video_id, language="en", on_chunk=None,
+                             reuse=True):
         """
         Resume transcription from where it left off
         
+        A saved transcript or chunks are only reused if reuse is set and
+        the transcript was made with this transcriber's model (see reusable).
+        
         Args:
             audio_file: Path to audio file
             job_id: Job ID for tracking
             job_tracker: JobTracker instance
             video_id: YouTube video ID
             language: Language code
+            on_chunk: Optional callback(chunk_index, segments, total_chunks) called
+                for every chunk in order, whether loaded from S3 or transcribed
+            reuse: Use a transcript and chunks saved earlier (False for forced jobs)
             
         Returns:
             Transcription result
         """
         # Check if full transcript already exists
-        full_transcript = self.load_transcript_from_s3(video_id)
+        full_transcript = self.load_transcript_from_s3(video_id) if reuse else None
+        if full_transcript and not self.reusable(full_transcript.get("model")):
+            # Its chunks came from the same model and cannot be reused either
+            logger.info(f"Transcript of {video_id} was made with {full_transcript['model']}, "
+                        f"transcribing again with {self.model_name}")
+            full_transcript = None
+            reuse = False
         if full_transcript:
             logger.info(f"Found complete transcript for {video_id}, skipping transcription")
+            if on_chunk:
+                on_chunk(0, full_transcript.get("segments", []), 1)
             return full_transcript
         
         # Get list of segments already processed
-        completed_segments = self.get_completed_segments(video_id)
+        completed_segments = set(self.get_completed_segments(video_id)) if reuse else set()
         logger.info(f"Found {len(completed_segments)} completed segments for {video_id}")
         
         # Continue with normal transcription but skip completed chunks
@@ -342,46 +431,31 @@ class Transcriber:
             # Create temporary directory for chunks
             with tempfile.TemporaryDirectory() as temp_dir:
                 # Segment audio
-                chunk_files = self.segment_audio(audio_file, temp_dir)
+                chunk_files = self.prepare_chunks(audio_file, temp_dir)
                 
                 if job_tracker:
                     job_tracker.update_progress(job_id, total_chunks=len(chunk_files), 
                                              completed_chunks=len(completed_segments))
                 
-                # Process each chunk that hasn't been completed
                 all_segments = []
+                chunks_done = 0
                 
-                # First load all completed segments
-                for idx in completed_segments:
-                    segment_data = self.load_segment_from_s3(video_id, idx)
-                    if segment_data:
-                        all_segments.extend(segment_data)
-                
-                # Process remaining chunks
+                # Walk the chunks in order so on_chunk sees a contiguous stream
                 for i, chunk_file in enumerate(chunk_files):
                     if i in completed_segments:
-                        logger.info(f"Skipping already processed chunk {i}")
-                        continue
+                        segment_data = self.load_segment_from_s3(video_id, i)
+                        if segment_data is not None:
+                            logger.info(f"Skipping already processed chunk {i}")
+                            all_segments.extend(segment_data)
+                            chunks_done += 1
+                            if on_chunk:
+                                on_chunk(i, segment_data, len(chunk_files))
+                            continue
                         
                     logger.info(f"Processing chunk {i+1}/{len(chunk_files)}")
                     
-                    # Transcribe chunk
-                    result = self.model.transcribe(
-                        chunk_file, 
-                        batch_size=self.batch_size, 
-                        language=language,
-                        vlad_onset=self.vlad_onset,
-                        vlad_offset=self.vlad_offset
-                    )
-                    
-                    # Align words for precise timestamps
-                    result = whisperx.align(
-                        result["segments"],
-                        self.alignment_model,
-                        self.metadata,
-                        chunk_file,
-                        device=self.device
-                    )
+                    # Transcribe and align chunk
+                    result = {"segments": self.transcribe_chunk(chunk_file, language)}
                     
                     # Adjust timestamps for chunk position
                     chunk_start_time = i * self.chunk_size
@@ -395,41 +469,32 @@ class Transcriber:
                     
                     # Add to results
                     all_segments.extend(result["segments"])
+                    chunks_done += 1
+                    
+                    if on_chunk:
+                        on_chunk(i, result["segments"], len(chunk_files))
                     
                     # Save progress to S3
                     if self.s3_bucket:
                         segment_key = f"transcripts/{video_id}/segments/chunk_{i:04d}.json"
-                        self.s3.put_object(
-                            Body=json.dumps(result["segments"]),
-                            Bucket=self.s3_bucket,
-                            Key=segment_key,
-                            ContentType="application/json"
-                        )
+                        put_json(self.s3, self.s3_bucket, segment_key, result["segments"], self.compression)
                     
                     # Update progress
                     if job_tracker:
-                        job_tracker.update_progress(
-                            job_id, 
-                            completed_chunks=len(completed_segments) + i + 1
-                        )
+                        job_tracker.update_progress(job_id, completed_chunks=chunks_done)
                 
                 # Combine results
                 final_result = {
                     "segments": sorted(all_segments, key=lambda x: x["start"]),
                     "language": language,
                     "video_id": video_id,
+                    "model": self.model_name,
                     "transcribed_at": datetime.now().isoformat()
                 }
                 
                 # Save complete transcript
                 if self.s3_bucket:
-                    transcript_key = f"transcripts/{video_id}/full_transcript.json"
-                    self.s3.put_object(
-                        Body=json.dumps(final_result),
-                        Bucket=self.s3_bucket,
-                        Key=transcript_key,
-                        ContentType="application/json"
-                    )
+                    self.save_transcript_to_s3(video_id, final_result)
                 
                 return final_result
                 
@@ -437,6 +502,8 @@ class Transcriber:
             error_msg = f"Error resuming transcription: {str(e)}"
             logger.error(error_msg)
             raise TranscriptionError(error_msg)
+        finally:
+            self.release_chunks()
 
 
 # Example usage
@@ -0,0 +1,264 @@
+#!/usr/bin/python3
+# video_index.py - Index of processed videos per model and phrase set, for skipping duplicates
+
+import json
+import math
+import struct
+import hashlib
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import put_bytes, get_bytes, update_object
+
+logger = logging.getLogger(__name__)
+
+INDEX_PREFIX = "video_index"
+DEFAULT_MODEL = "large-v2"    # WhisperX model the workers load
+DEFAULT_PHRASE = "hustle"     # phrase workers scan for when a message has none
+DEFAULT_CAPACITY = 100000     # videos the bloom filter is sized for; it doubles when exceeded
+DEFAULT_ERROR_RATE = 0.01     # bloom filter false positive rate at capacity
+SHARD_COUNT = 64              # exact set shards, so writers rarely contend
+INDEX_MAX_RETRIES = 10        # conditional writes before giving up
+DEFAULT_FETCH_WORKERS = 16    # threads reading shards in bulk
+BLOOM_HEADER = struct.Struct(">IHQQ")  # bits, hash count, capacity, videos added
+
+def phrase_key(phrases):
+    """Stable short key of a phrase set (order and case do not matter)"""
+    if isinstance(phrases, str):
+        phrases = [phrases]
+    normalized = sorted({phrase.strip().lower() for phrase in phrases if phrase and phrase.strip()})
+    return hashlib.sha1("\n".join(normalized).encode("utf-8")).hexdigest()[:16]
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings, serializable to bytes"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE, bits=None, hashes=None):
+        """Size the filter for capacity items at error_rate, or use explicit bits and hash count"""
+        self.capacity = capacity
+        self.bits = bits or max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = hashes or max(1, round(self.bits / capacity * math.log(2)))
+        self.array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        """Bit positions of an item (double hashing)"""
+        digest = hashlib.sha256(item.encode("utf-8")).digest()
+        h1, h2 = struct.unpack(">QQ", digest[:16])
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, item):
+        """Add an item; returns False if it was (probably) present already"""
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position % 8)
+            if not self.array[position // 8] & mask:
+                self.array[position // 8] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, item):
+        return all(self.array[position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+    def to_bytes(self):
+        return BLOOM_HEADER.pack(self.bits, self.hashes, self.capacity, self.count) + bytes(self.array)
+
+    @classmethod
+    def from_bytes(cls, data):
+        bits, hashes, capacity, count = BLOOM_HEADER.unpack_from(data)
+        bloom = cls(capacity=capacity, bits=bits, hashes=hashes)
+        bloom.array = bytearray(data[BLOOM_HEADER.size:])
+        bloom.count = count
+        return bloom
+
+
+class VideoIndex:
+    """
+    Videos already processed with one model and phrase set
+
+    Layout under video_index/{model}/{phrase key}/:
+
+    - ids/{shard}.json: the exact set, sharded by a hash of the video ID,
+      mapping each video to when it was indexed
+    - bloom.bin: a bloom filter of the same IDs
+
+    A single lookup reads its shard. A bulk lookup reads the bloom filter
+    once and only the shards of the videos it reports as present, so a
+    new channel costs one GET and a resubmitted one a GET per shard. Both
+    objects are updated with If-Match writes. The shards are
+    authoritative; a bloom filter that has outgrown its capacity is
+    rebuilt from them at twice the size.
+    """
+
+    def __init__(self, s3_client, s3_bucket, model=DEFAULT_MODEL, phrases=DEFAULT_PHRASE,
+                 capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        """
+        Initialize the index
+
+        Args:
+            s3_client: S3 client
+            s3_bucket: Bucket holding the index
+            model: WhisperX model the videos were transcribed with
+            phrases: Phrase spec or list of specs the videos were scanned for
+            capacity: Initial bloom filter capacity
+            error_rate: Bloom filter false positive rate at capacity
+        """
+        self.s3 = s3_client
+        self.s3_bucket = s3_bucket
+        self.model = model
+        self.phrase_key = phrase_key(phrases)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.prefix = f"{INDEX_PREFIX}/{model}/{self.phrase_key}"
+
+    @staticmethod
+    def shard_of(video_id):
+        """Shard number of a video ID"""
+        return int(hashlib.md5(video_id.encode("utf-8")).hexdigest()[:4], 16) % SHARD_COUNT
+
+    def _shard_key(self, shard):
+        return f"{self.prefix}/ids/{shard:02d}.json"
+
+    def _load(self, key):
+        """Decoded bytes of an index object, or None if it does not exist"""
+        try:
+            return get_bytes(self.s3, self.s3_bucket, key)
+        except self.s3.exceptions.NoSuchKey:
+            return None
+
+    def _load_shard(self, shard):
+        body = self._load(self._shard_key(shard))
+        return json.loads(body.decode("utf-8")) if body else {"video_ids": {}}
+
+    def _load_bloom(self):
+        body = self._load(f"{self.prefix}/bloom.bin")
+        return BloomFilter.from_bytes(body) if body else None
+
+    def contains(self, video_id):
+        """True if the video has been processed with this model and phrase set"""
+        try:
+            shard = self._load_shard(self.shard_of(video_id))
+            return video_id in shard["video_ids"]
+        except Exception as e:
+            logger.error(f"Error reading video index: {str(e)}")
+            return False
+
+    def filter_new(self, video_ids, max_workers=DEFAULT_FETCH_WORKERS):
+        """
+        Split videos into new and already processed ones
+
+        Returns:
+            Tuple of (new video IDs, processed video IDs), each in input order
+        """
+        try:
+            bloom = self._load_bloom()
+            candidates = [video_id for video_id in video_ids if bloom and video_id in bloom]
+            shards = sorted({self.shard_of(video_id) for video_id in candidates})
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                loaded = dict(zip(shards, executor.map(self._load_shard, shards)))
+        except Exception as e:
+            logger.error(f"Error reading video index: {str(e)}")
+            return list(video_ids), []
+
+        processed = {video_id for video_id in candidates
+                     if video_id in loaded[self.shard_of(video_id)]["video_ids"]}
+        logger.info(f"Video index: {len(processed)} of {len(video_ids)} videos already processed "
+                    f"({len(candidates) - len(processed)} bloom false positives, {len(shards)} shards read)")
+        return ([video_id for video_id in video_ids if video_id not in processed],
+                [video_id for video_id in video_ids if video_id in processed])
+
+    def add(self, video_id):
+        """
+        Record a processed video
+
+        Returns:
+            True if the exact set was updated
+        """
+        try:
+            return self._add(video_id)
+        except Exception as e:
+            logger.error(f"Error adding {video_id} to the video index: {str(e)}")
+            return False
+
+    def _add(self, video_id):
+        """Add a video to its shard, then to the bloom filter"""
+        indexed_at = datetime.now().isoformat()
+
+        def add_to_shard(shard):
+            shard = shard or {"video_ids": {}}
+            if video_id in shard["video_ids"]:
+                return None
+            shard["video_ids"][video_id] = indexed_at
+            return shard
+
+        update_object(self.s3, self.s3_bucket, self._shard_key(self.shard_of(video_id)), add_to_shard,
+                      max_retries=INDEX_MAX_RETRIES)
+
+        bloom_key = f"{self.prefix}/bloom.bin"
+        grow = []
+
+        def add_to_bloom(bloom):
+            bloom = bloom or BloomFilter(self.capacity, self.error_rate)
+            if not bloom.add(video_id):
+                return None
+            if bloom.count > bloom.capacity:
+                grow.append(bloom.capacity * 2)
+            return bloom
+
+        def write_bloom(bloom, **condition):
+            put_bytes(self.s3, self.s3_bucket, bloom_key, bloom.to_bytes(), **condition)
+
+        # The shard is authoritative: a video missing from the filter is still caught by the worker's check
+        try:
+            update_object(self.s3, self.s3_bucket, bloom_key, add_to_bloom, parse=BloomFilter.from_bytes,
+                          write=write_bloom, max_retries=INDEX_MAX_RETRIES)
+        except Exception as e:
+            logger.warning(f"Error adding {video_id} to the video index bloom filter: {str(e)}")
+        if grow:
+            self.rebuild(grow[-1])
+        return True
+
+    def rebuild(self, capacity=None, max_workers=DEFAULT_FETCH_WORKERS):
+        """
+        Rebuild the bloom filter from the exact set
+
+        Returns:
+            Number of videos indexed
+        """
+        capacity = capacity or self.capacity
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            shards = list(executor.map(self._load_shard, range(SHARD_COUNT)))
+        video_ids = [video_id for shard in shards for video_id in shard["video_ids"]]
+
+        bloom = BloomFilter(max(capacity, len(video_ids)), self.error_rate)
+        for video_id in video_ids:
+            bloom.add(video_id)
+        # Unconditional: a video indexed meanwhile may be missing from this
+        # filter, but it is in its shard, which the worker's check reads
+        put_bytes(self.s3, self.s3_bucket, f"{self.prefix}/bloom.bin", bloom.to_bytes())
+        logger.info(f"Rebuilt video index bloom filter for {len(video_ids)} videos "
+                    f"(capacity {bloom.capacity}, {len(bloom.array)} bytes)")
+        return len(video_ids)
+
+
+# Example usage
+if __name__ == "__main__":
+    # Index a few videos and check a resubmission against the local S3 stand-in
+    import tempfile
+    from local_s3 import LocalS3Client
+
+    logging.basicConfig(level=logging.INFO)
+
+    with tempfile.TemporaryDirectory() as root:
+        index = VideoIndex(LocalS3Client(root), "bucket", phrases=["hustle"], capacity=4)
+        for video_id in ("aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc", "ddddddddddd", "eeeeeeeeeee"):
+            index.add(video_id)
+
+        new, processed = index.filter_new(["aaaaaaaaaaa", "zzzzzzzzzzz", "eeeeeeeeeee", "yyyyyyyyyyy"])
+        print("New:", new)
+        print("Already processed:", processed)
+        print("Other phrase set sees none:",
+              VideoIndex(LocalS3Client(root), "bucket", phrases=["grind"]).contains("aaaaaaaaaaa"))
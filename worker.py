@@ -13,13 +13,26 @@ import signal
 import threading
 import shutil
 import socket
-import subprocess
 from datetime import datetime, timedelta
 
-from job_tracker import JobTracker, JobState
-from downloader import YouTubeDownloader, DownloadError
+from job_tracker import JobState, JobStage, JOB_BACKENDS, create_job_tracker
+from sqlite_job_tracker import DEFAULT_JOB_DB
+from downloader import YouTubeDownloader, DownloadError, TokenError, UnavailableError, DEFAULT_CONCURRENT_FRAGMENTS
 from transcriber import Transcriber, TranscriptionError
-from scanner import PhraseScanner
+from inference_server import RemoteTranscriber
+from scanner import PhraseScanner, StreamingScanner, S3PartialResultPublisher, EventLogPublisher
+from rescanner import Rescanner
+from lease_keeper import LeaseKeeper
+from message_receiver import MessageReceiver
+from prefetcher import PrefetchQueue, DEFAULT_PREFETCH_THREADS, DEFAULT_MAX_READY, DEFAULT_DISK_QUOTA_GB
+from audio_cache import AudioCache, DEFAULT_CACHE_GB
+from captions import CaptionPolicy, captions_to_transcript
+from retry_policy import RetryPolicy, CircuitBreaker, DEFAULT_CIRCUIT_THRESHOLD, DEFAULT_CIRCUIT_COOLDOWN
+from rate_limiter import RateLimiter, DEFAULT_BURST
+from video_index import VideoIndex
+from local_s3 import LocalS3Client
+from local_sqs import LocalSQSClient
+from storage import put_json, COMPRESSION_TYPES, DEFAULT_COMPRESSION
 
 # Setup logging
 logging.basicConfig(
@@ -33,6 +46,12 @@ DEFAULT_TEMP_DIR = "./temp"
 DEFAULT_BATCH_SIZE = 5
 DEFAULT_S3_BUCKET = "youtube-transcripts"
 DEFAULT_POLL_INTERVAL = 60  # seconds
+PARTIAL_RESULT_MODES = ("s3", "log", "off")
+STAGED_AUDIO_KEY = "staging/{video_id}/audio.wav"
+TRANSCRIPT_KEY = "transcripts/{video_id}/full_transcript.json"
+WORKER_ROLES = ("all", "fetch", "transcribe")
+CAPTION_MODES = ("off", "manual", "auto")
+HANDOFF_DELAY = 5  # seconds before a handed-off job is visible to transcribe workers
 
 class Worker:
     """Main worker that processes YouTube videos from SQS queue"""
@@ -45,8 +64,38 @@ class Worker:
                  s3_bucket=DEFAULT_S3_BUCKET,
                  batch_size=DEFAULT_BATCH_SIZE,
                  poll_interval=DEFAULT_POLL_INTERVAL,
-                 use_gpu=True):
-        """Initialize the worker"""
+                 use_gpu=True,
+                 partial_results="s3",
+                 compression=DEFAULT_COMPRESSION,
+                 job_backend="s3",
+                 job_db=DEFAULT_JOB_DB,
+                 prefetch_threads=DEFAULT_PREFETCH_THREADS,
+                 prefetch_queue=DEFAULT_MAX_READY,
+                 prefetch_disk_gb=DEFAULT_DISK_QUOTA_GB,
+                 inference_socket=None,
+                 audio_cache_dir=None,
+                 audio_cache_gb=DEFAULT_CACHE_GB,
+                 stage_audio=False,
+                 role="all",
+                 transcribe_queue_url=None,
+                 local_root=None,
+                 captions="off",
+                 circuit_threshold=DEFAULT_CIRCUIT_THRESHOLD,
+                 circuit_cooldown=DEFAULT_CIRCUIT_COOLDOWN,
+                 download_rate=0,
+                 download_burst=DEFAULT_BURST,
+                 download_concurrency=DEFAULT_CONCURRENT_FRAGMENTS,
+                 external_downloader=None,
+                 http_chunk_size=None,
+                 reprocess=False):
+        """
+        Initialize the worker
+        
+        The role splits the pipeline across fleets: 'fetch' workers download,
+        convert and stage audio, then pass the job on through the transcribe
+        queue; 'transcribe' workers consume that queue and only read staged
+        audio. 'all' does both in one process.
+        """
         self.phrase = phrase
         self.temp_dir = temp_dir
         self.queue_url = queue_url
@@ -55,28 +104,113 @@ class Worker:
         self.batch_size = batch_size
         self.poll_interval = poll_interval
         self.use_gpu = use_gpu
+        self.partial_results = partial_results
+        self.compression = compression
+        self.role = role
+        self.transcribe_queue_url = transcribe_queue_url
+        # The transcribe role needs every video's audio staged by the fetch role
+        self.stage_audio = stage_audio or role == "fetch"
+        
+        # Captions replace ASR when the policy accepts them ('manual' only trusts creator captions).
+        # Transcribe workers never contact YouTube, so they never fetch captions.
+        self.caption_policy = None
+        if captions != "off" and role != "transcribe":
+            self.caption_policy = CaptionPolicy(allow_automatic=captions == "auto")
+        
+        # The queue this worker consumes
+        self.receive_queue_url = transcribe_queue_url if role == "transcribe" else queue_url
         
         # Generate a unique worker ID
         self.worker_id = f"worker-{uuid.uuid4()}"
         logger.info(f"Worker initialized with ID: {self.worker_id}")
         
-        # Initialize AWS clients
-        self.s3 = boto3.client('s3', region_name=region)
-        self.sqs = boto3.client('sqs', region_name=region) if queue_url else None
+        # Initialize AWS clients (or filesystem stand-ins for local runs)
+        if local_root:
+            self.s3 = LocalS3Client(os.path.join(local_root, "s3"))
+            self.sqs = LocalSQSClient(os.path.join(local_root, "sqs"))
+        else:
+            self.s3 = boto3.client('s3', region_name=region)
+            self.sqs = boto3.client('sqs', region_name=region) if queue_url or transcribe_queue_url else None
+        self.receiver = MessageReceiver(self.sqs, self.receive_queue_url) if self.receive_queue_url else None
+        
+        # Download/convert threads that run ahead of transcription (0 = sequential).
+        # Fetch workers have no transcription to overlap with; they scale out instead.
+        self.prefetcher = None
+        if self.receiver and prefetch_threads > 0 and role != "fetch":
+            self.prefetcher = PrefetchQueue(
+                source=self.receiver.next_message,
+                prepare=self.prepare_message,
+                discard=self.discard_prepared,
+                threads=prefetch_threads,
+                max_ready=prefetch_queue,
+                disk_quota=prefetch_disk_gb * 1024 ** 3,
+                disk_path=temp_dir,
+                idle_wait=poll_interval
+            )
         
         # Initialize components
-        self.job_tracker = JobTracker(s3_bucket, region)
-        self.downloader = YouTubeDownloader(temp_dir)
+        self.job_tracker = create_job_tracker(job_backend, s3_bucket, region, db_path=job_db, s3_client=self.s3)
+        self.downloader = YouTubeDownloader(temp_dir, concurrent_fragments=download_concurrency,
+                                            external_downloader=external_downloader,
+                                            http_chunk_size=http_chunk_size)
+        
+        # Failed jobs are retried with per-error-class backoff; token errors
+        # across the fleet pause downloads (a threshold of 0 disables the breaker)
+        self.retry_policy = RetryPolicy()
+        self.circuit_breaker = None
+        if circuit_threshold > 0 and role != "transcribe":
+            self.circuit_breaker = CircuitBreaker(self.s3, s3_bucket, threshold=circuit_threshold,
+                                                  cooldown=circuit_cooldown)
+        
+        # Requests to YouTube (downloads, captions, metadata) share one fleet-wide
+        # budget per minute (0 = unlimited)
+        self.rate_limiter = None
+        if download_rate > 0 and role != "transcribe":
+            self.rate_limiter = RateLimiter(self.s3, s3_bucket, download_rate, burst=download_burst)
+        
+        # Converted audio kept across jobs (0 GB disables the cache)
+        self.audio_cache = None
+        if audio_cache_gb > 0:
+            self.audio_cache = AudioCache(audio_cache_dir or os.path.join(temp_dir, "audio_cache"),
+                                          int(audio_cache_gb * 1024 ** 3))
+        self.rescanner = Rescanner(s3_bucket, region, s3_client=self.s3, compression=compression)
         
         # Initialize transcriber with correct parameters
         device = "cuda" if use_gpu else "cpu"
-        self.transcriber = Transcriber(
-            model_name="large-v2",
-            device=device,
-            chunk_size=30,
-            s3_bucket=s3_bucket,
-            region=region
-        )
+        # With an inference socket, the models live in a shared inference server
+        if role == "fetch":
+            # Fetch workers never load models; the transcriber only stores caption transcripts
+            self.transcriber = Transcriber(
+                device="cpu",
+                s3_bucket=s3_bucket,
+                region=region,
+                compression=compression,
+                s3_client=self.s3
+            )
+        elif inference_socket:
+            self.transcriber = RemoteTranscriber(
+                address=inference_socket,
+                chunk_size=30,
+                s3_bucket=s3_bucket,
+                region=region,
+                compression=compression,
+                s3_client=self.s3
+            )
+        else:
+            self.transcriber = Transcriber(
+                model_name="large-v2",
+                device=device,
+                chunk_size=30,
+                s3_bucket=s3_bucket,
+                region=region,
+                compression=compression,
+                s3_client=self.s3
+            )
+        
+        # Videos already processed per phrase, checked before a job is created
+        # (reprocess ignores it, as a message's "force" flag does)
+        self.reprocess = reprocess
+        self._video_indexes = {}
         
         # Ensure temp directory exists
         os.makedirs(temp_dir, exist_ok=True)
@@ -168,7 +302,11 @@ class Worker:
             "status": "active",
             "jobs_processed": self.jobs_processed,
             "phrase": self.phrase,
-            "use_gpu": self.use_gpu
+            "use_gpu": self.use_gpu,
+            "role": self.role,
+            "circuit": self.circuit_breaker.state()["state"] if self.circuit_breaker else None,
+            "rate_limiter": self.rate_limiter.stats() if self.rate_limiter else None,
+            "downloads": self.downloader.stats()
         }
         
         try:
@@ -195,6 +333,9 @@ class Worker:
         except:
             logger.warning("Could not create health check file")
         
+        if self.prefetcher:
+            self.prefetcher.start()
+        
         while True:
             try:
                 # Update health check file
@@ -208,208 +349,681 @@ class Worker:
                 self.update_heartbeat()
                 
                 # 2. Check for and recover abandoned jobs
-                recovered = self.job_tracker.recover_abandoned_jobs()
+                recovered = self.job_tracker.recover_abandoned_jobs(self.worker_id, retry_policy=self.retry_policy)
                 if recovered > 0:
                     logger.info(f"Recovered {recovered} abandoned jobs")
                 
                 # 3. Process jobs from queue
-                self.process_batch()
+                received = self.process_batch()
                 
-                # 4. Sleep before next poll
-                time.sleep(self.poll_interval)
+                # 4. Only idle when the queue is empty (receives already long-poll,
+                #    and with prefetching process_batch waits for ready audio)
+                if not received and not self.prefetcher:
+                    time.sleep(self.poll_interval)
                 
             except Exception as e:
                 logger.error(f"Error in main loop: {str(e)}")
                 time.sleep(self.poll_interval)
     
     def process_batch(self):
-        """Process a batch of videos from the SQS queue"""
-        if not self.sqs or not self.queue_url:
+        """
+        Process a batch of videos from the SQS queue
+        
+        Messages come from the receiver's prefetch buffer, which long-polls
+        for up to 10 at a time when it runs dry. With prefetch threads, the
+        download and conversion already happened in the background and this
+        only transcribes audio that is ready.
+        
+        Returns:
+            Number of messages received in this batch
+        """
+        if not self.receiver:
             logger.error("SQS client or queue URL not configured")
-            return
+            return 0
         
         processed_count = 0
+        received_count = 0
         
         while processed_count < self.batch_size:
-            # Check queue depth
             try:
-                response = self.sqs.get_queue_attributes(
-                    QueueUrl=self.queue_url,
-                    AttributeNames=['ApproximateNumberOfMessages']
-                )
-                queue_depth = int(response['Attributes'].get('ApproximateNumberOfMessages', '0'))
-                logger.info(f"Queue depth: {queue_depth} messages")
+                if self.prefetcher:
+                    item = self.prefetcher.get(timeout=self.poll_interval)
+                    if item is None:
+                        logger.info(f"No audio ready after {self.poll_interval}s ({self.prefetcher.stats()})")
+                        break
+                else:
+                    message = self.receiver.next_message()
+                    if message is None:
+                        logger.info("Queue is empty")
+                        break
+                    item = self.prepare_message(message)
                 
-                if queue_depth == 0:
-                    logger.info("Queue is empty")
-                    break
-            except Exception as e:
-                logger.error(f"Error checking queue depth: {str(e)}")
-                break
-            
-            # Get message from queue (don't delete yet)
-            try:
-                response = self.sqs.receive_message(
-                    QueueUrl=self.queue_url,
-                    AttributeNames=['All'],
-                    MaxNumberOfMessages=1,
-                    MessageAttributeNames=['All'],
-                    WaitTimeSeconds=5,
-                    VisibilityTimeout=600  # 10 minutes
-                )
+                received_count += 1
+                if item is None:
+                    continue
                 
-                if 'Messages' not in response:
-                    logger.info("No messages available")
-                    break
-                    
-                message = response['Messages'][0]
-                receipt_handle = message['ReceiptHandle']
-                job_id = message.get('MessageId', f"job-{uuid.uuid4()}")
-                
-                try:
-                    # Parse message body
-                    body = json.loads(message['Body'])
-                    youtube_url = body.get('youtube_url')
-                    custom_phrase = body.get('phrase', self.phrase)
-                    
-                    if not youtube_url:
-                        logger.error("Message does not contain a YouTube URL")
-                        self.sqs.delete_message(
-                            QueueUrl=self.queue_url,
-                            ReceiptHandle=receipt_handle
-                        )
-                        continue
-                    
-                    # Extract video ID
-                    video_id = self.downloader.extract_video_id(youtube_url)
-                    
-                    ## Check if already processed
-                    #if self.job_exists(video_id):
-                    #    logger.info(f"Video {video_id} already processed, skipping")
-                    #    self.sqs.delete_message(
-                    #        QueueUrl=self.queue_url,
-                    #        ReceiptHandle=receipt_handle
-                    #    )
-                    #    continue
-                    
-                    # Create job in tracker
-                    self.job_tracker.create_job(
-                        job_id=job_id,
-                        video_id=video_id,
-                        youtube_url=youtube_url,
-                        phrase=custom_phrase
-                    )
-                    
-                    # Start processing the job
-                    self.job_tracker.start_processing(job_id, self.worker_id)
-                    
-                    # Process the video
-                    logger.info(f"Processing video {video_id} (job {job_id}) with phrase '{custom_phrase}'")
-                    result = self.process_video(job_id, youtube_url, custom_phrase, video_id)
-                    
-                    # Mark job as completed
-                    if result:
-                        self.job_tracker.complete_job(job_id)
-                        
-                        # Delete from queue
-                        self.sqs.delete_message(
-                            QueueUrl=self.queue_url,
-                            ReceiptHandle=receipt_handle
-                        )
-                        
-                        processed_count += 1
-                        self.jobs_processed += 1
-                        
-                except Exception as e:
-                    logger.error(f"Error processing job {job_id}: {str(e)}")
-                    self.job_tracker.fail_job(job_id, str(e))
-                    
-                    # Delete from queue
-                    self.sqs.delete_message(
-                        QueueUrl=self.queue_url,
-                        ReceiptHandle=receipt_handle
-                    )
+                if self.finish_prepared(item):
+                    processed_count += 1
                 
             except Exception as e:
                 logger.error(f"Error receiving message: {str(e)}")
                 break
         
         logger.info(f"Processed {processed_count} videos in this batch")
+        return received_count
     
-    def job_exists(self, video_id):
-        """Check if a job already exists for this video"""
+    def prepare_message(self, message):
+        """
+        Handle a message up to the point where its audio is ready to transcribe
+        
+        Re-scan and invalid messages are handled here completely. For videos,
+        the job is claimed, a LeaseKeeper keeps the job lock and message
+        visibility alive from then on (also while the item waits for the
+        transcription stage), and the audio is downloaded and converted.
+        
+        Returns:
+            Prepared item dict, or None if there is nothing left to transcribe
+        """
+        receipt_handle = message['ReceiptHandle']
+        job_id = message.get('MessageId', f"job-{uuid.uuid4()}")
+        lease = None
+        video_temp_dir = None
+        job = None
+        # Until the job is claimed, its deliveries are the only count of attempts
+        attempts = int(message.get('Attributes', {}).get('ApproximateReceiveCount', 1)) - 1
+        
         try:
-            # Check for results
-            prefix = f"results/{video_id}/"
-            response = self.s3.list_objects_v2(
-                Bucket=self.s3_bucket,
-                Prefix=prefix,
-                MaxKeys=1
+            # Parse message body
+            body = json.loads(message['Body'])
+            
+            # Re-scan messages only read existing transcripts (no download or GPU)
+            if body.get('type') == 'rescan':
+                self.process_rescan(body)
+                self.receiver.delete(receipt_handle)
+                return None
+            
+            # Transcribe messages carry the job that a fetch worker handed over
+            if body.get('type') == 'transcribe':
+                job_id = body.get('job_id', job_id)
+            
+            youtube_url = body.get('youtube_url')
+            custom_phrase = body.get('phrase', self.phrase)
+            # Forced jobs ignore the index and earlier transcripts (--reprocess forces every job)
+            force = bool(body.get('force')) or self.reprocess
+            
+            if not youtube_url:
+                logger.error("Message does not contain a YouTube URL")
+                self.receiver.delete(receipt_handle)
+                return None
+            
+            # Extract video ID
+            video_id = self.downloader.extract_video_id(youtube_url)
+            
+            # A video already processed with this model and phrase needs no job at all
+            # (handed-over jobs were checked by the fetch worker)
+            if (body.get('type') != 'transcribe' and not force
+                    and self.video_index(custom_phrase).contains(video_id)):
+                logger.info(f"Video {video_id} already processed for '{custom_phrase}', skipping")
+                self.receiver.delete(receipt_handle)
+                return None
+            
+            # Create job in tracker
+            self.job_tracker.create_job(
+                job_id=job_id,
+                video_id=video_id,
+                youtube_url=youtube_url,
+                phrase=custom_phrase
             )
-            return 'Contents' in response and len(response['Contents']) > 0
+            
+            # Claim the job; another worker may already hold it
+            job = self.job_tracker.start_processing(job_id, self.worker_id)
+            if not job:
+                logger.info(f"Job {job_id} is claimed by another worker, skipping")
+                return None
+            
+            # Stages recorded by earlier attempts, possibly on other workers
+            attempts = job.get("attempts", 0)
+            stages = job.get("stages") or {}
+            if stages:
+                logger.info(f"Resuming job {job_id} at stage '{JobStage.next_stage(job)}' "
+                            f"(attempt {job.get('attempts', 0) + 1})")
+            
+            # Results were saved before the last attempt stopped: only completion is left
+            if JobStage.RESULTS in stages:
+                self.job_tracker.complete_job(job_id)
+                self.receiver.delete(receipt_handle)
+                self.delete_staged_audio(video_id)
+                self.video_index(custom_phrase).add(video_id)
+                return None
+            
+            # Keep the job lock and message visibility alive until the job ends
+            lease = LeaseKeeper(self.job_tracker, job_id, self.sqs, self.receive_queue_url, receipt_handle).start()
+            
+            # Job-specific temp directory, so two jobs for one video cannot collide
+            video_temp_dir = os.path.join(self.temp_dir, f"{video_id}-{job_id}")
+            os.makedirs(video_temp_dir, exist_ok=True)
+            
+            # A finished transcript needs no audio at all: one from an earlier
+            # attempt, or unless forced, one an earlier job made with this model
+            audio_wav = None
+            if not self.transcript_reusable(video_id, force, stages):
+                # Usable captions stand in for ASR without downloading any audio
+                caption_stage = self.fetch_caption_transcript(job_id, youtube_url, video_id, video_temp_dir, stages)
+                if caption_stage:
+                    stages[JobStage.TRANSCRIPT] = caption_stage
+                else:
+                    logger.info(f"Fetching audio for video {video_id} (job {job_id})")
+                    audio_wav = self.fetch_audio(job_id, youtube_url, video_id, video_temp_dir, stages)
+            metadata = self.fetch_metadata(job_id, youtube_url, video_id, stages)
+            
+            # Fetch workers stop here and pass the job on to the transcribe fleet
+            if self.role == "fetch":
+                lease.stop()
+                self.hand_off(job_id, video_id, youtube_url, custom_phrase, metadata.get("duration"), force)
+                self.receiver.delete(receipt_handle)
+                self.remove_temp_dir(video_temp_dir)
+                self.jobs_processed += 1
+                return None
+            
+            return {
+                "job_id": job_id,
+                "video_id": video_id,
+                "youtube_url": youtube_url,
+                "phrase": custom_phrase,
+                "receipt_handle": receipt_handle,
+                "audio_wav": audio_wav,
+                "metadata": metadata,
+                "stages": stages,
+                "force": force,
+                "attempts": attempts,
+                "temp_dir": video_temp_dir,
+                "lease": lease
+            }
+            
         except Exception as e:
-            logger.error(f"Error checking if job exists: {str(e)}")
+            logger.error(f"Error processing job {job_id}: {str(e)}")
+            if lease:
+                lease.stop()
+            self.handle_failure(job_id, receipt_handle, e, attempts, claimed=job is not None)
+            self.remove_temp_dir(video_temp_dir)
+            return None
+    
+    def handle_failure(self, job_id, receipt_handle, error, attempts=0, claimed=True):
+        """
+        Retry a failed job after a backoff, or mark it failed, depending on the error class
+        
+        A retried job is requeued (keeping its stages) and its message stays
+        in the queue, hidden for the backoff delay, so no worker sees it
+        again until then. A failure before the job was claimed (a storage
+        error creating or claiming it) is retried the same way, with the
+        message's deliveries as its attempts. A job whose error class has
+        no attempts left is failed and its message deleted. A job another
+        worker took over is left to that worker.
+        
+        Args:
+            job_id: Job ID
+            receipt_handle: Receipt handle of the job's message
+            error: Exception that ended the attempt
+            attempts: Failed attempts of the job before this one
+            claimed: Whether this worker held the job when it failed
+            
+        Returns:
+            True if the job will be retried
+        """
+        decision = self.retry_policy.decide(error, attempts)
+        if decision["retry"]:
+            # Deferrals by an open circuit never reached YouTube and cost no attempt
+            if not claimed:
+                requeued = True
+            elif decision["counts_attempt"]:
+                requeued = self.job_tracker.requeue_job(job_id, str(error), decision["error_class"])
+            else:
+                requeued = self.job_tracker.requeue_job(job_id)
+            if requeued:
+                # If the delay cannot be set, the message reappears when its visibility runs out
+                if self.receiver.retry_later(receipt_handle, decision["delay"]):
+                    logger.info(f"Retrying job {job_id} ({decision['error_class']} error) "
+                                f"in {decision['delay']:.0f}s")
+                return True
+        
+        # The worker that took the job over received the message again and decides
+        if self.job_tracker.lease_lost(job_id):
+            logger.warning(f"Job {job_id} failed here after another worker took it over")
             return False
+        
+        logger.error(f"Job {job_id} failed ({decision['error_class']} error, attempt {attempts + 1})")
+        self.job_tracker.fail_job(job_id, str(error))
+        
+        # Delete from queue
+        self.receiver.delete(receipt_handle)
+        return False
     
-    def process_video(self, job_id, youtube_url, phrase, video_id):
-        """Process a single video"""
-        # Create a video-specific temp directory
-        video_temp_dir = os.path.join(self.temp_dir, video_id)
-        os.makedirs(video_temp_dir, exist_ok=True)
+    def hand_off(self, job_id, video_id, youtube_url, phrase, duration=None, force=False):
+        """
+        Send a job whose audio is staged to the transcribe queue, then requeue it
+        
+        The message is sent first, so a failed send leaves the job claimed
+        here and the fetch message is retried instead of the job being
+        stranded in the queued state. The message is delayed by
+        HANDOFF_DELAY to give the requeue time to land; a transcribe worker
+        that receives it earlier cannot claim the job and receives it again
+        after its visibility timeout. The video duration travels with the
+        message for schedulers watching the transcribe queue, and a forced
+        job stays forced.
+        """
+        self.sqs.send_message(
+            QueueUrl=self.transcribe_queue_url,
+            MessageBody=json.dumps({
+                "type": "transcribe",
+                "job_id": job_id,
+                "video_id": video_id,
+                "youtube_url": youtube_url,
+                "phrase": phrase,
+                "duration": duration,
+                "force": force
+            }),
+            DelaySeconds=HANDOFF_DELAY
+        )
+        
+        if not self.job_tracker.requeue_job(job_id):
+            raise Exception(f"Job {job_id} was taken over before it could be handed off")
+        logger.info(f"Handed job {job_id} (video {video_id}) to the transcribe queue")
+    
+    def finish_prepared(self, item):
+        """
+        Transcribe and scan a prepared item, then complete and acknowledge its job
+        
+        Returns:
+            True if the job completed
+        """
+        job_id = item["job_id"]
+        lease = item["lease"]
         
         try:
+            logger.info(f"Processing video {item['video_id']} (job {job_id}) with phrase '{item['phrase']}'")
+            result = self.transcribe_and_scan(job_id, item["youtube_url"], item["phrase"],
+                                              item["video_id"], item["audio_wav"],
+                                              stages=item.get("stages"), metadata=item.get("metadata"),
+                                              force=item.get("force", False))
+            lease.stop()
+            
+            if lease.lost:
+                logger.warning(f"Job {job_id} was taken over by another worker while processing")
+            
+            # Mark job as completed
+            if result:
+                self.job_tracker.complete_job(job_id)
+                
+                # Delete from queue
+                self.receiver.delete(item["receipt_handle"])
+                
+                # Staged audio only serves retries of an unfinished job
+                self.delete_staged_audio(item["video_id"])
+                
+                # Resubmissions of this video and phrase are skipped from now on
+                self.video_index(item["phrase"]).add(item["video_id"])
+                
+                self.jobs_processed += 1
+                return True
+            return False
+            
+        except Exception as e:
+            logger.error(f"Error processing job {job_id}: {str(e)}")
+            lease.stop()
+            self.handle_failure(job_id, item["receipt_handle"], e, item.get("attempts", 0))
+            return False
+        finally:
+            self.remove_temp_dir(item["temp_dir"])
+            if self.prefetcher:
+                self.prefetcher.done(item)
+    
+    def discard_prepared(self, item):
+        """
+        Drop a prepared item that will not be transcribed (worker shutdown)
+        
+        The lease is no longer renewed, so the job lock and the message
+        visibility run out and the job is picked up again elsewhere.
+        """
+        item["lease"].stop()
+        self.remove_temp_dir(item["temp_dir"])
+    
+    def remove_temp_dir(self, path):
+        """Remove a job's temp directory, ignoring errors"""
+        if not path:
+            return
+        try:
+            shutil.rmtree(path)
+        except:
+            pass
+    
+    def process_rescan(self, body):
+        """Apply a list of phrases to existing transcripts without re-processing videos"""
+        phrases = body.get('phrases') or [body.get('phrase', self.phrase)]
+        video_ids = body.get('video_ids')
+        
+        logger.info(f"Re-scanning {len(video_ids) if video_ids else 'all'} videos for phrases {phrases}")
+        summary = self.rescanner.rescan(phrases, video_ids)
+        
+        # Keep a record of the re-scan alongside the per-video results
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        put_json(self.s3, self.s3_bucket, f"rescans/{timestamp}-summary.json", summary, self.compression)
+        return summary
+    
+    def video_index(self, phrase):
+        """Index of videos processed with this worker's model and a phrase"""
+        if phrase not in self._video_indexes:
+            self._video_indexes[phrase] = VideoIndex(self.s3, self.s3_bucket, self.transcriber.model_name, phrase)
+        return self._video_indexes[phrase]
+    
+    def fetch_audio(self, job_id, youtube_url, video_id, video_temp_dir, stages=None):
+        """
+        Get a video's audio as 16 kHz mono WAV and checkpoint the audio stage
+        
+        Sources, cheapest first: the local audio cache, audio staged to S3
+        by an earlier attempt of this job, and finally a YouTube download
+        and conversion. With stage_audio set, audio not yet staged is
+        uploaded so any later attempt skips YouTube.
+        
+        Args:
+            job_id: Job ID
+            youtube_url: YouTube URL of the video
+            video_id: YouTube video ID
+            video_temp_dir: Job temp directory
+            stages: Stages recorded on the job by earlier attempts
+            
+        Returns:
+            Path of the WAV file
+        """
+        stages = stages if stages is not None else {}
+        audio_stage = stages.get(JobStage.AUDIO) or {}
+        audio_path = os.path.join(video_temp_dir, "audio.wav")
+        self.job_tracker.update_progress(job_id, completed_chunks=0, total_chunks=5)
+        
+        # A cache hit or staged audio skips yt-dlp and ffmpeg entirely
+        audio_wav = None
+        download = None
+        if self.audio_cache:
+            audio_wav = self.audio_cache.get(video_id, audio_path)
+        if not audio_wav and audio_stage.get("s3_key"):
+            audio_wav = self.download_staged_audio(audio_stage["s3_key"], audio_path)
+            if audio_wav and self.audio_cache:
+                self.audio_cache.put(video_id, audio_wav)
+        
+        if audio_wav:
+            self.job_tracker.update_progress(job_id, completed_chunks=2)
+        elif self.role == "transcribe":
+            raise DownloadError(f"No staged audio for video {video_id}; transcribe workers do not download")
+        else:
             # Step 1: Download audio
-            self.job_tracker.update_progress(job_id, completed_chunks=0, total_chunks=5)
             logger.info(f"Downloading audio from {youtube_url}")
             
-            audio_mp4 = self.downloader.download(youtube_url, video_temp_dir)
+            audio_mp4, metadata = self.download_audio(youtube_url, video_temp_dir)
+            download = self.downloader.last_download()
             self.job_tracker.update_progress(job_id, completed_chunks=1)
+            self.record_metadata(job_id, metadata, stages)
             
             # Step 2: Convert to WAV
             logger.info("Converting audio to WAV")
             audio_wav = self.downloader.convert_to_wav(audio_mp4, video_temp_dir)
             self.job_tracker.update_progress(job_id, completed_chunks=2)
             
-            # Step 3: Segment audio and transcribe
+            if self.audio_cache:
+                self.audio_cache.put(video_id, audio_wav)
+        
+        s3_key = audio_stage.get("s3_key")
+        if self.stage_audio and not s3_key:
+            s3_key = self.upload_staged_audio(video_id, audio_wav)
+            if not s3_key and self.role == "fetch":
+                raise DownloadError(f"Could not stage audio for video {video_id}")
+        if JobStage.AUDIO not in stages or s3_key != audio_stage.get("s3_key"):
+            artifact = {
+                "bytes": os.path.getsize(audio_wav),
+                "s3_key": s3_key
+            }
+            # Throughput of the YouTube download (method, bytes, seconds, Mbit/s, concurrency)
+            if download:
+                artifact["download"] = download
+            self.job_tracker.record_stage(job_id, JobStage.AUDIO, artifact)
+        return audio_wav
+    
+    def download_audio(self, youtube_url, video_temp_dir):
+        """
+        Download audio from YouTube unless the circuit breaker has paused downloads
+        
+        Token errors count towards opening the circuit and slow the fleet's
+        download rate; a success by the probe closes the circuit again.
+        
+        Returns:
+            Tuple of (audio file path, metadata dict)
+            
+        Raises:
+            CircuitOpenError: While downloads are paused
+            DownloadError: If the download failed
+        """
+        if self.circuit_breaker:
+            self.circuit_breaker.check()
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        try:
+            result = self.downloader.download_with_metadata(youtube_url, video_temp_dir)
+        except TokenError:
+            if self.circuit_breaker:
+                self.circuit_breaker.record_failure()
+            if self.rate_limiter:
+                self.rate_limiter.record_throttle()
+            raise
+        except UnavailableError:
+            # YouTube answered the request, so tokens are accepted again
+            if self.circuit_breaker:
+                self.circuit_breaker.record_success()
+            raise
+        if self.circuit_breaker:
+            self.circuit_breaker.record_success()
+        return result
+    
+    def upload_staged_audio(self, video_id, audio_wav):
+        """
+        Stage converted audio in S3 for retries on other workers
+        
+        Returns:
+            S3 key of the staged audio, or None on error
+        """
+        s3_key = STAGED_AUDIO_KEY.format(video_id=video_id)
+        try:
+            self.s3.upload_file(audio_wav, self.s3_bucket, s3_key)
+            logger.info(f"Staged audio for {video_id} at s3://{self.s3_bucket}/{s3_key}")
+            return s3_key
+        except Exception as e:
+            logger.error(f"Error staging audio for {video_id}: {str(e)}")
+            return None
+    
+    def download_staged_audio(self, s3_key, audio_path):
+        """
+        Fetch audio staged by an earlier attempt
+        
+        Returns:
+            audio_path, or None if the staged audio is gone
+        """
+        try:
+            self.s3.download_file(self.s3_bucket, s3_key, audio_path)
+            logger.info(f"Using staged audio s3://{self.s3_bucket}/{s3_key}")
+            return audio_path
+        except Exception as e:
+            logger.warning(f"Staged audio {s3_key} is not available: {str(e)}")
+            return None
+    
+    def delete_staged_audio(self, video_id):
+        """Remove a video's staged audio once its job has completed"""
+        if not (self.stage_audio or self.role == "transcribe"):
+            return
+        try:
+            self.s3.delete_object(Bucket=self.s3_bucket, Key=STAGED_AUDIO_KEY.format(video_id=video_id))
+        except Exception as e:
+            logger.warning(f"Error deleting staged audio for {video_id}: {str(e)}")
+    
+    def s3_object_exists(self, s3_key):
+        """True if an object exists in the bucket"""
+        try:
+            self.s3.head_object(Bucket=self.s3_bucket, Key=s3_key)
+            return True
+        except Exception:
+            return False
+    
+    def transcript_reusable(self, video_id, force=False, stages=None):
+        """
+        True if the video's saved transcript can be scanned instead of transcribing
+        
+        A transcript this job recorded (an earlier attempt, or captions) is
+        always reused. Otherwise a forced job transcribes again, and others
+        only reuse a transcript made with this worker's model; the model is
+        read from the object's metadata.
+        """
+        if JobStage.TRANSCRIPT in (stages or {}):
+            return True
+        if force:
+            return False
+        try:
+            response = self.s3.head_object(Bucket=self.s3_bucket, Key=TRANSCRIPT_KEY.format(video_id=video_id))
+        except Exception:
+            return False
+        return self.transcriber.reusable(response.get("Metadata", {}).get("model"))
+    
+    def fetch_caption_transcript(self, job_id, youtube_url, video_id, video_temp_dir, stages=None):
+        """
+        Build the transcript from the video's captions if the caption policy accepts them
+        
+        The transcript is saved where ASR would save it and the transcript
+        stage is recorded, so the rest of the pipeline scans it as usual.
+        
+        Returns:
+            Transcript stage artifact, or None to fall back to ASR
+        """
+        if not self.caption_policy:
+            return None
+        # While downloads are paused, captions wait too (the job may still use cached or staged audio)
+        if self.circuit_breaker and not self.circuit_breaker.closed():
+            return None
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        
+        captions = self.downloader.fetch_captions(youtube_url, os.path.join(video_temp_dir, "captions"),
+                                                  self.caption_policy.languages)
+        if captions:
+            self.record_metadata(job_id, captions.get("metadata"), stages)
+        decision = self.caption_policy.choose(captions)
+        if not decision["accepted"]:
+            logger.info(f"Falling back to ASR for {video_id}: {decision['reason']}")
+            return None
+        
+        track = decision["track"]
+        transcript = captions_to_transcript(decision["segments"], video_id, track)
+        self.transcriber.save_transcript_to_s3(video_id, transcript)
+        
+        artifact = {
+            "s3_key": TRANSCRIPT_KEY.format(video_id=video_id),
+            "segments": len(transcript["segments"]),
+            "source": "captions",
+            "language": track["language"],
+            "automatic": track["automatic"]
+        }
+        self.job_tracker.record_stage(job_id, JobStage.TRANSCRIPT, artifact)
+        logger.info(f"Using {'automatic' if track['automatic'] else 'creator'} {track['language']} "
+                    f"captions for {video_id} instead of ASR")
+        return artifact
+    
+    def record_metadata(self, job_id, metadata, stages):
+        """Record video metadata captured by a yt-dlp call as the job's metadata stage"""
+        if not metadata or stages is None or JobStage.METADATA in stages:
+            return
+        self.job_tracker.record_stage(job_id, JobStage.METADATA, metadata)
+        stages[JobStage.METADATA] = metadata
+    
+    def fetch_metadata(self, job_id, youtube_url, video_id, stages=None):
+        """
+        Get the video metadata (title, duration, channel, upload date, chapters)
+        
+        It is normally captured by the yt-dlp call that downloaded the audio
+        or the captions, possibly in an earlier attempt. Only when the audio
+        came from the cache or S3 does this make a metadata-only yt-dlp call.
+        Transcribe workers, which never contact YouTube, do without, as do
+        workers while the circuit breaker has paused downloads.
+        
+        Returns:
+            Metadata dict (empty if it could not be fetched)
+        """
+        stages = stages if stages is not None else {}
+        if JobStage.METADATA in stages:
+            return stages[JobStage.METADATA]
+        if self.role == "transcribe" or (self.circuit_breaker and not self.circuit_breaker.closed()):
+            return {}
+        
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        metadata = self.downloader.fetch_metadata(youtube_url)
+        self.record_metadata(job_id, metadata, stages)
+        return metadata or {}
+    
+    def transcribe_and_scan(self, job_id, youtube_url, phrase, video_id, audio_wav, stages=None, metadata=None,
+                            force=False):
+        """
+        Transcribe downloaded audio, scanning each chunk as it is aligned, and save results
+        
+        The transcript and results stages are recorded on the job as they
+        finish. audio_wav may be None when the full transcript is already
+        in S3. A forced job only reuses a transcript it recorded itself.
+        """
+        try:
+            # Step 3: Segment audio and transcribe, scanning each chunk as it is aligned
             # Using the Transcriber's methods directly - it handles segmentation internally
-            logger.info("Transcribing audio")
+            logger.info(f"Transcribing audio and scanning for phrase '{phrase}'")
+            stream = StreamingScanner(
+                PhraseScanner.from_spec(phrase),
+                publisher=self.create_partial_publisher(video_id, job_id),
+                context={"video_id": video_id, "job_id": job_id, "worker_id": self.worker_id}
+            )
             
             # Check if we can resume transcription
-            transcription = self.transcriber.resume_transcription(
+            transcript = self.transcriber.resume_transcription(
                 audio_file=audio_wav,
                 job_id=job_id,
                 job_tracker=self.job_tracker,
-                video_id=video_id
+                video_id=video_id,
+                on_chunk=stream.add_chunk,
+                reuse=not force or JobStage.TRANSCRIPT in (stages or {})
             )
+            if JobStage.TRANSCRIPT not in (stages or {}):
+                self.job_tracker.record_stage(job_id, JobStage.TRANSCRIPT, {
+                    "s3_key": TRANSCRIPT_KEY.format(video_id=video_id),
+                    "segments": len(transcript.get("segments", [])),
+                    "source": transcript.get("source", "asr")
+                })
             
-            # Extract segments to text files for scanning
-            # We'll save each segment to a separate text file
-            segments_dir = os.path.join(video_temp_dir, "segments")
-            os.makedirs(segments_dir, exist_ok=True)
-            
-            transcript_files = []
-            for i, segment in enumerate(transcription.get("segments", [])):
-                txt_file = os.path.join(segments_dir, f"segment_{i:03d}.txt")
-                with open(txt_file, "w", encoding="utf-8") as f:
-                    f.write(segment.get("text", ""))
-                transcript_files.append(txt_file)
-                
-            # Step 4: Scan transcripts for the phrase
-            logger.info(f"Scanning transcripts for phrase '{phrase}'")
-            scanner = PhraseScanner(phrase)
-            stats = scanner.scan_transcripts(transcript_files)
+            # Step 4: Collect the scan results accumulated while transcribing
+            stats = stream.finish()
             
             # Add video metadata
             stats["video_id"] = video_id
             stats["youtube_url"] = youtube_url
             stats["job_id"] = job_id
             stats["phrase"] = phrase
+            stats["transcript_source"] = transcript.get("source", "asr")
+            
+            # Video details from the download's metadata; the duration is exact
+            # where the scanner could only estimate it from the last segment
+            metadata = metadata or {}
+            for field in ("title", "channel", "upload_date"):
+                if metadata.get(field):
+                    stats[field] = metadata[field]
+            if metadata.get("duration"):
+                stats["video_duration_sec"] = metadata["duration"]
+                stats["video_duration_min"] = metadata["duration"] / 60
             stats["processed_at"] = datetime.now().isoformat()
             
             # Save results to S3
-            self.save_results(stats, video_id)
+            results_key = self.save_results(stats, video_id, metadata)
+            if results_key:
+                self.job_tracker.record_stage(job_id, JobStage.RESULTS, {"s3_key": results_key})
             
-            # Clean up
             logger.info(f"Completed processing video {video_id}")
             
             return stats
@@ -417,12 +1031,14 @@ class Worker:
         except Exception as e:
             logger.error(f"Error processing video {video_id}: {str(e)}")
             raise
-        finally:
-            # Clean up temp directory to save space
-            try:
-                shutil.rmtree(video_temp_dir)
-            except:
-                pass
+    
+    def create_partial_publisher(self, video_id, job_id):
+        """Create the publisher for streaming scan progress, or None if disabled"""
+        if self.partial_results == "s3":
+            return S3PartialResultPublisher(self.s3, self.s3_bucket, video_id, job_id)
+        if self.partial_results == "log":
+            return EventLogPublisher(os.path.join(self.temp_dir, "events", f"{job_id}.jsonl"))
+        return None
     
     def upload_transcription(self, txt_file, video_id):
         """Upload a transcription file to S3"""
@@ -442,51 +1058,31 @@ class Worker:
             logger.error(f"Error uploading to S3: {str(e)}")
             return False
     
-    def save_results(self, results, video_id):
-        """Save analysis results to S3"""
+    def save_results(self, results, video_id, metadata=None):
+        """
+        Save analysis results to S3
+        
+        Returns:
+            S3 key of the results, or None on error
+        """
         # Create a unique results file with timestamp
         timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
         s3_key = f"results/{video_id}/{timestamp}-results.json"
         
         try:
-            # Convert results to JSON
-            results_json = json.dumps(results, indent=2)
-            
-            # Upload to S3
-            self.s3.put_object(
-                Body=results_json,
-                Bucket=self.s3_bucket,
-                Key=s3_key,
-                ContentType="application/json"
-            )
+            # Upload compressed JSON to S3
+            put_json(self.s3, self.s3_bucket, s3_key, results, self.compression)
             
             # Update the master video list
-            self.update_video_list(video_id)
+            self.update_video_list(video_id, metadata)
             
             logger.info(f"Results saved to s3://{self.s3_bucket}/{s3_key}")
-            return True
+            return s3_key
         except Exception as e:
             logger.error(f"Error saving results to S3: {str(e)}")
-            return False
-    
-    def get_video_title(self, video_id):
-        """Get the title of a YouTube video using yt-dlp"""
-        logger.info(f"Attempting to get title for video {video_id}")
-        try:
-            # Try to get video title using yt-dlp
-            cmd = ["yt-dlp", "--get-title", f"https://www.youtube.com/watch?v={video_id}"]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0 and result.stdout.strip():
-                return result.stdout.strip()
-            
-            # Fallback to a generic title if yt-dlp fails
-            return f"YouTube Video {video_id}"
-        except Exception as e:
-            logger.error(f"Error getting video title: {str(e)}")
-            return f"YouTube Video {video_id}"
+            return None
     
-    def update_video_list(self, video_id):
+    def update_video_list(self, video_id, metadata=None):
         """Update the youtube_transcriber_2.json file with the new video ID and metadata"""
         logger.info(f"Updating youtube_transcriber_2.json with video {video_id}")
         video_list_key = "youtube_transcriber_2.json"
@@ -502,8 +1098,9 @@ class Worker:
                 logger.info("No existing video list found, creating new one")
                 video_list = {"videos": []}
             
-            # Get video title from YouTube
-            video_title = self.get_video_title(video_id)
+            # Metadata was captured with the download, so no extra YouTube request here
+            metadata = metadata or {}
+            video_title = metadata.get("title") or f"YouTube Video {video_id}"
             
             # Check if video ID is already in the list
             existing_video = next((item for item in video_list["videos"] if item["id"] == video_id), None)
@@ -516,6 +1113,9 @@ class Worker:
                     "processed_at": datetime.now().isoformat(),
                     "thumbnail": f"https://img.youtube.com/vi/{video_id}/mqdefault.jpg"
                 }
+                for field in ("duration", "channel", "upload_date"):
+                    if metadata.get(field):
+                        new_video[field] = metadata[field]
                 
                 video_list["videos"].append(new_video)
                 
@@ -543,6 +1143,26 @@ class Worker:
         """Clean up resources before shutdown"""
         logger.info("Cleaning up worker resources")
         
+        # Stop fetching ahead and drop audio that will not be transcribed
+        if self.prefetcher:
+            try:
+                self.prefetcher.stop()
+            except Exception as e:
+                logger.error(f"Error stopping prefetch threads: {str(e)}")
+        
+        # Delete processed messages and hand prefetched ones back to the queue
+        if self.receiver:
+            try:
+                self.receiver.close()
+            except Exception as e:
+                logger.error(f"Error releasing queued messages: {str(e)}")
+        
+        # Write any buffered job progress before exiting
+        try:
+            self.job_tracker.stop()
+        except Exception as e:
+            logger.error(f"Error flushing job progress: {str(e)}")
+        
         try:
             # Update heartbeat with inactive status
             heartbeat = {
@@ -583,8 +1203,7 @@ def parse_arguments():
     parser.add_argument(
         "--queue_url", "-q",
         type=str,
-        required=True,
-        help="URL of the SQS queue to pull YouTube URLs from"
+        help="URL of the SQS queue to pull YouTube URLs from (not needed for --role transcribe)"
     )
     parser.add_argument(
         "--region", "-r",
@@ -615,7 +1234,157 @@ def parse_arguments():
         action="store_true",
         help="Use CPU instead of GPU for transcription."
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--partial_results",
+        type=str,
+        choices=PARTIAL_RESULT_MODES,
+        default="s3",
+        help="Where to publish scan hits while a video is still transcribing. (Default: 's3')"
+    )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        choices=COMPRESSION_TYPES,
+        default=DEFAULT_COMPRESSION,
+        help=f"Compression for transcript and results objects. (Default: '{DEFAULT_COMPRESSION}')"
+    )
+    parser.add_argument(
+        "--job_backend",
+        type=str,
+        choices=JOB_BACKENDS,
+        default="s3",
+        help="Where job state is tracked: 's3' for a fleet, 'sqlite' for workers on one host. (Default: 's3')"
+    )
+    parser.add_argument(
+        "--job_db",
+        type=str,
+        default=DEFAULT_JOB_DB,
+        help=f"SQLite database file for --job_backend sqlite. (Default: '{DEFAULT_JOB_DB}')"
+    )
+    parser.add_argument(
+        "--prefetch_threads",
+        type=int,
+        default=DEFAULT_PREFETCH_THREADS,
+        help=f"Threads downloading and converting upcoming videos during transcription, 0 to disable. (Default: {DEFAULT_PREFETCH_THREADS})"
+    )
+    parser.add_argument(
+        "--prefetch_queue",
+        type=int,
+        default=DEFAULT_MAX_READY,
+        help=f"Maximum videos with audio ready and waiting for transcription. (Default: {DEFAULT_MAX_READY})"
+    )
+    parser.add_argument(
+        "--prefetch_disk_gb",
+        type=float,
+        default=DEFAULT_DISK_QUOTA_GB,
+        help=f"Disk space prefetched audio may use, in GB. (Default: {DEFAULT_DISK_QUOTA_GB})"
+    )
+    parser.add_argument(
+        "--inference_socket",
+        type=str,
+        default=None,
+        help="Unix socket of a shared inference_server.py; no models are loaded in this process. (Default: load models locally)"
+    )
+    parser.add_argument(
+        "--audio_cache_dir",
+        type=str,
+        default=None,
+        help="Directory of the audio cache, may be shared by workers on one host. (Default: '{temp_dir}/audio_cache')"
+    )
+    parser.add_argument(
+        "--audio_cache_gb",
+        type=float,
+        default=DEFAULT_CACHE_GB,
+        help=f"Size of the audio cache in GB, 0 to disable. (Default: {DEFAULT_CACHE_GB})"
+    )
+    parser.add_argument(
+        "--stage_audio",
+        action="store_true",
+        help="Upload converted audio to S3 so a retried job resumes on any worker without downloading from YouTube again."
+    )
+    parser.add_argument(
+        "--role",
+        type=str,
+        choices=WORKER_ROLES,
+        default="all",
+        help="'fetch' downloads and stages audio for the transcribe queue, 'transcribe' only transcribes staged audio. (Default: 'all')"
+    )
+    parser.add_argument(
+        "--transcribe_queue_url",
+        type=str,
+        default=None,
+        help="Queue connecting the fetch and transcribe roles (required for those roles)"
+    )
+    parser.add_argument(
+        "--captions",
+        type=str,
+        choices=CAPTION_MODES,
+        default="off",
+        help="Scan YouTube captions instead of running ASR when they are usable: 'manual' accepts creator captions only, 'auto' also automatic ones. (Default: 'off')"
+    )
+    parser.add_argument(
+        "--circuit_threshold",
+        type=int,
+        default=DEFAULT_CIRCUIT_THRESHOLD,
+        help=f"YouTube token errors across the fleet within 5 minutes that pause all downloads; 0 disables the circuit breaker. (Default: {DEFAULT_CIRCUIT_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--circuit_cooldown",
+        type=int,
+        default=DEFAULT_CIRCUIT_COOLDOWN,
+        help=f"Seconds downloads stay paused once the circuit breaker opens; doubles after each failed probe. (Default: {DEFAULT_CIRCUIT_COOLDOWN})"
+    )
+    parser.add_argument(
+        "--download_rate",
+        type=float,
+        default=0,
+        help="Requests to YouTube per minute across the whole fleet; set it just under the rate that gets throttled. 0 means unlimited. (Default: 0)"
+    )
+    parser.add_argument(
+        "--download_burst",
+        type=int,
+        default=DEFAULT_BURST,
+        help=f"Rate limiter tokens a worker takes at once and may spend without waiting. (Default: {DEFAULT_BURST})"
+    )
+    parser.add_argument(
+        "--download_concurrency",
+        type=str,
+        default=str(DEFAULT_CONCURRENT_FRAGMENTS),
+        help=f"Parallel fragments/connections per yt-dlp download, or 'auto' to tune it from measured throughput. (Default: {DEFAULT_CONCURRENT_FRAGMENTS})"
+    )
+    parser.add_argument(
+        "--external_downloader",
+        type=str,
+        default=None,
+        help="Downloader yt-dlp hands transfers to, e.g. 'aria2c' for multi-connection downloads of plain audio streams. (Default: yt-dlp's own)"
+    )
+    parser.add_argument(
+        "--http_chunk_size",
+        type=str,
+        default=None,
+        help="Fetch plain HTTP streams in ranged requests of this size, e.g. '10M'; avoids per-connection throttling of long downloads. (Default: one request)"
+    )
+    parser.add_argument(
+        "--reprocess",
+        action="store_true",
+        help="Process videos even if the video index lists them as done for their phrase."
+    )
+    parser.add_argument(
+        "--local_root",
+        type=str,
+        default=None,
+        help="Run against filesystem stand-ins for S3 and SQS under this directory; queue URLs are queue names. (Default: AWS)"
+    )
+    args = parser.parse_args()
+    
+    if args.role != "transcribe" and not args.queue_url:
+        parser.error(f"--queue_url is required for --role {args.role}")
+    if args.role != "all" and not args.transcribe_queue_url:
+        parser.error(f"--transcribe_queue_url is required for --role {args.role}")
+    if args.download_concurrency != "auto" and not args.download_concurrency.isdigit():
+        parser.error("--download_concurrency must be a positive number or 'auto'")
+    
+    return args
 
 
 def main():
@@ -631,7 +1400,30 @@ def main():
         s3_bucket=args.s3_bucket,
         batch_size=args.batch_size,
         poll_interval=args.poll_interval,
-        use_gpu=not args.cpu
+        use_gpu=not args.cpu,
+        partial_results=args.partial_results,
+        compression=args.compression,
+        job_backend=args.job_backend,
+        job_db=args.job_db,
+        prefetch_threads=args.prefetch_threads,
+        prefetch_queue=args.prefetch_queue,
+        prefetch_disk_gb=args.prefetch_disk_gb,
+        inference_socket=args.inference_socket,
+        audio_cache_dir=args.audio_cache_dir,
+        audio_cache_gb=args.audio_cache_gb,
+        stage_audio=args.stage_audio,
+        role=args.role,
+        transcribe_queue_url=args.transcribe_queue_url,
+        local_root=args.local_root,
+        captions=args.captions,
+        circuit_threshold=args.circuit_threshold,
+        circuit_cooldown=args.circuit_cooldown,
+        download_rate=args.download_rate,
+        download_burst=args.download_burst,
+        download_concurrency=args.download_concurrency,
+        external_downloader=args.external_downloader,
+        http_chunk_size=args.http_chunk_size,
+        reprocess=args.reprocess
     )
     
     # Start worker